@@ -1,9 +1,28 @@
+import argparse
+import asyncio
+import os
+import queue
+import threading
+import time
 import tkinter as tk
 from tkinter import filedialog # For masters task
-from typing import Callable, Union, Optional
+from tkinter import messagebox
+from tkinter import ttk
+from typing import Callable, Iterable, Union, Optional
 from a3_support import *
 from model import *
 from constants import *
+import diagnostics
+import server
+from animation import SpriteAnimator
+from gameloop import GameLoop
+from undo import UndoHistory
+from farmcore.mapedit import (brush_spans, flood_fill, paint_spans, 
+                              rectangle_spans)
+from farmcore.mapio import write_map
+from farmcore.metrics import SUMMED_COLUMNS
+from store import CampaignStore
+from macros import MacroError, MacroRunner, compile_macro
 
 #View Classese 
 class InfoBar (AbstractGrid):
@@ -63,31 +82,75 @@ class InfoBar (AbstractGrid):
 
 class FarmView(AbstractGrid):
     """A view class that inherits from AbstractGrid and tk.Canvas. Displays the
-        farm map, player, and plants."""
+        farm map, player, and plants. The view can be zoomed with the mouse
+        wheel between a set of discrete cell sizes; each size draws from its
+        own precomputed set of sprites, and sizes below FLAT_TILE_SIZE are
+        drawn as a single flat-colour bitmap. The ground is drawn in layers:
+        the visible tiles are copied into one ground bitmap, which is patched
+        in place when a tile changes, and only the plants and players are 
+        canvas items of their own. Crops sway, plants pop when they grow a 
+        stage and the player walks, all played by one SpriteAnimator that is
+        stepped by the game's frames."""
     def __init__ (self, master: tk.Tk | tk.Frame, dimensions: tuple[int, int], 
-                  size:tuple[int, int], **kwargs) -> None:
+                  size:tuple[int, int], image_cache: Optional[dict] = None,
+                  **kwargs) -> None:
         """
         Sets up the FarmView to be an AbstractGrid with the appropriate 
-        dimensions and size.         
+        dimensions and size, precomputes the sprite pyramid for every zoom
+        level and its animation frames, binds the mouse wheel for zooming 
+        and the mouse motion for the hover inspector.
 
         Parameters:
             tk.Tk | tk.Frame: frame which displays the FarmView
             tuple[int, int]: the number of rows and columns
             tuple[int, int]: width in pixels, height in pixels
+            dict: sprite cache shared with other FarmViews. Defaults to a 
+                cache of the view's own.
             
         Return:
             None
         """
+        #fit the whole map across the width, as the original fixed view did.
+        #the zoom levels are needed by get_cell_size while the grid is set up
+        fitSize = max(1, size[0] // dimensions[1])
+        self._zoomLevels = sorted(set(ZOOM_LEVELS) | {fitSize})
+        self._zoomIndex = self._zoomLevels.index(fitSize)
         super().__init__(master, dimensions,size)
         self._master = master
-        self._size = size
-        self._imageCache = {}
+        self._imageCache = {} if image_cache is None else image_cache
+        self._viewOrigin = (0, 0)
+        self._lastState = None
+        #the ground bitmap, the (origin, cell size) it was drawn for, and the
+        #visible part of each map row that is drawn in it
+        self._groundImage = None
+        self._groundKey = None
+        self._groundRows = []
+        #the flat mode bitmap, the (origin, cell size) it was drawn for, and
+        #the cells it shows as players
+        self._flatImage = None
+        self._flatKey = None
+        self._flatMarked = set()
+        #whether the view scrolls to keep the player in view
+        self._following = True
+        #the farm position under the mouse, and the highlight rectangle,
+        #tooltip background and tooltip text that are moved to show it
+        self._hoverPosition = None
+        self._hoverItems = None
+        self._animator = SpriteAnimator(self, SWAY_FPS)
+        self.build_sprite_pyramid()
+        
+        self.bind('<MouseWheel>', self.handle_scroll)
+        self.bind('<Button-4>', self.handle_scroll)
+        self.bind('<Button-5>', self.handle_scroll)
+        self.bind('<Motion>', self.handle_motion)
+        self.bind('<Leave>', self.handle_leave)
 
     def get_mapped_image (self, image_name: str, size: tuple[int, int]) -> str:
         """
         Maps the image name from the images folder and then returns the image 
         for the given image_name, resized appropriately according to the given
-        tuple dimensions.
+        tuple dimensions. Each size has its own cache, so images of different
+        sizes never replace each other.
         
         Parameters:
             str: name of the image
@@ -97,14 +160,269 @@ class FarmView(AbstractGrid):
             str: map of the image from the images folder  
         """
         image_map = 'images/{0}'.format(image_name)
-        image = get_image(image_map, size, self._imageCache)
+        image = get_image(image_map, size, self._imageCache.setdefault(size, {}))
         return image
+
+    def get_animation_frames(self, image_name: str, size: tuple[int, int],
+                             effect: str) -> list[tk.PhotoImage]:
+        """
+        Returns the frames of an animation effect on the image with the given
+        name, resized appropriately. The frames are cached with the image of
+        the same size.
+        
+        Parameters:
+            str: name of the image
+            tuple: width in pixels, height in pixels
+            str: one of the ANIMATION_EFFECTS
+        
+        Return:
+            list[tk.PhotoImage]: the frames of the animation
+        """
+        image_map = 'images/{0}'.format(image_name)
+        return get_sprite_frames(image_map, size, effect,
+                                 self._imageCache.setdefault(size, {}))
+
+    def build_sprite_pyramid(self) -> None:
+        """
+        Resizes every ground, player and plant sprite once for each zoom level
+        that is drawn with sprites, and slices the frames of its animations,
+        so that zooming and animating only swap between ready made images.
+        
+        Return:
+            None
+        """
+        for cellSize in self._zoomLevels:
+            if cellSize < FLAT_TILE_SIZE:
+                continue
+            size = (cellSize, cellSize)
+            for image_name in get_sprite_names():
+                self.get_mapped_image(image_name, size)
+            for image_name in get_plant_sprite_names():
+                self.get_animation_frames(image_name, size, 'sway')
+                self.get_animation_frames(image_name, size, 'pop')
+            for direction in (UP, DOWN, LEFT, RIGHT):
+                self.get_animation_frames(IMAGES[direction], size, 'walk')
+
+    def get_plant_image(self, image_name: str, 
+                        size: tuple[int, int]) -> tuple[tk.PhotoImage, str]:
+        """
+        Returns the swaying image that plants with the given image name are
+        drawn with, and the tag their items need for it to sway.
+        
+        Parameters:
+            str: name of the plant image
+            tuple: width in pixels, height in pixels
+        
+        Return:
+            tuple[tk.PhotoImage, str]: the display image and its tag
+        """
+        return self._animator.get_loop_image(
+            (image_name, size),
+            self.get_animation_frames(image_name, size, 'sway'))
+
+    def create_plant(self, position: tuple[int, int], plant: Plant) -> None:
+        """Creates the swaying image of the given plant at its (row, col) 
+            farm position, which must be in view."""
+        plant_image, loopTag = self.get_plant_image(get_plant_image_name(plant),
+                                                    self.get_cell_size())
+        self.create_image(self.get_midpoint(self.to_view(position)),
+                          image = plant_image, 
+                          tags = ('cell{0}_{1}'.format(*position), 'plant',
+                                  loopTag))
+
+    def pop_plants(self, plants: dict[tuple[int, int], Plant],
+                   positions: Iterable[tuple[int, int]]) -> None:
+        """
+        Plays the growth pop on the plants at the given positions that are in
+        view. Plants that grew into the same sprite share one animation, 
+        which ends by showing their swaying image again.
+        
+        Args:
+            dict[tuple[int, int], Plant]: a dictionary mapping positions to 
+                                            plants.
+            Iterable[tuple[int, int]]: (row, col) of the plants that grew
+        
+        Return:
+            None
+        """
+        image_size = self.get_cell_size()
+        if image_size[0] < FLAT_TILE_SIZE:
+            return
+        groups = {}
+        for position in positions:
+            if position in plants and self.is_visible(position):
+                image_name = get_plant_image_name(plants[position])
+                if image_name not in groups:
+                    groups[image_name] = self._animator.new_tag('pop')
+                self.addtag_withtag(groups[image_name], 
+                                    'cell{0}_{1}'.format(*position))
+        for image_name, tag in groups.items():
+            self._animator.play(tag,
+                                self.get_animation_frames(image_name, 
+                                                          image_size, 'pop'),
+                                POP_DURATION,
+                                self.get_plant_image(image_name, 
+                                                     image_size)[0])
+
+    def walk_player(self, direction: str, duration: float) -> None:
+        """
+        Plays one walk cycle on the player, facing in the given direction,
+        over the given number of seconds.
+        
+        Args:
+            str: the direction the player is walking in
+            float: the length of the walk cycle in seconds
+        
+        Return:
+            None
+        """
+        image_size = self.get_cell_size()
+        if image_size[0] < FLAT_TILE_SIZE:
+            return
+        self.addtag_withtag('walk', 'player')
+        self._animator.play('walk',
+                            self.get_animation_frames(IMAGES[direction],
+                                                      image_size, 'walk'),
+                            duration,
+                            self.get_mapped_image(IMAGES[direction], 
+                                                  image_size))
+
+    def stop_walk(self) -> None:
+        """Stops the player's walk cycle, if one is playing."""
+        self._animator.stop('walk')
+
+    def animate(self, now: float) -> bool:
+        """
+        Advances every running animation to the given time. Animations of 
+        cells out of view have no items and are paused.
+        
+        Parameters:
+            float: the current time in seconds
+        
+        Return:
+            bool: True while any animation is running
+        """
+        return self._animator.step(now)
+
+    def get_cell_size(self) -> tuple[int, int]:
+        """Returns the (width, height) of a cell at the current zoom level."""
+        cellSize = self._zoomLevels[self._zoomIndex]
+        return cellSize, cellSize
+
+    def get_visible_dimensions(self) -> tuple[int, int]:
+        """Returns the number of (rows, columns) that fit in the view at the
+            current zoom level."""
+        cellSize = self._zoomLevels[self._zoomIndex]
+        return -(-self._size[1] // cellSize), -(-self._size[0] // cellSize)
+
+    def get_view_origin(self) -> tuple[int, int]:
+        """Returns the (row, col) of the farm cell in the top left corner of
+            the view."""
+        return self._viewOrigin
+
+    def set_view_centre(self, position: tuple[int, int]) -> None:
+        """
+        Scrolls the view so that the given (row, col) farm position is as
+        close to the centre of the view as the edges of the farm allow.
+        
+        Parameters:
+            tuple[int, int]: the farm position to centre on
+            
+        Return:
+            None
+        """
+        rows, cols = self._dimensions
+        visRows, visCols = self.get_visible_dimensions()
+        row = max(0, min(position[0] - visRows // 2, rows - visRows))
+        col = max(0, min(position[1] - visCols // 2, cols - visCols))
+        self._viewOrigin = (row, col)
+
+    def look_at(self, position: tuple[int, int]) -> None:
+        """
+        Centres the view on the given (row, col) farm position and redraws 
+        the last drawn state. The view stops following the player until 
+        follow_player is called.
+        
+        Parameters:
+            tuple[int, int]: the farm position to centre on
+            
+        Return:
+            None
+        """
+        self._following = False
+        self.set_view_centre(position)
+        if self._lastState is not None:
+            self.redraw(*self._lastState)
+
+    def follow_player(self) -> None:
+        """Makes the view scroll to keep the player in view again."""
+        self._following = True
+
+    def is_visible(self, position: tuple[int, int]) -> bool:
+        """Returns True iff the given (row, col) farm position is inside the
+            view."""
+        row, col = position
+        originRow, originCol = self._viewOrigin
+        visRows, visCols = self.get_visible_dimensions()
+        return (originRow <= row < originRow + visRows
+                and originCol <= col < originCol + visCols)
+
+    def to_view(self, position: tuple[int, int]) -> tuple[int, int]:
+        """Converts a (row, col) farm position to a (row, col) cell of the
+            view."""
+        return (position[0] - self._viewOrigin[0],
+                position[1] - self._viewOrigin[1])
+
+    def zoom(self, steps: int) -> None:
+        """
+        Changes the zoom level by the given number of steps (positive zooms
+        in), keeping the player (or, with no player, the centre of the view)
+        in view, and redraws the last drawn state.
+        
+        Parameters:
+            int: number of zoom levels to move by
+            
+        Return:
+            None
+        """
+        newIndex = max(0, min(self._zoomIndex + steps,
+                              len(self._zoomLevels) - 1))
+        if newIndex == self._zoomIndex:
+            return
+        visRows, visCols = self.get_visible_dimensions()
+        centre = (self._viewOrigin[0] + visRows // 2,
+                  self._viewOrigin[1] + visCols // 2)
+        self._zoomIndex = newIndex
+        self.update_geometry()
+        if self._lastState is not None:
+            self.set_view_centre(self._lastState[2] or centre)
+            self.redraw(*self._lastState)
+
+    def handle_scroll(self, event: tk.Event) -> None:
+        """
+        Mouse wheel handler. Scrolling up zooms in and scrolling down zooms 
+        out, for both the delta based and the Button-4/5 wheel events.
+        
+        Parameters:
+            tk.Event: the mouse wheel event
+            
+        Return:
+            None
+        """
+        if event.num == 4 or event.delta > 0:
+            self.zoom(1)
+        elif event.num == 5 or event.delta < 0:
+            self.zoom(-1)
     
     def redraw(self, ground: list[str], plants: dict[tuple[int, int], Plant],
-        player_position: tuple[int, int], player_direction: str) -> None:
+        player_position: tuple[int, int], player_direction: str,
+        others: Optional[list[tuple[tuple[int, int], str]]] = None) -> None:
         """
-        Clears the farm view, then creates images for the ground,
-        then the plants, then the player. 
+        Clears the farm view, then brings the ground bitmap up to date and 
+        creates images for the plants, then any other players, then moves or
+        creates the player. Only the cells inside the view are drawn, and the view 
+        scrolls to follow the player. With no player position, as in the map
+        editor, no player is drawn or followed.
         
         Args:
             list[str]: map file converted into a list of strings
@@ -112,36 +430,654 @@ class FarmView(AbstractGrid):
                                             plants.
             tuple[int, int]: player's current (row, col) position
             str: string of the player's current direction
+            list: (position, direction) of each other player on the farm, 
+                for multiplayer games. Defaults to None.
         
         Return:
             None
         """
-        self.clear()
-        for row in ground:
-            row_length = len(row)
-        image_size = (int(self._size[0]/row_length),
-                      int(self._size[0]/row_length))
-        map = {'G': self.get_mapped_image(IMAGES[GRASS],image_size),
-               'U': self.get_mapped_image(IMAGES[UNTILLED],image_size),
-               'S':self.get_mapped_image(IMAGES[SOIL],image_size)
-               }
-        
-        for i,row in enumerate(ground):
-            for j, tile in enumerate(row):
-                midpoint = self.get_midpoint((i,j))
-                self.create_image(midpoint,image = map[tile])
+        others = others or []
+        self._lastState = (ground, plants, player_position, player_direction,
+                           others)
+        if (self._following and player_position is not None
+                and not self.is_visible(player_position)):
+            self.set_view_centre(player_position)
+        cellSize = self._zoomLevels[self._zoomIndex]
+        if cellSize < FLAT_TILE_SIZE:
+            #clearing deletes the player item, so its walk cycle ends here
+            #and draw_players makes a new item once sprites are shown again
+            self.stop_walk()
+            self.clear()
+            self._groundKey = None
+            self._hoverItems = None
+            self.draw_flat(ground, plants, player_position, others)
+            self.draw_hover()
+            return
         
+        #everything but the ground layer and the player is drawn again from
+        #scratch. The player item is moved, so a walk cycle on it carries on
+        self.delete('flat', 'plant', 'others')
+        self._flatKey = None
+        self.draw_ground(ground)
         for plant in plants:
             position = plant
-            midpoint = self.get_midpoint(position)
-            plant_image_name = get_plant_image_name(plants[plant])
-            plant_image = self.get_mapped_image(plant_image_name,image_size)
-            self.create_image(midpoint, image = plant_image)
+            if not self.is_visible(position):
+                continue
+            self.create_plant(position, plants[plant])
+        
+        self.draw_players(player_position, player_direction, others)
+        self.draw_hover()
+
+    def draw_ground(self, ground: list[str]) -> None:
+        """
+        Brings the ground bitmap up to date with the visible part of the map.
+        The bitmap is made again when the view scrolls or zooms; otherwise
+        only the tiles that differ from the ones already drawn are copied in.
+        
+        Args:
+            list[str]: map file converted into a list of strings
+        
+        Return:
+            None
+        """
+        cellSize = self._zoomLevels[self._zoomIndex]
+        visRows, visCols = self.get_visible_dimensions()
+        if self._groundKey != (self._viewOrigin, cellSize):
+            self.delete('ground')
+            self._groundImage = tk.PhotoImage(width = visCols * cellSize,
+                                              height = visRows * cellSize)
+            self.create_image(0, 0, image = self._groundImage, 
+                              anchor = tk.NW, tags = 'ground')
+            self.tag_lower('ground')
+            self._groundKey = (self._viewOrigin, cellSize)
+            self._groundRows = [''] * visRows
+        
+        originRow = self._viewOrigin[0]
+        for i in range(min(visRows, len(ground) - originRow)):
+            self.draw_ground_row(ground, i)
+
+    def draw_ground_row(self, ground: list[str], i: int) -> None:
+        """
+        Copies the sprite of every tile in a row of the view that differs 
+        from the tile drawn there into the ground bitmap.
+        
+        Args:
+            list[str]: map file converted into a list of strings
+            int: the row of the view to draw
+        
+        Return:
+            None
+        """
+        originRow, originCol = self._viewOrigin
+        visCols = self.get_visible_dimensions()[1]
+        visible = ground[originRow + i][originCol:originCol + visCols]
+        drawn = self._groundRows[i]
+        if visible == drawn:
+            return
+        cellSize = self._zoomLevels[self._zoomIndex]
+        for j, tile in enumerate(visible):
+            if j < len(drawn) and tile == drawn[j]:
+                continue
+            sprite = self.get_mapped_image(IMAGES[tile], (cellSize, cellSize))
+            #tk's photo copy replaces the pixels of the cell in place
+            self.tk.call(self._groundImage, 'copy', sprite, 
+                         '-to', j * cellSize, i * cellSize,
+                         '-compositingrule', 'set')
+        self._groundRows[i] = visible
+
+    def draw_players(self, player_position: tuple[int, int], 
+                     player_direction: str,
+                     others: list[tuple[tuple[int, int], str]]) -> None:
+        """
+        Draws any other players, then the player if there is one, on top of 
+        the farm. An existing player item is moved rather than made again, so
+        that a walk cycle playing on it carries on.
+        
+        Args:
+            tuple[int, int]: player's current (row, col) position
+            str: string of the player's current direction
+            list: (position, direction) of each other player on the farm
+        
+        Return:
+            None
+        """
+        image_size = self.get_cell_size()
+        for position, direction in others:
+            if self.is_visible(position):
+                self.create_image(self.get_midpoint(self.to_view(position)),
+                                  image = self.get_mapped_image(
+                                      IMAGES[direction], image_size),
+                                  tags = 'others')
             
-        player_start = self.get_midpoint(player_position)
-        self.create_image(player_start,image = self.get_mapped_image
-                                                    (IMAGES[player_direction],
-                                                     image_size))
+        if player_position is None:
+            self.delete('player')
+            return
+        player_start = self.get_midpoint(self.to_view(player_position))
+        player_image = self.get_mapped_image(IMAGES[player_direction],
+                                             image_size)
+        if self.type('player') is None:
+            self.create_image(player_start, image = player_image, 
+                              tags = 'player')
+            return
+        self.coords('player', *player_start)
+        self.tag_raise('player')
+        #the walk cycle shows the player's image once it ends
+        if not self._animator.is_playing('walk'):
+            self.itemconfigure('player', image = player_image)
+
+    def redraw_cells(self, ground: list[str], 
+                     plants: dict[tuple[int, int], Plant],
+                     positions: list[tuple[int, int]],
+                     player_position: tuple[int, int], 
+                     player_direction: str) -> None:
+        """
+        Redraws only the ground and plants of the given cells, and the 
+        players. The changed tiles are patched into the ground bitmap, or in
+        flat tile mode the rows holding them into the flat bitmap. Falls back
+        to a full redraw when the view has scrolled or zoomed since it was 
+        last drawn, or has to scroll to follow the player.
+        
+        Args:
+            list[str]: map file converted into a list of strings
+            dict[tuple[int, int], Plant]: a dictionary mapping positions to 
+                                            plants.
+            list[tuple[int, int]]: the (row, col) cells to redraw
+            tuple[int, int]: player's current (row, col) position
+            str: string of the player's current direction
+        
+        Return:
+            None
+        """
+        others = self._lastState[4] if self._lastState else []
+        cellSize = self._zoomLevels[self._zoomIndex]
+        drawnKey = (self._flatKey if cellSize < FLAT_TILE_SIZE 
+                    else self._groundKey)
+        if (drawnKey != (self._viewOrigin, cellSize)
+            or (self._following and player_position is not None
+                and not self.is_visible(player_position))):
+            self.redraw(ground, plants, player_position, player_direction,
+                        others)
+            return
+        self._lastState = (ground, plants, player_position, player_direction,
+                           others)
+        if cellSize < FLAT_TILE_SIZE:
+            self.draw_flat_rows(ground, plants, positions, player_position,
+                                others)
+            return
+        
+        viewRows = set()
+        for position in positions:
+            if not self.is_visible(position):
+                continue
+            tag = 'cell{0}_{1}'.format(*position)
+            self.delete(tag)
+            viewRows.add(self.to_view(position)[0])
+            if position in plants:
+                self.create_plant(position, plants[position])
+        for i in viewRows:
+            self.draw_ground_row(ground, i)
+        
+        self.delete('others')
+        self.draw_players(player_position, player_direction, others)
+        self.draw_hover()
+
+    def place_player(self, from_position: tuple[int, int],
+                     to_position: tuple[int, int], progress: float) -> None:
+        """
+        Moves the drawn player sprite part of the way between two cells, 
+        without redrawing anything else.
+        
+        Args:
+            tuple[int, int]: (row, col) the player is moving from
+            tuple[int, int]: (row, col) the player is moving to
+            float: how far through the move the player is, from 0 to 1
+        
+        Return:
+            None
+        """
+        fromX, fromY = self.get_midpoint(self.to_view(from_position))
+        toX, toY = self.get_midpoint(self.to_view(to_position))
+        self.coords('player', fromX + (toX - fromX) * progress,
+                    fromY + (toY - fromY) * progress)
+
+    def pixel_to_position(self, x: int, y: int) -> Optional[tuple[int, int]]:
+        """Returns the (row, col) farm position at a pixel of the view, or 
+            None if the pixel is beyond the edge of the farm."""
+        row, col = self.pixel_to_cell(x, y)
+        position = (row + self._viewOrigin[0], col + self._viewOrigin[1])
+        rows, cols = self._dimensions
+        if 0 <= position[0] < rows and 0 <= position[1] < cols:
+            return position
+        return None
+
+    def start_editing(self, on_press: Callable[[tuple[int, int]], None],
+                      on_drag: Callable[[tuple[int, int]], None],
+                      on_release: Callable[[tuple[int, int]], None]) -> None:
+        """
+        Puts the view into editor mode, in which the left mouse button 
+        reports the farm positions it is pressed, dragged and released at. 
+        Positions beyond the edge of the farm are not reported.
+        
+        Parameters:
+            Callable: called with the position the button is pressed at
+            Callable: called with each new position the mouse is dragged to
+            Callable: called with the position the button is released at
+            
+        Return:
+            None
+        """
+        def report(callback, event):
+            position = self.pixel_to_position(event.x, event.y)
+            if position is not None:
+                callback(position)
+
+        def drag(event):
+            #dragging replaces the plain motion binding, so move the hover 
+            #inspector here, and only report moves to a new cell
+            lastPosition = self._hoverPosition
+            self.handle_motion(event)
+            if self._hoverPosition not in (None, lastPosition):
+                on_drag(self._hoverPosition)
+
+        self.bind('<ButtonPress-1>', lambda event: report(on_press, event))
+        self.bind('<B1-Motion>', drag)
+        self.bind('<ButtonRelease-1>', 
+                  lambda event: report(on_release, event))
+
+    def show_selection(self, corner: tuple[int, int], 
+                       opposite: tuple[int, int]) -> None:
+        """
+        Outlines the rectangle of farm cells with the given opposite 
+        corners, reusing a single outline item.
+        
+        Parameters:
+            tuple[int, int]: (row, col) of one corner
+            tuple[int, int]: (row, col) of the opposite corner
+            
+        Return:
+            None
+        """
+        x_min, y_min, _, _ = self.get_bbox(self.to_view(
+            (min(corner[0], opposite[0]), min(corner[1], opposite[1]))))
+        _, _, x_max, y_max = self.get_bbox(self.to_view(
+            (max(corner[0], opposite[0]), max(corner[1], opposite[1]))))
+        if not self.find_withtag('selection'):
+            self.create_rectangle(0, 0, 0, 0, outline = HOVER_COLOUR,
+                                  width = 2, dash = (4, 2), 
+                                  tags = 'selection')
+        self.coords('selection', x_min, y_min, x_max, y_max)
+        self.tag_raise('selection')
+
+    def hide_selection(self) -> None:
+        """Removes the outline drawn by show_selection."""
+        self.delete('selection')
+
+    def handle_motion(self, event: tk.Event) -> None:
+        """
+        Mouse motion handler. Moves the hover inspector to the farm cell 
+        under the mouse.
+        
+        Parameters:
+            tk.Event: the mouse motion event
+            
+        Return:
+            None
+        """
+        position = self.pixel_to_position(event.x, event.y)
+        if position != self._hoverPosition:
+            self._hoverPosition = position
+            self.draw_hover()
+
+    def handle_leave(self, event: tk.Event) -> None:
+        """
+        Mouse leave handler. Hides the hover inspector.
+        
+        Parameters:
+            tk.Event: the mouse leave event
+            
+        Return:
+            None
+        """
+        self._hoverPosition = None
+        self.draw_hover()
+
+    def describe_cell(self, position: tuple[int, int]) -> str:
+        """
+        Returns the hover inspector's description of a farm cell in the last
+        drawn state: the tile type, and any plant's stage and the days until
+        it can be harvested.
+        
+        Parameters:
+            tuple[int, int]: the (row, col) farm position
+        
+        Return:
+            str: the description, one fact per line
+        """
+        ground, plants = self._lastState[0], self._lastState[1]
+        row, col = position
+        lines = [TILE_NAMES[ground[row][col]]]
+        plant = plants.get(position)
+        if plant is not None:
+            lines.append('{0}, stage {1}'.format(plant.get_name(),
+                                                plant.get_stage()))
+            days = plant.days_until_harvest()
+            if days == 0:
+                lines.append('Ready to harvest')
+            elif days is not None:
+                lines.append('{0} day{1} until harvest'.format(
+                    days, '' if days == 1 else 's'))
+        return '\n'.join(lines)
+
+    def draw_hover(self) -> None:
+        """
+        Moves the hover inspector's highlight and tooltip to the cell under 
+        the mouse, or hides them if there is none. The three items are made
+        once and then only moved and reconfigured, so mouse motion never 
+        creates canvas items.
+        
+        Return:
+            None
+        """
+        position = self._hoverPosition
+        if (position is None or self._lastState is None 
+                or not self.is_visible(position)):
+            if self._hoverItems is not None:
+                self.itemconfigure('hover', state = tk.HIDDEN)
+            return
+        if self._hoverItems is None:
+            self._hoverItems = (
+                self.create_rectangle(0, 0, 0, 0, outline = HOVER_COLOUR,
+                                      width = 2, tags = 'hover'),
+                self.create_rectangle(0, 0, 0, 0, fill = TOOLTIP_COLOUR,
+                                      outline = HOVER_COLOUR, tags = 'hover'),
+                self.create_text(0, 0, anchor = tk.NW, font = TOOLTIP_FONT,
+                                 tags = 'hover'))
+        highlight, background, text = self._hoverItems
+        x_min, y_min, x_max, y_max = self.get_bbox(self.to_view(position))
+        self.coords(highlight, x_min, y_min, x_max, y_max)
+        self.itemconfigure(text, text = self.describe_cell(position))
+        self.itemconfigure('hover', state = tk.NORMAL)
+        
+        #show the tooltip beside the cell, on whichever side has room
+        self.coords(text, x_max + 6, y_min)
+        left, top, right, bottom = self.bbox(text)
+        if right > self._size[0]:
+            self.move(text, x_min - 6 - right, 0)
+        if bottom > self._size[1]:
+            self.move(text, 0, self._size[1] - bottom)
+        left, top, right, bottom = self.bbox(text)
+        self.coords(background, left - 3, top - 2, right + 3, bottom + 2)
+        self.tag_raise('hover')
+
+    def draw_flat(self, ground: list[str], 
+                  plants: dict[tuple[int, int], Plant],
+                  player_position: tuple[int, int],
+                  others: list[tuple[tuple[int, int], str]]) -> None:
+        """
+        Draws the visible part of the farm as one bitmap with a single colour
+        per cell, for zoom levels where sprites would be only a few pixels.
+        
+        Args:
+            list[str]: map file converted into a list of strings
+            dict[tuple[int, int], Plant]: a dictionary mapping positions to 
+                                            plants.
+            tuple[int, int]: player's current (row, col) position
+            list: (position, direction) of each other player on the farm
+        
+        Return:
+            None
+        """
+        originRow, originCol = self._viewOrigin
+        visRows, visCols = self.get_visible_dimensions()
+        pixels = [[TILE_COLOURS[tile] 
+                   for tile in row[originCol:originCol + visCols]]
+                  for row in ground[originRow:originRow + visRows]]
+        for position, plant in plants.items():
+            if self.is_visible(position):
+                i, j = self.to_view(position)
+                pixels[i][j] = PLANT_COLOURS[plant.get_name()]
+        self._flatMarked = self.get_flat_marked(player_position, others)
+        for position in self._flatMarked:
+            i, j = self.to_view(position)
+            pixels[i][j] = PLAYER_COLOUR
+        
+        #one pixel per cell, which tk then scales up to the cell size
+        bitmap = tk.PhotoImage(width = len(pixels[0]), height = len(pixels))
+        bitmap.put(' '.join('{' + ' '.join(row) + '}' for row in pixels))
+        cellSize = self._zoomLevels[self._zoomIndex]
+        if cellSize > 1:
+            bitmap = bitmap.zoom(cellSize)
+        #keep a reference so that tk does not discard the image
+        self._flatImage = bitmap
+        self._flatKey = (self._viewOrigin, cellSize)
+        self.create_image(0, 0, image = bitmap, anchor = tk.NW, tags = 'flat')
+
+    def get_flat_marked(self, player_position: Optional[tuple[int, int]],
+                        others: list[tuple[tuple[int, int], str]]
+                        ) -> set[tuple[int, int]]:
+        """Returns the visible cells that flat mode shows as players."""
+        return {position for position 
+                in [position for position, _ in others] + [player_position]
+                if position is not None and self.is_visible(position)}
+
+    def draw_flat_rows(self, ground: list[str], 
+                       plants: dict[tuple[int, int], Plant],
+                       positions: list[tuple[int, int]],
+                       player_position: Optional[tuple[int, int]],
+                       others: list[tuple[tuple[int, int], str]]) -> None:
+        """
+        Repaints the rows of the flat mode bitmap that hold the given cells
+        or a player, now or when it was last drawn, leaving the other rows
+        as they are.
+        
+        Args:
+            list[str]: map file converted into a list of strings
+            dict[tuple[int, int], Plant]: a dictionary mapping positions to 
+                                            plants.
+            list[tuple[int, int]]: the (row, col) cells that changed
+            tuple[int, int]: player's current (row, col) position
+            list: (position, direction) of each other player on the farm
+        
+        Return:
+            None
+        """
+        marked = self.get_flat_marked(player_position, others)
+        viewRows = {self.to_view(position)[0] for position 
+                    in set(positions) | marked | self._flatMarked
+                    if self.is_visible(position)}
+        self._flatMarked = marked
+        originRow, originCol = self._viewOrigin
+        visCols = self.get_visible_dimensions()[1]
+        cellSize = self._zoomLevels[self._zoomIndex]
+        for i in viewRows:
+            row = originRow + i
+            colours = [TILE_COLOURS[tile] 
+                       for tile in ground[row][originCol:originCol + visCols]]
+            for j in range(len(colours)):
+                position = (row, originCol + j)
+                if position in marked:
+                    colours[j] = PLAYER_COLOUR
+                elif position in plants:
+                    colours[j] = PLANT_COLOURS[plants[position].get_name()]
+            #the row is put as cellSize identical lines of scaled up pixels
+            line = '{' + ' '.join(colour for colour in colours 
+                                  for _ in range(cellSize)) + '}'
+            self._flatImage.put(' '.join([line] * cellSize), 
+                                to = (0, i * cellSize))
+
+class MinimapView(tk.Canvas):
+    """A view class that inherits from tk.Canvas. Shows the whole farm as a 
+        single bitmap, with one pixel block per group of cells, and markers
+        for the player and the part of the farm shown by the FarmView. When 
+        cells change, only their pixel blocks are repainted. Clicking the 
+        minimap calls back with the farm position clicked."""
+    def __init__(self, master: tk.Tk | tk.Frame, dimensions: tuple[int, int],
+                 size: int, 
+                 click_command: Optional[Callable[[tuple[int, int]], None]] 
+                 = None) -> None:
+        """
+        Sets up the minimap for a farm of the given dimensions. Farms larger 
+        than the minimap are downsampled so that each pixel covers a square 
+        of cells, and smaller farms are scaled up to fill it.
+        
+        Parameters:
+            tk.Tk | tk.Frame: frame which displays the minimap
+            tuple[int, int]: the number of rows and columns of the farm
+            int: the width and height of the minimap in pixels
+            click_command: callback given the (row, col) farm position clicked
+            
+        Return:
+            None
+        """
+        super().__init__(master, width = size, height = size, 
+                         highlightthickness = 0)
+        self._dimensions = dimensions
+        rows, cols = dimensions
+        #cells per pixel, and screen pixels per downsampled pixel
+        self._cellsPerPixel = max(1, -(-max(rows, cols) // size))
+        self._height = -(-rows // self._cellsPerPixel)
+        self._width = -(-cols // self._cellsPerPixel)
+        self._pixelSize = max(1, size // max(self._height, self._width))
+        self._pixels = [None] * (self._height * self._width)
+        self._plantColours = {}
+        self._bitmap = tk.PhotoImage(width = self._width * self._pixelSize,
+                                     height = self._height * self._pixelSize)
+        self.create_image(0, 0, image = self._bitmap, anchor = tk.NW)
+        self.create_rectangle(0, 0, 0, 0, outline = VIEWPORT_COLOUR, 
+                              tags = 'viewport')
+        self.create_rectangle(0, 0, 0, 0, fill = PLAYER_COLOUR, 
+                              outline = PLAYER_COLOUR, tags = 'player')
+        self._clickCommand = click_command
+        self.bind('<Button-1>', self.handle_click)
+        self.bind('<B1-Motion>', self.handle_click)
+
+    def get_plant_colour(self, name: str, stage: int) -> str:
+        """Returns the colour of a plant at the given stage: the crop's 
+            colour, faded towards the soil colour while the plant is young."""
+        key = (name, stage)
+        if key not in self._plantColours:
+            crop = CROPS[name]
+            weight = stage / crop.final_stage
+            plant = PLANT_COLOURS[name]
+            soil = TILE_COLOURS[SOIL]
+            channels = [round(int(plant[i:i + 2], 16) * weight + 
+                              int(soil[i:i + 2], 16) * (1 - weight))
+                        for i in (1, 3, 5)]
+            self._plantColours[key] = '#{0:02x}{1:02x}{2:02x}'.format(*channels)
+        return self._plantColours[key]
+
+    def get_pixel_colour(self, ground: list[str], 
+                         plants: dict[tuple[int, int], Plant],
+                         pixel: tuple[int, int]) -> str:
+        """Returns the colour of one downsampled pixel: that of its most 
+            grown plant if it has any, otherwise that of its commonest 
+            tile."""
+        k = self._cellsPerPixel
+        rows, cols = self._dimensions
+        top, left = pixel[0] * k, pixel[1] * k
+        best = None
+        tiles = {}
+        for row in range(top, min(top + k, rows)):
+            for col in range(left, min(left + k, cols)):
+                plant = plants.get((row, col))
+                if plant is not None and (best is None or 
+                                          plant.get_stage() > best.get_stage()):
+                    best = plant
+                tile = ground[row][col]
+                tiles[tile] = tiles.get(tile, 0) + 1
+        if best is not None:
+            return self.get_plant_colour(best.get_name(), best.get_stage())
+        return TILE_COLOURS[max(tiles, key = tiles.get)]
+
+    def redraw(self, ground: list[str], 
+               plants: dict[tuple[int, int], Plant]) -> None:
+        """
+        Recomputes every pixel of the minimap and repaints the whole bitmap 
+        in a single put.
+        
+        Parameters:
+            list[str]: map file converted into a list of strings
+            dict[tuple[int, int], Plant]: a dictionary mapping positions to 
+                                            plants.
+        
+        Return:
+            None
+        """
+        size = self._pixelSize
+        lines = []
+        for i in range(self._height):
+            row = [self.get_pixel_colour(ground, plants, (i, j))
+                   for j in range(self._width)]
+            self._pixels[i * self._width:(i + 1) * self._width] = row
+            line = '{' + ' '.join(colour for colour in row 
+                                  for _ in range(size)) + '}'
+            lines.extend([line] * size)
+        self._bitmap.put(' '.join(lines))
+
+    def update_cells(self, ground: list[str], 
+                     plants: dict[tuple[int, int], Plant],
+                     positions: Iterable[tuple[int, int]]) -> None:
+        """
+        Repaints only the pixel blocks covering the given cells, and only 
+        those whose colour has changed.
+        
+        Parameters:
+            list[str]: map file converted into a list of strings
+            dict[tuple[int, int], Plant]: a dictionary mapping positions to 
+                                            plants.
+            Iterable[tuple[int, int]]: the (row, col) cells that changed
+        
+        Return:
+            None
+        """
+        k = self._cellsPerPixel
+        size = self._pixelSize
+        for i, j in {(row // k, col // k) for row, col in positions}:
+            colour = self.get_pixel_colour(ground, plants, (i, j))
+            index = i * self._width + j
+            if colour != self._pixels[index]:
+                self._pixels[index] = colour
+                self._bitmap.put(colour, to = (j * size, i * size, 
+                                               (j + 1) * size, (i + 1) * size))
+
+    def place_markers(self, player_position: Optional[tuple[int, int]],
+                      view_origin: tuple[int, int],
+                      view_dimensions: tuple[int, int]) -> None:
+        """
+        Moves the player marker and the outline of the part of the farm shown
+        by the FarmView. With no player position, as in the map editor, there
+        is no player marker.
+        
+        Parameters:
+            tuple[int, int]: player's current (row, col) position, or None
+            tuple[int, int]: (row, col) of the FarmView's top left cell
+            tuple[int, int]: number of (rows, columns) the FarmView shows
+        
+        Return:
+            None
+        """
+        scale = self._pixelSize / self._cellsPerPixel
+        if player_position is None:
+            self.delete('player')
+        else:
+            row, col = player_position
+            self.coords('player', col * scale, row * scale, 
+                        (col + 1) * scale + 1, (row + 1) * scale + 1)
+        rows, cols = self._dimensions
+        top, left = view_origin
+        bottom = min(rows, top + view_dimensions[0])
+        right = min(cols, left + view_dimensions[1])
+        self.coords('viewport', left * scale, top * scale, 
+                    right * scale - 1, bottom * scale - 1)
+
+    def handle_click(self, event: tk.Event) -> None:
+        """Calls back with the farm position under the mouse, if it is on 
+            the farm."""
+        scale = self._pixelSize / self._cellsPerPixel
+        row, col = int(event.y / scale), int(event.x / scale)
+        rows, cols = self._dimensions
+        if self._clickCommand and 0 <= row < rows and 0 <= col < cols:
+            self._clickCommand((row, col))
 
 class ItemView(tk.Frame):
     """A view class that inherits from tk.Frame. Displays relevant information
@@ -274,9 +1210,152 @@ class ItemView(tk.Frame):
                 self._sellLabel.config(bg = INVENTORY_EMPTY_COLOUR)
                 self._buyLabel.config(bg = INVENTORY_EMPTY_COLOUR)  
 
+    def update_prices(self, buy_price: Optional[int], sell_price: int) -> None:
+        """
+        Updates the buy and sell price labels with the market's current 
+        prices.
+
+        Parameters:
+            int: price to buy one of the item, or None if it cannot be bought
+            int: price to sell one of the item
+                
+        Return:
+            None
+        """
+        self._sellLabel.configure(text = 'Sell price: ${0}'.format(sell_price))
+        if buy_price is not None:
+            self._buyLabel.configure(text = 'Buy price: ${0}'.format(buy_price))
+
     def get_name(self):
         """Returns the name of the item in the ItemView."""
         return self._itemName
+
+class ChartView(tk.Canvas):
+    """A view class that inherits from tk.Canvas. Plots metrics against days,
+        with each series scaled to fit the chart's height. Each new day is 
+        appended as one line segment per series; when a point no longer fits, 
+        the canvas rescales the lines already drawn instead of redrawing 
+        them. Once a series has more segments than the plot is pixels wide, 
+        they are merged into one line with a few points per pixel column, so 
+        the canvas stays the same size however many days are plotted."""
+    def __init__(self, master: tk.Tk | tk.Toplevel, series: dict[str, str],
+                 dimensions: tuple[int, int]) -> None:
+        """
+        Sets up the empty chart and a legend of the series it plots.
+        
+        Parameters:
+            tk.Tk | tk.Toplevel: window which displays the chart
+            dict[str, str]: the name of each series mapped to its colour
+            tuple[int, int]: width in pixels, height in pixels
+            
+        Return:
+            None
+        """
+        width, height = dimensions
+        super().__init__(master, width = width, height = height, bg = 'white')
+        self._series = series
+        self._plotWidth = width - 2 * CHART_MARGIN
+        self._plotHeight = height - 2 * CHART_MARGIN
+        self._bottom = height - CHART_MARGIN
+        self._firstDay = None
+        self._lastDay = None
+        #pixels per day, and pixels per unit of each series
+        self._dayScale = None
+        self._valueScales = {}
+        #the last (day, value) plotted of each series
+        self._lastPoints = {}
+        #the number of line items of each series
+        self._segments = {}
+        for i, (name, colour) in enumerate(series.items()):
+            self.create_text(CHART_MARGIN + i * self._plotWidth // len(series),
+                             CHART_MARGIN // 2, text = name, fill = colour,
+                             anchor = tk.W)
+
+    def to_canvas(self, name: str, day: float, 
+                  value: float) -> tuple[float, float]:
+        """Returns the canvas coordinates of a point of the given series."""
+        return (CHART_MARGIN + (day - self._firstDay) * self._dayScale,
+                self._bottom - value * self._valueScales[name])
+
+    def add_point(self, day: int, values: dict[str, float]) -> None:
+        """
+        Appends a day's values to the chart, rescaling what has already been
+        drawn if the point would not fit. Days that are not after the last 
+        point plotted are ignored.
+        
+        Parameters:
+            int: the day of the point
+            dict[str, float]: the value of each series on that day
+            
+        Return:
+            None
+        """
+        if self._firstDay is None:
+            self._firstDay = day
+            self._dayScale = self._plotWidth / 30
+        elif day <= self._lastDay:
+            return
+        self._lastDay = day
+        span = (day - self._firstDay) * self._dayScale
+        if span > self._plotWidth:
+            factor = self._plotWidth / span
+            self.scale('line', CHART_MARGIN, 0, factor, 1)
+            self._dayScale *= factor
+        
+        for name, colour in self._series.items():
+            value = values[name]
+            scale = self._valueScales.get(name)
+            if scale is None or value * scale > self._plotHeight:
+                newScale = self._plotHeight / max(value, 1)
+                if scale is not None:
+                    self.scale(name, 0, self._bottom, 1, newScale / scale)
+                self._valueScales[name] = newScale
+            if name in self._lastPoints:
+                self.create_line(*self.to_canvas(name, *self._lastPoints[name]),
+                                 *self.to_canvas(name, day, value),
+                                 fill = colour, tags = ('line', name))
+                self._segments[name] = self._segments.get(name, 0) + 1
+                if self._segments[name] > self._plotWidth:
+                    self.coalesce(name, colour)
+            self._lastPoints[name] = (day, value)
+
+    def coalesce(self, name: str, colour: str) -> None:
+        """
+        Merges the lines of a series into one line. Within each pixel column
+        only the first, lowest, highest and last points are kept, so the
+        shape of the line is unchanged at the chart's resolution.
+        
+        Parameters:
+            str: the name of the series
+            str: the colour of the series
+            
+        Return:
+            None
+        """
+        items = self.find_withtag(name)
+        #consecutive segments share an end point, which is kept once
+        points = []
+        for item in items:
+            coords = self.coords(item)
+            for i in range(0, len(coords), 2):
+                point = (coords[i], coords[i + 1])
+                if not points or points[-1] != point:
+                    points.append(point)
+        kept = []
+        column = []
+        for point in points + [None]:
+            if column and (point is None or int(point[0]) != int(column[0][0])):
+                indices = {0, len(column) - 1,
+                           min(range(len(column)), key = lambda i: column[i][1]),
+                           max(range(len(column)), key = lambda i: column[i][1])}
+                kept.extend(column[i] for i in sorted(indices))
+                column = []
+            if point is not None:
+                column.append(point)
+        self.delete(*items)
+        self.create_line(*(coord for point in kept for coord in point),
+                         fill = colour, tags = ('line', name))
+        self._segments[name] = 1
         
 #Controller Class
          
@@ -285,37 +1364,89 @@ class FarmGame():
     maintaining instances of the model and view classes, event handling, and 
     facilitating communication between the model and view classes.
     """
-    def __init__(self, master: tk.Tk, map_file: str) -> None:
+    def __init__(self, master: tk.Tk, map_file: str,
+                 diagnostics_dir: str = '.', 
+                 day_length: Optional[float] = None,
+                 store_path: Optional[str] = None,
+                 environment: bool = False,
+                 image_cache: Optional[dict] = None,
+                 active: bool = True) -> None:
         """
         Sets the title of the window.
         Creates the FarmModel instance.
         Creates an instance of the current map.
         Creates an instance of the player from the FarmModel
-        Creates an instance of the player's inventory.
         Initialises an empty list to store each of the ItemViews.
         Creates the title banner.
         Creates instances of the view classes in the correct display format. 
         Creates a button to enable users to increment the day. When this button 
             is pressed, the model should advance to the next day with the view 
             classes reflecting appropriates changes in the model.
-        Bind the keypresses.
+        Unless active is False, activates the game, which binds the 
+            keypresses (and F9 to write a memory report) and starts the 
+            game loop.
+        If a store path is given, follows the farm in a SQLite database that
+            is written to at the end of each day and when the window closes.
+        If environment is True, soil moisture, fertility and pests are 
+            simulated instead of the classic rules.
         Calls the redraw method to ensure the view draws according to the
-            current model state.
+            current model state. The game loop runs the simulation at a 
+            fixed tick rate and redraws at a capped frame rate.
 
         Parameters:
-            tk.Tk: master root frame of the entire window
+            tk.Tk | tk.Frame: master root frame of the entire window, or 
+                the tab the game is played in
             str: string that maps to the map file 
+            str: directory that memory reports are written to. Defaults to
+                the current directory.
+            float: seconds per in-game day. If given, days advance in real
+                time as well as with the next day button. Defaults to None.
+            str: path of a SQLite database to store the farm's history in.
+                Defaults to None.
+            bool: whether to simulate the environment (needs NumPy). 
+                Defaults to False.
+            dict: sprite cache shared with other games. Defaults to a cache
+                of the game's own.
+            bool: whether to activate the game straight away. Defaults to 
+                True.
             
         Return:
             None
         """
         self._master = master
-        self._master.title('Farm Game')
+        self._master.winfo_toplevel().title('Farm Game')
         self._farmModel = FarmModel(map_file)
+        if environment:
+            self._farmModel.start_environment()
         self._currentMap = self._farmModel.get_map()
         self._player = self._farmModel.get_player()
-        self._inventory = self._player.get_inventory()
+        self._store = None
+        if store_path is not None:
+            self._store = CampaignStore(store_path)
+            self._store.attach(self._farmModel)
+            self._master.winfo_toplevel().protocol('WM_DELETE_WINDOW', 
+                                                   self.close)
+        #inventory version, selection and day the ItemViews were last drawn
+        #with
+        self._inventoryDrawn = -1
+        self._selectionDrawn = None
+        self._pricesDrawn = None
         self._itemViewList = []
+        self._diagnosticsDir = diagnostics_dir
+        self._memoryReports = []
+        self._chart = None
+        self._macro = None
+        self._history = UndoHistory(self._farmModel)
+        self._dayLength = day_length
+        self._dayTicks = 0
+        #when the game was last deactivated, or None while it is active
+        self._pausedAt = None
+        #movement keys held down, mapped to the tick of their last move
+        self._heldKeys = {}
+        self._pendingReleases = {}
+        self._moveFrom = self._farmModel.get_player_position()
+        self._moveStart = 0.0
+        self._redrawNeeded = False
         
         #create the banner
         headerFrame = tk.Frame(self._master)
@@ -330,9 +1461,23 @@ class FarmGame():
         #create the next day frame and button to ensure appropriate layout
         nextdayFrame = tk.Frame(self._master)
         nextdayFrame.pack(side = tk.BOTTOM)
+        #the quantity used by every buy and sell button
+        tk.Label(nextdayFrame, text = 'Quantity:').pack(side = tk.LEFT)
+        self._quantity = tk.Spinbox(nextdayFrame, from_ = 1, to = 9999,
+                                    width = 5)
+        self._quantity.pack(side = tk.LEFT, padx = 5)
+        sellAllButton = tk.Button(nextdayFrame, text = 'Sell all produce',
+                                  command = self.sell_all_produce)
+        sellAllButton.pack(side = tk.LEFT, padx = 5)
+        chartButton = tk.Button(nextdayFrame, text = 'Chart',
+                                command = self.show_chart)
+        chartButton.pack(side = tk.LEFT, padx = 5)
+        macroButton = tk.Button(nextdayFrame, text = 'Run macro',
+                                command = self.run_macro)
+        macroButton.pack(side = tk.LEFT, padx = 5)
         nextdayButton = tk.Button(nextdayFrame, text = 'Next day',
                                   command = self.next_day)
-        nextdayButton.pack(side = tk.BOTTOM)
+        nextdayButton.pack(side = tk.LEFT)
         
         #instantiate the InfoBar
         self._infoBar = InfoBar(self._master)
@@ -344,12 +1489,25 @@ class FarmGame():
         #instantiate the FarmView
         self._farmView = FarmView(self._master,
                             self._farmModel.get_dimensions(),
-                            (FARM_WIDTH,FARM_WIDTH)) 
+                            (FARM_WIDTH,FARM_WIDTH), image_cache) 
         self._farmView.pack(side=tk.LEFT)
-        self._farmView.redraw(read_map(map_file),
-                        self._farmModel.get_plants(),
-                        self._farmModel.get_player_position(), 
-                        self._farmModel.get_player_direction())         
+        #zooming draws sprites whose animations need frames of their own
+        for sequence in ('<MouseWheel>', '<Button-4>', '<Button-5>'):
+            self._farmView.bind(sequence, 
+                                lambda event: self._gameLoop.request_render(),
+                                add = '+')
+        
+        #instantiate the minimap, which scrolls the FarmView when clicked
+        self._minimap = MinimapView(self._master,
+                                    self._farmModel.get_dimensions(),
+                                    MINIMAP_SIZE, self.look_at)
+        self._minimap.pack(side=tk.LEFT, anchor=tk.N)
+        #inactive games are drawn when they are first activated
+        if active:
+            self._farmView.redraw(read_map(map_file),
+                            self._farmModel.get_plants(),
+                            self._farmModel.get_player_position(), 
+                            self._farmModel.get_player_direction())         
         
         #instantiate the ItemViews
         inventoryFrame = tk.Frame(self._master, 
@@ -374,14 +1532,355 @@ class FarmGame():
             #prevent frame from re-adjausting
             each_view.pack_propagate(False) 
         
-        self._master.bind("<KeyPress>", self.handle_keypress)
-        self.redraw()
+        if active:
+            self.redraw()
+        
+        self._gameLoop = GameLoop(self._master, self.tick, self.render,
+                                  TICK_RATE, MAX_FPS)
+        #every change to the model asks for a frame, which draws only what
+        #the journal says has changed since the last one
+        self._journal = self._farmModel.get_journal()
+        self._versionDrawn = self._journal.get_version()
+        self._journal.subscribe(self.handle_change)
+        if active:
+            self.activate()
+        else:
+            self._pausedAt = time.perf_counter()
+
+    def activate(self) -> None:
+        """Binds the window's keys to this game and starts its game loop. If
+            days pass in real time, the farm first fast-forwards through the
+            days that passed while the game was inactive, which clears the
+            undo history, and is then drawn in full once."""
+        window = self._master.winfo_toplevel()
+        window.bind("<KeyPress>", self.handle_keypress)
+        window.bind("<KeyRelease>", self.handle_keyrelease)
+        window.bind("<F9>", self.report_memory)
+        window.bind("<Control-z>", self.undo)
+        window.bind("<Control-y>", self.redo)
+        window.bind("<Control-Z>", self.redo)
+        window.bind("<Escape>", self.stop_macro)
+        if self._pausedAt is not None:
+            if self._dayLength:
+                tickLength = self._gameLoop.get_tick_length()
+                elapsed = (time.perf_counter() - self._pausedAt 
+                           + self._dayTicks * tickLength)
+                days, remainder = divmod(elapsed, self._dayLength)
+                self._dayTicks = int(remainder / tickLength)
+                if days:
+                    #the catch-up is not the player's action, and undoing
+                    #it would rewind days the player never saw
+                    self._farmModel.fast_forward(int(days))
+                    self._history.reset(self._farmModel)
+            self._pausedAt = None
+            self.request_redraw()
+        self._gameLoop.start()
+
+    def deactivate(self) -> None:
+        """Stops the game loop, so that the farm is neither simulated nor
+            drawn until the game is activated again, and forgets any held 
+            movement keys."""
+        self._gameLoop.stop()
+        self._pausedAt = time.perf_counter()
+        self._heldKeys.clear()
+        for afterId in self._pendingReleases.values():
+            self._master.after_cancel(afterId)
+        self._pendingReleases.clear()
+
+    def shutdown(self) -> None:
+        """Stops the game loop and writes the rest of the day to the 
+            database, if the farm is stored in one."""
+        self._gameLoop.stop()
+        if self._store is not None:
+            self._store.close()
+
+    def close(self) -> None:
+        """Writes the rest of the day to the database, then closes the 
+            window."""
+        self.shutdown()
+        self._master.winfo_toplevel().destroy()
+
+    def undo(self, event: Optional[tk.Event] = None) -> None:
+        """
+        Undoes the last action. The next frame redraws only the cells it 
+        changed.
+
+        Parameter:
+            tk.Event: the key press that requested the undo, if any
+            
+        Return:
+            None
+        """
+        if self._history.undo(self._farmModel) is not None:
+            self._moveFrom = self._farmModel.get_player_position()
+
+    def redo(self, event: Optional[tk.Event] = None) -> None:
+        """
+        Redoes the last undone action. The next frame redraws only the cells 
+        it changed.
+
+        Parameter:
+            tk.Event: the key press that requested the redo, if any
+            
+        Return:
+            None
+        """
+        if self._history.redo(self._farmModel) is not None:
+            self._moveFrom = self._farmModel.get_player_position()
+
+    def look_at(self, position: tuple[int, int]) -> None:
+        """
+        Minimap callback: scrolls the FarmView to the given farm position. 
+        The FarmView follows the player again once the player moves.
+
+        Parameter:
+            tuple[int, int]: the (row, col) farm position clicked
+            
+        Return:
+            None
+        """
+        self._farmView.look_at(position)
+        self.place_minimap_markers()
+        self._gameLoop.request_render()
+
+    def place_minimap_markers(self) -> None:
+        """Moves the minimap's player marker and FarmView outline."""
+        self._minimap.place_markers(self._farmModel.get_player_position(),
+                                    self._farmView.get_view_origin(),
+                                    self._farmView.get_visible_dimensions())
+
+    def run_macro(self) -> None:
+        """Asks for a macro script file, compiles it and starts playing it, 
+            a few actions per tick. Reports any error in the script."""
+        path = filedialog.askopenfilename(title = 'Run macro')
+        if not path:
+            return
+        try:
+            with open(path) as file:
+                program = compile_macro(file.read(), 
+                                        self._farmModel.get_dimensions())
+        except (OSError, MacroError) as error:
+            messagebox.showerror('Run macro', str(error))
+            return
+        self._macro = MacroRunner(self._farmModel, program)
+
+    def stop_macro(self, event: Optional[tk.Event] = None) -> None:
+        """Stops the macro being played, if there is one."""
+        self._macro = None
+
+    def tick(self) -> None:
+        """Advances the simulation by one game loop tick: plays the next 
+            actions of a running macro, repeats the move of the most recently
+            held movement key, and advances the day in real time if a day 
+            length was given."""
+        ticks = self._gameLoop.ticks
+        if self._macro is not None:
+            #each batch of actions is one step to undo, and its changes are
+            #drawn together on the next frame
+            self._macro.run(MACRO_ACTIONS_PER_TICK)
+            self._history.record(self._farmModel)
+            if self._macro.is_done():
+                self._macro = None
+        if self._heldKeys:
+            key = next(reversed(self._heldKeys))
+            if ticks - self._heldKeys[key] >= MOVE_REPEAT_TICKS:
+                self._heldKeys[key] = ticks
+                self.move_player(key)
+        if self._dayLength:
+            self._dayTicks += 1
+            if self._dayTicks * self._gameLoop.get_tick_length() >= \
+                    self._dayLength:
+                self._dayTicks = 0
+                self.next_day()
+
+    def render(self, alpha: float) -> bool:
+        """
+        Game loop render callback. Redraws whatever has changed since the 
+        last frame, advances the sprite animations, then places the player 
+        part way along its current move.
+
+        Parameters:
+            float: fraction of a tick since the last simulation tick
+            
+        Return:
+            bool: True while the player's move or any sprite animation is 
+                still being animated
+        """
+        if self._redrawNeeded:
+            self._redrawNeeded = False
+            self._versionDrawn = self._journal.get_version()
+            self.redraw()
+        else:
+            self.redraw_changes()
+        simTime = self._gameLoop.ticks + alpha
+        animating = self._farmView.animate(
+            simTime * self._gameLoop.get_tick_length())
+        progress = (simTime - self._moveStart) / MOVE_REPEAT_TICKS
+        if progress >= 1:
+            return animating
+        self._farmView.place_player(self._moveFrom,
+                                    self._farmModel.get_player_position(),
+                                    max(0.0, progress))
+        return True
+
+    def request_redraw(self) -> None:
+        """Marks the views as out of date. They are redrawn in full once on 
+            the next game loop frame, however many changes are made before 
+            it."""
+        self._redrawNeeded = True
+        self._gameLoop.request_render()
+
+    def handle_change(self, change: Change) -> None:
+        """Journal subscriber: asks the game loop for a frame whenever the 
+            model changes."""
+        self._gameLoop.request_render()
+
+    def redraw_changes(self) -> None:
+        """Redraws only the cells, players, InfoBar and ItemViews affected by
+            the changes journaled since the last frame, and pops the plants 
+            that grew a stage. Redraws everything if the journal no longer 
+            holds all of those changes."""
+        changes = self._journal.changes_since(self._versionDrawn)
+        if changes is None:
+            self._versionDrawn = self._journal.get_version()
+            self.redraw()
+            return
+        if not changes:
+            return
+        self._versionDrawn = self._journal.get_version()
+        kinds = {kind for _, kind, _, _ in changes}
+        cells = changed_cells(changes)
+        if PLAYER_MOVED in kinds:
+            self._farmView.follow_player()
+        if cells or kinds & {PLAYER_MOVED, PLAYER_TURNED}:
+            self._farmView.redraw_cells(self._currentMap,
+                                        self._farmModel.get_plants(), cells,
+                                        self._farmModel.get_player_position(),
+                                        self._farmModel.get_player_direction())
+            self._minimap.update_cells(self._currentMap,
+                                       self._farmModel.get_plants(), cells)
+            self.place_minimap_markers()
+        if PLANT_STAGED in kinds:
+            self._farmView.pop_plants(self._farmModel.get_plants(),
+                                      {position for _, kind, position, _ 
+                                       in changes if kind == PLANT_STAGED})
+        if kinds & {ENERGY_CHANGED, MONEY_CHANGED, DAY_CHANGED}:
+            self._infoBar.redraw(self._farmModel.get_days_elapsed(), 
+                                 self._player.get_money(),
+                                 self._player.get_energy())
+        if kinds & {INVENTORY_CHANGED, ITEM_SELECTED, DAY_CHANGED}:
+            self.redraw_items()
+        if DAY_CHANGED in kinds and self._chart is not None:
+            self.add_chart_point(self._farmModel.get_metrics().latest())
+
+    def show_chart(self) -> None:
+        """Opens the chart panel, plotting the farm's metrics history, or 
+            raises it if it is already open. While it is open, each new day
+            is appended to it."""
+        if self._chart is not None:
+            self._chart.winfo_toplevel().lift()
+            return
+        window = tk.Toplevel(self._master)
+        window.title('Farm metrics')
+        self._chart = ChartView(window, CHART_SERIES,
+                                (FARM_WIDTH + INVENTORY_WIDTH, CHART_HEIGHT))
+        self._chart.pack()
+        window.protocol('WM_DELETE_WINDOW', self.close_chart)
+        history = self._farmModel.get_metrics().query()
+        for row in zip(*history.values()):
+            self.add_chart_point(dict(zip(history, row)))
+
+    def close_chart(self) -> None:
+        """Closes the chart panel."""
+        self._chart.winfo_toplevel().destroy()
+        self._chart = None
+
+    def add_chart_point(self, row: Optional[dict[str, int]]) -> None:
+        """Appends a row of the metrics history to the chart panel. Summed 
+            metrics of rows covering several days are plotted per day."""
+        if row is None:
+            return
+        self._chart.add_point(row['day'], 
+                              {name: row[name] / row['days'] 
+                                         if name in SUMMED_COLUMNS 
+                                         else row[name]
+                               for name in CHART_SERIES})
+
+    def move_player(self, direction: str) -> None:
+        """
+        Moves the player in the given direction and starts the interpolated
+        movement of the player sprite, with a walk cycle lasting as long as 
+        the move. A player that only turns stops walking.
+
+        Parameters:
+            str: one of UP, DOWN, LEFT or RIGHT
+            
+        Return:
+            None
+        """
+        start = self._farmModel.get_player_position()
+        self._farmModel.move_player(direction)
+        if self._farmModel.get_player_position() != start:
+            self._moveFrom = start
+            self._moveStart = self._gameLoop.get_sim_time()
+            self._farmView.walk_player(direction, MOVE_REPEAT_TICKS 
+                                       * self._gameLoop.get_tick_length())
+        else:
+            self._farmView.stop_walk()
+        self._history.record(self._farmModel)
+
+    def handle_keyrelease(self, event: tk.Event) -> None:
+        """
+        An event handler to be called when a key is released. Releasing a
+        held movement key stops its repeated moves, after a short delay that
+        lets keyboard auto-repeat presses be told apart from real releases.
+
+        Parameter:
+            tk.Event: the key released
+            
+        Return:
+            None
+        """
+        key = event.char
+        if key in self._heldKeys and key not in self._pendingReleases:
+            self._pendingReleases[key] = self._master.after(
+                50, lambda: self.release_key(key))
+
+    def release_key(self, key: str) -> None:
+        """Stops the repeated moves of a released movement key."""
+        self._pendingReleases.pop(key, None)
+        self._heldKeys.pop(key, None)
+
+    def report_memory(self, event: Optional[tk.Event] = None) -> None:
+        """
+        Writes a memory report for the sprite cache, canvas items and model 
+        state to the diagnostics directory, along with a diff against the
+        previous report if there is one.
+
+        Parameter:
+            tk.Event: the key press that requested the report, if any
+            
+        Return:
+            None
+        """
+        report = diagnostics.collect_report(self._farmModel,
+                                            self._farmView._imageCache,
+                                            self._master)
+        self._memoryReports.append(report)
+        number = len(self._memoryReports)
+        path = os.path.join(self._diagnosticsDir, 'memory-{0}.json')
+        diagnostics.write_report(path.format(number), report)
+        if number > 1:
+            diff = diagnostics.diff_reports(self._memoryReports[-2], report)
+            diagnostics.write_report(path.format('{0}-{1}'.format(number - 1,
+                                                                  number)),
+                                     diff)
     
     def next_day(self):
         """Helper function: executes the two commands needed to advance to the 
             next day"""
         self._farmModel.new_day()
-        self.redraw()
+        self._history.record(self._farmModel)
         
     def redraw(self):
         """Redraws the FarmView, InfoBar and each ItemView based on the current 
@@ -390,19 +1889,42 @@ class FarmGame():
                               self._farmModel.get_plants(),
                               self._farmModel.get_player_position(), 
                               self._farmModel.get_player_direction())   
+        self._minimap.redraw(self._currentMap, self._farmModel.get_plants())
+        self.place_minimap_markers()
         
         self._infoBar.redraw(self._farmModel.get_days_elapsed(), 
                              self._player.get_money(),
                              self._player.get_energy())
         
-        for each_view in self._itemViewList:
+        self.redraw_items()
+
+    def redraw_items(self) -> None:
+        """Updates the ItemView prices once per day, then only the ItemViews 
+            whose amount or selection has changed since they were last drawn,
+            and nothing if neither has."""
+        day = self._farmModel.get_days_elapsed()
+        if day != self._pricesDrawn:
+            market = self._farmModel.get_market()
+            for each_view, buyPrice, sellPrice in zip(self._itemViewList,
+                                                      market.get_buy_prices(),
+                                                      market.get_sell_prices()):
+                each_view.update_prices(buyPrice, sellPrice)
+            self._pricesDrawn = day
+        
+        version = self._player.get_inventory_version()
+        selected = self._player.get_selected_item()
+        if version == self._inventoryDrawn and selected == self._selectionDrawn:
+            return
+        changed = set(self._player.inventory_changes(self._inventoryDrawn))
+        changed.update({selected, self._selectionDrawn})
+        amounts = self._player.get_amounts()
+        for itemId, each_view in enumerate(self._itemViewList):
             itemName = each_view.get_name()
-            itemAmount = self.get_inventory_amt(itemName)
-            #check if the ItemView is the selected item
-            if itemName == self._player.get_selected_item():
-                each_view.update(itemAmount, True)
-            else: #otherwise unselect the current one
-                each_view.update(itemAmount)
+            if itemName in changed or self._inventoryDrawn < 0:
+                #check if the ItemView is the selected item
+                each_view.update(amounts[itemId], itemName == selected)
+        self._inventoryDrawn = version
+        self._selectionDrawn = selected
         
     def handle_keypress(self, event: tk.Event) -> None:
         """
@@ -421,7 +1943,15 @@ class FarmGame():
                         's':DOWN,
                         'd':RIGHT}
         if event.char in player_moves:
-            self._farmModel.move_player(player_moves[event.char])
+            #auto-repeated presses of a held key are handled by tick()
+            if event.char in self._pendingReleases:
+                self._master.after_cancel(self._pendingReleases.pop(
+                    event.char))
+                return
+            if event.char in self._heldKeys:
+                return
+            self._heldKeys[event.char] = self._gameLoop.ticks
+            self.move_player(player_moves[event.char])
         
         #handle farming activities
         elif event.char == 't':
@@ -430,19 +1960,16 @@ class FarmGame():
             self._farmModel.untill_soil((self._farmModel.
                                          get_player_position()))
         elif event.char == 'p':
-            seeds = {'Potato Seed':PotatoPlant(), 
-                      'Kale Seed': KalePlant(),
-                      'Berry Seed': BerryPlant()}
             selected_item = self._player.get_selected_item()
             #test if the selected item is a seed
-            if selected_item in seeds:
-                plant = seeds[self._player.get_selected_item()]
+            if selected_item in SEED_FACTORIES:
                 #test if the player's position is soil
                 position = self._player.get_position()
                 row, col = position
                 if self._currentMap[row][col] == SOIL:
                     #test if there are seeds left to plant
-                    if selected_item in self._inventory:
+                    if self._player.get_amount(selected_item) > 0:
+                        plant = SEED_FACTORIES[selected_item]()
                         success = self._farmModel.add_plant(position, plant) 
                         #handle Exception errors to make sure only successful
                         #planting results in removing one seed from inventory
@@ -459,7 +1986,8 @@ class FarmGame():
             position = self._player.get_position()
             self._farmModel.remove_plant(position)        
         
-        self.redraw()
+        if event.char and event.char in 'tuphr':
+            self._history.record(self._farmModel)
         
     def select_item(self, item_name: str) -> None:
         """
@@ -476,13 +2004,12 @@ class FarmGame():
         #only select itemviews with amounts above 0
         if itemAmount != 0:
             self._player.select_item(item_name)
-
-        self.redraw()
                 
     def buy_item(self, item_name: str) -> None:
         """
-        The callback to be given to each ItemView that can buy item, then 
-        redraws the view to reflect changes.
+        The callback to be given to each ItemView that can buy item. Buys the
+        chosen quantity at the market price, only if all of it can be paid 
+        for, then redraws the view once to reflect changes.
         
         Parameters:
             str: the item name of the selected ItemView
@@ -490,13 +2017,14 @@ class FarmGame():
         Return:
             None  
         """
-        self._player.buy(item_name, BUY_PRICES[item_name])
-        self.redraw()
+        if self._farmModel.buy(item_name, self.get_quantity()):
+            self._history.record(self._farmModel)
     
     def sell_item(self, item_name: str) -> None:  
         """
-        The callback to be given to each ItemView for selling items, then 
-        redraws the view to reflect changes.
+        The callback to be given to each ItemView for selling items. Sells the
+        chosen quantity at the market price, only if the player has all of
+        it, then redraws the view once to reflect changes.
         
         Parameters:
             str: the item name of the selected ItemView
@@ -504,8 +2032,22 @@ class FarmGame():
         Return:
             None  
         """
-        self._player.sell(item_name, SELL_PRICES[item_name])
-        self.redraw()          
+        if self._farmModel.sell(item_name, self.get_quantity()):
+            self._history.record(self._farmModel)
+
+    def sell_all_produce(self) -> None:
+        """Sells all of the player's produce at the market price, then redraws
+            the view once to reflect changes."""
+        if self._farmModel.sell_all_produce():
+            self._history.record(self._farmModel)
+
+    def get_quantity(self) -> int:
+        """Returns the trade quantity entered by the player, or 0 if it is
+            not a whole number."""
+        try:
+            return int(self._quantity.get())
+        except ValueError:
+            return 0
     
     def get_inventory_amt (self, item_name: str) -> int:
         """
@@ -517,12 +2059,392 @@ class FarmGame():
         Return:
             int: the amount of the item in the inventory  
         """
-        if item_name in self._inventory:
-            itemAmount = self._inventory[item_name]
-        else:
-            itemAmount = 0
-        return itemAmount
+        return self._player.get_amount(item_name)
          
+class RemoteFarmGame(FarmGame):
+    """A FarmGame whose farm is hosted by a FarmServer. Actions are sent to the
+    server, and the views are redrawn from a local mirror of the farm that 
+    is kept up to date with the deltas the server broadcasts."""
+    def __init__(self, master: tk.Tk, map_file: str, host: str,
+                 port: int) -> None:
+        """
+        Connects to the server on a background asyncio thread, then sets up
+        the views in the same way as FarmGame and starts polling for deltas.
+
+        Parameters:
+            tk.Tk: master root frame of the entire window
+            str: string that maps to the map file the server is hosting
+            str: address of the server
+            int: port of the server
+            
+        Return:
+            None
+        """
+        self._client = server.FarmClient()
+        self._deltas = queue.Queue()
+        #own position when last drawn, so the view follows the player again
+        #once it moves
+        self._ownPosition = None
+        self._loop = asyncio.new_event_loop()
+        threading.Thread(target = self._loop.run_forever, daemon = True).start()
+        asyncio.run_coroutine_threadsafe(self._client.connect(host, port),
+                                         self._loop).result()
+        asyncio.run_coroutine_threadsafe(self.receive_deltas(), self._loop)
+        super().__init__(master, map_file)
+        self._master.winfo_toplevel().title('Farm Game - Player {0}'.format(
+            self._client.player_id))
+        self.poll_deltas()
+
+    async def receive_deltas(self) -> None:
+        """Runs on the asyncio thread, handing each delta from the server to
+            the tk thread."""
+        while (delta := await self._client.read_delta()) is not None:
+            self._deltas.put(delta)
+
+    def poll_deltas(self) -> None:
+        """Applies any deltas received since the last poll to the mirror and
+            redraws once if anything changed."""
+        changed = False
+        while not self._deltas.empty():
+            self._client.apply_delta(self._deltas.get())
+            changed = True
+        if changed:
+            self.request_redraw()
+        self._master.after(30, self.poll_deltas)
+
+    def send(self, action: str, **kwargs) -> None:
+        """Sends an action to the server without waiting for its delta."""
+        asyncio.run_coroutine_threadsafe(self._client.send(action, **kwargs),
+                                         self._loop)
+
+    def next_day(self):
+        """Asks the server to advance the farm to the next day."""
+        self.send('new_day')
+
+    def move_player(self, direction: str) -> None:
+        """Asks the server to move the player in the given direction."""
+        self.send('move', direction = direction)
+
+    def undo(self, event: Optional[tk.Event] = None) -> None:
+        """Undo is not available on a shared farm."""
+
+    def run_macro(self) -> None:
+        """Macros play against a local farm, so are not available on a shared
+            farm."""
+
+    def redo(self, event: Optional[tk.Event] = None) -> None:
+        """Redo is not available on a shared farm."""
+
+    def redraw(self):
+        """Redraws the FarmView, InfoBar and each ItemView from the mirrored
+            state of the server's farm."""
+        own = self._client.get_own_state()
+        others = [(tuple(state['p']), state['d'])
+                  for i, state in self._client.players.items()
+                  if i != self._client.player_id]
+        if tuple(own['p']) != self._ownPosition:
+            self._ownPosition = tuple(own['p'])
+            self._farmView.follow_player()
+        self._farmView.redraw(self._client.map, self._client.plants,
+                              tuple(own['p']), own['d'], others)
+        self._minimap.redraw(self._client.map, self._client.plants)
+        self._minimap.place_markers(tuple(own['p']),
+                                    self._farmView.get_view_origin(),
+                                    self._farmView.get_visible_dimensions())
+        self._infoBar.redraw(self._client.day, own['m'], own['e'])
+        buyPrices, sellPrices = self._client.prices
+        for itemId, each_view in enumerate(self._itemViewList):
+            itemName = each_view.get_name()
+            each_view.update(own['i'].get(itemName, 0), itemName == own['s'])
+            each_view.update_prices(buyPrices[itemId], sellPrices[itemId])
+
+    def handle_keypress(self, event: tk.Event) -> None:
+        """
+        Sends the action bound to the key pressed to the server. The view is
+        redrawn when the resulting delta arrives.
+
+        Parameter:
+            tk.Event: the key pressed
+            
+        Return:
+            None
+        """
+        actions = {'t': 'till', 'u': 'untill', 'p': 'plant', 'h': 'harvest',
+                   'r': 'remove'}
+        if event.char in MOVE_DELTAS:
+            super().handle_keypress(event)
+        elif event.char in actions:
+            self.send(actions[event.char])
+
+    def select_item(self, item_name: str) -> None:
+        """Asks the server to select the given item."""
+        if self._client.get_own_state()['i'].get(item_name, 0) != 0:
+            self.send('select', item = item_name)
+
+    def buy_item(self, item_name: str) -> None:
+        """Asks the server to buy the chosen quantity of the given item."""
+        self.send('buy', item = item_name, quantity = self.get_quantity())
+
+    def sell_item(self, item_name: str) -> None:
+        """Asks the server to sell the chosen quantity of the given item."""
+        self.send('sell', item = item_name, quantity = self.get_quantity())
+
+    def sell_all_produce(self) -> None:
+        """Asks the server to sell all of the player's produce."""
+        self.send('sell_all')
+
+    def get_inventory_amt (self, item_name: str) -> int:
+        """Returns the mirrored amount of the given item in the player's 
+            inventory."""
+        return self._client.get_own_state()['i'].get(item_name, 0)
+         
+class FarmTabs():
+    """The controller for several farms played in the tabs of one window. 
+    Each farm has its own FarmGame, and all of them share one sprite cache 
+    (the crop tables are shared by every model already). Only the farm in 
+    the selected tab runs its game loop and is drawn, so the number of farms
+    does not slow down the one being played. When a tab is selected again, 
+    its farm catches up on the days it missed before it is drawn.
+    """
+    def __init__(self, master: tk.Tk, map_files: list[str],
+                 diagnostics_dir: str = '.', 
+                 day_length: Optional[float] = None,
+                 environment: bool = False) -> None:
+        """
+        Creates a tab with a FarmGame for each map file, and activates the
+        game in the first tab.
+
+        Parameters:
+            tk.Tk: master root frame of the entire window
+            list[str]: the map file of each farm, in tab order
+            str: directory that memory reports are written to. Defaults to
+                the current directory.
+            float: seconds per in-game day. If given, days advance in real
+                time, including for the farms in other tabs. Defaults to 
+                None.
+            bool: whether to simulate the environment (needs NumPy). 
+                Defaults to False.
+            
+        Return:
+            None
+        """
+        self._master = master
+        self._notebook = ttk.Notebook(master)
+        self._notebook.pack(fill = tk.BOTH, expand = True)
+        imageCache = {}
+        self._games = []
+        for map_file in map_files:
+            tab = tk.Frame(self._notebook)
+            self._notebook.add(tab, text = os.path.basename(map_file))
+            self._games.append(FarmGame(tab, map_file, diagnostics_dir,
+                                        day_length, None, environment,
+                                        imageCache, active = False))
+        self._activeGame = None
+        self._notebook.bind('<<NotebookTabChanged>>', self.handle_tab_change)
+        self._master.protocol('WM_DELETE_WINDOW', self.close)
+        self.handle_tab_change()
+
+    def handle_tab_change(self, event: Optional[tk.Event] = None) -> None:
+        """
+        Tab change handler. Deactivates the game of the previous tab and 
+        activates the game of the selected one.
+
+        Parameters:
+            tk.Event: the tab change event, if any
+            
+        Return:
+            None
+        """
+        game = self._games[self._notebook.index('current')]
+        if game is self._activeGame:
+            return
+        if self._activeGame is not None:
+            self._activeGame.deactivate()
+        self._activeGame = game
+        game.activate()
+
+    def close(self) -> None:
+        """Shuts down every game, then closes the window."""
+        for game in self._games:
+            game.shutdown()
+        self._master.destroy()
+
+class MapEditor():
+    """The controller for editing a map file. Shows the map in a FarmView in
+    editor mode and paints GRASS, SOIL or UNTILLED tiles with a brush, 
+    rectangle or flood fill tool. Every edit is one batch of spans that 
+    rebuilds each changed row once, followed by one redraw of the changed 
+    rows. Clicking or dragging on the minimap pans the FarmView.
+    """
+    def __init__(self, master: tk.Tk, map_file: str,
+                 dimensions: tuple[int, int] = (10, 10)) -> None:
+        """
+        Loads the map file, or starts a new map of grass if it does not 
+        exist, and creates the toolbar and the FarmView.
+
+        Parameters:
+            tk.Tk: master root frame of the entire window
+            str: the map file to edit and save to
+            tuple[int, int]: the number of rows and columns of a new map. 
+                Defaults to 10 by 10.
+            
+        Return:
+            None
+        """
+        self._master = master
+        self._mapFile = map_file
+        if os.path.exists(map_file):
+            self._rows = read_map(map_file)
+        else:
+            self._rows = [GRASS * dimensions[1]] * dimensions[0]
+        self._corner = None
+        self._master.title('Farm Map Editor - {0}'.format(map_file))
+        
+        toolbar = tk.Frame(self._master)
+        toolbar.pack(side = tk.TOP, fill = tk.X)
+        self._tool = tk.StringVar(value = 'Brush')
+        for tool in ('Brush', 'Rectangle', 'Fill'):
+            tk.Radiobutton(toolbar, text = tool, value = tool, 
+                           variable = self._tool,
+                           indicatoron = False).pack(side = tk.LEFT)
+        self._tile = tk.StringVar(value = SOIL)
+        for tile in (GRASS, SOIL, UNTILLED):
+            tk.Radiobutton(toolbar, text = TILE_NAMES[tile], value = tile,
+                           variable = self._tile, 
+                           bg = TILE_COLOURS[tile]).pack(side = tk.LEFT,
+                                                         padx = 2)
+        tk.Label(toolbar, text = 'Brush size:').pack(side = tk.LEFT)
+        self._brushSize = tk.Spinbox(toolbar, from_ = 1, to = 99, width = 3)
+        self._brushSize.pack(side = tk.LEFT)
+        tk.Button(toolbar, text = 'Save as', 
+                  command = self.save_as).pack(side = tk.RIGHT)
+        tk.Button(toolbar, text = 'Save', 
+                  command = self.save).pack(side = tk.RIGHT)
+        
+        dimensions = (len(self._rows), len(self._rows[0]))
+        self._farmView = FarmView(self._master, dimensions,
+                                  (FARM_WIDTH, FARM_WIDTH))
+        self._farmView.pack(side = tk.LEFT, anchor = tk.N)
+        self._farmView.start_editing(self.handle_press, self.handle_drag,
+                                     self.handle_release)
+        #zooming changes how much of the map the minimap outlines
+        for sequence in ('<MouseWheel>', '<Button-4>', '<Button-5>'):
+            self._farmView.bind(sequence, 
+                                lambda event: self.place_minimap_markers(),
+                                add = '+')
+        self._minimap = MinimapView(self._master, dimensions, MINIMAP_SIZE,
+                                    self.look_at)
+        self._minimap.pack(side = tk.LEFT, anchor = tk.N)
+        self.redraw()
+
+    def redraw(self, spans: Optional[list[tuple[int, int, int]]] = None
+               ) -> None:
+        """
+        Redraws the map and the minimap, or only the rows of them that the 
+        given spans were painted on. Only the tiles that changed are copied 
+        into the FarmView's ground bitmap, or in flat tile mode only the 
+        changed rows are repainted.
+
+        Parameters:
+            list: (row, first column, end column) of each span that changed.
+                Defaults to redrawing everything.
+            
+        Return:
+            None
+        """
+        if spans is None:
+            self._farmView.redraw(self._rows, {}, None, None)
+            self._minimap.redraw(self._rows, {})
+        else:
+            #the FarmView only needs the cells in view of each changed row
+            originRow, originCol = self._farmView.get_view_origin()
+            visRows, visCols = self._farmView.get_visible_dimensions()
+            visible = [(row, col) for row in {row for row, _, _ in spans}
+                       if originRow <= row < originRow + visRows
+                       for col in range(originCol, originCol + visCols)]
+            self._farmView.redraw_cells(self._rows, {}, visible, None, None)
+            self._minimap.update_cells(self._rows, {}, 
+                                       [(row, col) for row, first, end in spans
+                                        for col in range(first, end)])
+        self.place_minimap_markers()
+
+    def look_at(self, position: tuple[int, int]) -> None:
+        """Minimap callback: pans the FarmView to centre on the given 
+            (row, col) map position."""
+        self._farmView.look_at(position)
+        self.place_minimap_markers()
+
+    def place_minimap_markers(self) -> None:
+        """Moves the minimap's outline of the part of the map being shown."""
+        self._minimap.place_markers(None, self._farmView.get_view_origin(),
+                                    self._farmView.get_visible_dimensions())
+
+    def paint(self, spans: list[tuple[int, int, int]]) -> None:
+        """
+        Paints the given spans with the selected tile as one batch, then 
+        redraws the rows that changed, if any.
+
+        Parameters:
+            list: (row, first column, end column) of each span to paint
+            
+        Return:
+            None
+        """
+        rows = set(paint_spans(self._rows, spans, self._tile.get()))
+        if rows:
+            self.redraw([span for span in spans if span[0] in rows])
+
+    def brush(self, position: tuple[int, int]) -> None:
+        """Paints a square of the brush size centred on a position."""
+        try:
+            size = max(1, int(self._brushSize.get()))
+        except ValueError:
+            size = 1
+        self.paint(brush_spans(position, size, 
+                               (len(self._rows), len(self._rows[0]))))
+
+    def handle_press(self, position: tuple[int, int]) -> None:
+        """Mouse press handler: starts a brush stroke or a rectangle, or 
+            flood fills the region that was clicked."""
+        tool = self._tool.get()
+        if tool == 'Brush':
+            self.brush(position)
+        elif tool == 'Rectangle':
+            self._corner = position
+            self._farmView.show_selection(position, position)
+        else:
+            self.paint(flood_fill(self._rows, position))
+
+    def handle_drag(self, position: tuple[int, int]) -> None:
+        """Mouse drag handler: continues a brush stroke, or stretches the 
+            rectangle being drawn."""
+        if self._tool.get() == 'Brush':
+            self.brush(position)
+        elif self._corner is not None:
+            self._farmView.show_selection(self._corner, position)
+
+    def handle_release(self, position: tuple[int, int]) -> None:
+        """Mouse release handler: paints the rectangle being drawn."""
+        if self._corner is not None:
+            self._farmView.hide_selection()
+            self.paint(rectangle_spans(self._corner, position))
+            self._corner = None
+
+    def save(self) -> None:
+        """Writes the map to its map file."""
+        write_map(self._mapFile, self._rows)
+
+    def save_as(self) -> None:
+        """Asks for a new map file, then writes the map to it."""
+        mapFile = filedialog.asksaveasfilename(
+            initialfile = os.path.basename(self._mapFile),
+            defaultextension = '.txt', 
+            filetypes = [('Map files', '*.txt')])
+        if mapFile:
+            self._mapFile = mapFile
+            self._master.title('Farm Map Editor - {0}'.format(mapFile))
+            self.save()
+
 def play_game(root: tk.Tk, map_file: str) -> None:
     """Constucts the controller instance using given map file and the root 
         tk.Tk parameter. Keeps the root window open to listen for events."""
@@ -532,11 +2454,60 @@ def play_game(root: tk.Tk, map_file: str) -> None:
 def main() -> None:
     """Constructs the root tk.TK instance. Calls the play_game function,
         passing in the newly created root tk.Tk instance and the path to a 
-        map file. """
+        map file. With --connect host:port, joins a multiplayer server 
+        instead, and with several maps, plays each farm in its own tab. 
+        With --edit, opens the map in the map editor instead of playing it. 
+        """
+    parser = argparse.ArgumentParser(description = 'Farm Game')
+    parser.add_argument('--map', nargs = '+', default = ['maps/map1.txt'],
+                        help = 'the map of each farm, in its own tab')
+    parser.add_argument('--connect', metavar = 'HOST:PORT')
+    parser.add_argument('--day-length', type = float, metavar = 'SECONDS',
+                        help = 'advance the day in real time')
+    parser.add_argument('--diagnostics', metavar = 'DIR',
+                        help = 'trace allocations from startup and write '
+                               'memory reports to DIR when F9 is pressed')
+    parser.add_argument('--store', metavar = 'DATABASE',
+                        help = 'store the farm and its history in a SQLite '
+                               'database')
+    parser.add_argument('--environment', action = 'store_true',
+                        help = 'simulate soil moisture, fertility and pests '
+                               '(needs NumPy)')
+    parser.add_argument('--edit', action = 'store_true',
+                        help = 'edit the map instead of playing it')
+    parser.add_argument('--size', type = int, nargs = 2, default = (10, 10),
+                        metavar = ('ROWS', 'COLUMNS'),
+                        help = 'the size of a new map made with --edit')
+    args = parser.parse_args()
+    if len(args.map) > 1 and (args.connect or args.store or args.edit):
+        parser.error('--connect, --store and --edit use a single --map')
+    if args.diagnostics:
+        os.makedirs(args.diagnostics, exist_ok = True)
+        diagnostics.start_tracing()
+    
     root = tk.Tk()
-    root.geometry('{0}x{1}'.format(str(FARM_WIDTH + INVENTORY_WIDTH), \
-                                str(FARM_WIDTH+INFO_BAR_HEIGHT+BANNER_HEIGHT+35)))
-    play_game(root, 'maps/map1.txt')
+    tabsHeight = TAB_HEIGHT if len(args.map) > 1 else 0
+    root.geometry('{0}x{1}'.format(str(FARM_WIDTH + MINIMAP_SIZE +
+                                       INVENTORY_WIDTH), \
+                                str(FARM_WIDTH+INFO_BAR_HEIGHT+BANNER_HEIGHT+35
+                                    +tabsHeight)))
+    if args.edit:
+        MapEditor(root, args.map[0], tuple(args.size))
+        root.mainloop()
+    elif args.connect:
+        host, port = args.connect.rsplit(':', 1)
+        RemoteFarmGame(root, args.map[0], host, int(port))
+        root.mainloop()
+    elif len(args.map) > 1:
+        FarmTabs(root, args.map, args.diagnostics or '.', args.day_length,
+                 args.environment)
+        root.mainloop()
+    elif args.diagnostics or args.day_length or args.store or args.environment:
+        FarmGame(root, args.map[0], args.diagnostics or '.', args.day_length,
+                 args.store, args.environment)
+        root.mainloop()
+    else:
+        play_game(root, args.map[0])
     
 
 if __name__ == '__main__':
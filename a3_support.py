@@ -1,21 +1,8 @@
 import tkinter as tk
-from PIL import ImageTk, Image
 from typing import Union
 from constants import *
-
-def read_map(map_file: str) -> list[str]:
-    """ Reads the map file and returns a list of strings, where each string
-        represents one row of the farm (first string represents top row), and
-        each character in a string represents a tile.
-
-    Parameters:
-        map_file: The path to the map file.
-
-    Returns:
-        A list of strings representing the tiles in the map.
-    """
-    with open(map_file, 'r') as file:
-        return [line.strip() for line in file.readlines()]
+from farmcore.crops import CROPS
+from farmcore.mapio import read_map
 
 def get_plant_image_name(plant: 'Plant') -> str:
     """ Returns the name of the appropriate image for the given plant at its
@@ -31,13 +18,32 @@ def get_plant_image_name(plant: 'Plant') -> str:
     Returns:
         The image name for the given plant.
     """
-    return f'plants/{plant.get_name()}/stage_{plant.get_stage()}.png'
+    return CROPS[plant.get_name()].get_image_name(plant.get_stage())
+
+def get_plant_sprite_names() -> list[str]:
+    """ Returns the names of the sprites of every stage of every crop, relative
+        to the images directory.
+    """
+    names = []
+    for crop in CROPS.values():
+        for stage in range(1, crop.final_stage + 1):
+            names.append(crop.get_image_name(stage))
+    return names
+
+def get_sprite_names() -> list[str]:
+    """ Returns the names of every ground, player and plant sprite, relative to
+        the images directory.
+
+    Returns:
+        The image names of all sprites that can be drawn on the farm.
+    """
+    return list(IMAGES.values()) + get_plant_sprite_names()
 
 def get_image(
         image_name: str,
         size: tuple[int, int],
-        cache: dict[str, ImageTk.PhotoImage] = None
-    ) -> ImageTk.PhotoImage:
+        cache: dict[str, 'ImageTk.PhotoImage'] = None
+    ) -> 'ImageTk.PhotoImage':
     """ Returns the cached image for image_id if one exists, otherwise creates a
         new one, caches and returns it.
 
@@ -49,6 +55,9 @@ def get_image(
     Returns:
         The image for the given image_name, resized appropriately.
     """
+    # PIL is only loaded once an image is first needed
+    from PIL import ImageTk, Image
+
     if cache is None or image_name not in cache:
         image = ImageTk.PhotoImage(image=Image.open(image_name).resize(size))
         if cache is not None:
@@ -57,9 +66,88 @@ def get_image(
         return cache[image_name]
     return image
 
+def draw_effect(sprite: 'Image.Image', effect: str,
+                amount: float) -> 'Image.Image':
+    """ Returns one frame of an animation effect applied to a sprite.
+
+    Parameters:
+        sprite: The RGBA sprite, already at its drawn size.
+        effect: 'sway' leans the top of the sprite sideways, 'pop' scales it
+            about the middle of its bottom edge, and 'walk' raises it.
+        amount: How far to lean, scale or raise, as a fraction of the size
+            of the sprite.
+
+    Returns:
+        The frame, the same size as the sprite.
+    """
+    from PIL import Image
+
+    width, height = sprite.size
+    if effect == 'sway':
+        lean = amount * width
+        # Each pixel of the frame is taken from the sprite, further left the
+        # higher up it is, so the bottom edge stays where it is
+        return sprite.transform(sprite.size, Image.AFFINE,
+                                (1, lean / height, -lean, 0, 1, 0),
+                                resample=Image.BILINEAR)
+    frame = Image.new('RGBA', sprite.size)
+    if effect == 'pop':
+        scaled = sprite.resize((max(1, round(width * (1 + amount))),
+                                max(1, round(height * (1 + amount)))))
+        frame.paste(scaled, ((width - scaled.width) // 2,
+                             height - scaled.height), scaled)
+    else:
+        frame.paste(sprite, (0, -round(amount * height)), sprite)
+    return frame
+
+def get_sprite_frames(
+        image_name: str,
+        size: tuple[int, int],
+        effect: str,
+        cache: dict[str, list['tk.PhotoImage']] = None
+    ) -> list['tk.PhotoImage']:
+    """ Returns the cached frames of an animation of a sprite if they exist,
+        otherwise draws them, caches and returns them. The frames are drawn
+        side by side into one sprite strip, which is handed to tk in a single
+        conversion and then sliced into an image per frame by tk itself.
+
+    Parameters:
+        image_name: The path to the sprite to animate.
+        size: The size to resize the sprite to, as (width, height).
+        effect: One of the ANIMATION_EFFECTS.
+        cache: The cache to use. If None, no caching is performed.
+
+    Returns:
+        The frames of the animation, in the order they are played.
+    """
+    key = '{0}#{1}'.format(image_name, effect)
+    if cache is not None and key in cache:
+        return cache[key]
+    from PIL import ImageTk, Image
+
+    width, height = size
+    amounts = ANIMATION_EFFECTS[effect]
+    sprite = Image.open(image_name).convert('RGBA').resize(size)
+    strip = Image.new('RGBA', (width * len(amounts), height))
+    for i, amount in enumerate(amounts):
+        strip.paste(draw_effect(sprite, effect, amount), (i * width, 0))
+    strip_image = ImageTk.PhotoImage(image=strip)
+    frames = []
+    for i in range(len(amounts)):
+        frame = tk.PhotoImage(width=width, height=height)
+        frame.tk.call(frame, 'copy', strip_image,
+                      '-from', i * width, 0, (i + 1) * width, height)
+        frames.append(frame)
+    if cache is not None:
+        cache[key] = frames
+    return frames
+
 class AbstractGrid(tk.Canvas):
     """ A type of tkinter Canvas that provides support for using the canvas as a
-        grid (i.e. a collection of rows and columns). """
+        grid (i.e. a collection of rows and columns). The pixel edges and
+        midpoints of every row and column are precomputed whenever the
+        dimensions or size change, so converting cells to pixels is a lookup.
+    """
 
     def __init__(
         self,
@@ -92,6 +180,31 @@ class AbstractGrid(tk.Canvas):
             dimensions: Dimensions of this grid as (#rows, #columns)
         """
         self._dimensions = dimensions
+        self.update_geometry()
+
+    def set_size(self, size: tuple[int, int]) -> None:
+        """ Sets the size of the grid and resizes the canvas to match.
+
+        Parameters:
+            size: (width in pixels, height in pixels)
+        """
+        self._size = size
+        self.configure(width=size[0] + 1, height=size[1] + 1)
+        self.update_geometry()
+
+    def update_geometry(self) -> None:
+        """ Precomputes the cell size and the pixel edges and midpoints of
+            every row and column. Subclasses whose cell size changes in other
+            ways call this after the change.
+        """
+        rows, cols = self._dimensions
+        cell_width, cell_height = self._cell_size = self.get_cell_size()
+        self._column_edges = [col * cell_width for col in range(cols + 1)]
+        self._row_edges = [row * cell_height for row in range(rows + 1)]
+        self._column_midpoints = [x + cell_width // 2
+                                  for x in self._column_edges[:-1]]
+        self._row_midpoints = [y + cell_height // 2
+                               for y in self._row_edges[:-1]]
 
     def get_cell_size(self) -> tuple[int, int]:
         """ Returns the size of the cells (width, height) in pixels. """
@@ -109,7 +222,7 @@ class AbstractGrid(tk.Canvas):
         Returns:
             The (row, col) cell position.
         """
-        cell_width, cell_height = self.get_cell_size()
+        cell_width, cell_height = self._cell_size
         return y // cell_height, x // cell_width
 
     def get_bbox(self, position: tuple[int, int]) -> tuple[int, int, int, int]:
@@ -122,7 +235,12 @@ class AbstractGrid(tk.Canvas):
             Bounding box for this position as (x_min, y_min, x_max, y_max).
         """
         row, col = position
-        cell_width, cell_height = self.get_cell_size()
+        if (0 <= row < len(self._row_midpoints)
+                and 0 <= col < len(self._column_midpoints)):
+            return (self._column_edges[col], self._row_edges[row],
+                    self._column_edges[col + 1], self._row_edges[row + 1])
+        # Cells outside the grid, e.g. just off the edge of a scrolled view
+        cell_width, cell_height = self._cell_size
         x_min, y_min = col * cell_width, row * cell_height
         x_max, y_max = x_min + cell_width, y_min + cell_height
         return x_min, y_min, x_max, y_max
@@ -138,7 +256,10 @@ class AbstractGrid(tk.Canvas):
             The x, y pixel position of the center of the cell.
         """
         row, col = position
-        cell_width, cell_height = self.get_cell_size()
+        if (0 <= row < len(self._row_midpoints)
+                and 0 <= col < len(self._column_midpoints)):
+            return self._column_midpoints[col], self._row_midpoints[row]
+        cell_width, cell_height = self._cell_size
         x_pos = col * cell_width + cell_width // 2
         y_pos = row * cell_height + cell_height // 2
         return x_pos, y_pos
@@ -0,0 +1,152 @@
+""" A shared scheduler for the sprite animations of a canvas.
+
+    One SpriteAnimator advances every animation of a canvas when it is
+    stepped, normally once per game loop frame, so there is no timer per
+    sprite and a step only does work for the animations that are running.
+    Frames are sliced from sprite strips ahead of time, so a step only
+    changes which frame an image shows.
+
+    There are two kinds of animation:
+      - Loops, such as swaying crops, are shared by every item that shows the
+        same sprite. Those items all show one display image, and a step
+        copies the loop's current frame into it, so a field of a thousand
+        swaying potatoes costs one image copy per frame. The canvas only has
+        items for the cells in view, so a loop whose items are all out of
+        view has no items and is paused.
+      - One-shot animations, such as a plant growing a stage or the player
+        walking, play their frames once on every item with a tag and then
+        show a final image. Items join a one-shot animation by being tagged,
+        so the plants of a new day that grow into the same sprite share one
+        animation and one itemconfigure per frame.
+"""
+import tkinter as tk
+from typing import Hashable
+
+
+class SpriteAnimator:
+    """ Plays the looped and one-shot sprite animations of a canvas. """
+
+    def __init__(self, canvas: tk.Canvas, loop_fps: float) -> None:
+        """ Constructor for an animator with no animations.
+
+        Parameters:
+            canvas: The canvas whose items are animated.
+            loop_fps: Frames per second of every loop.
+        """
+        self._canvas = canvas
+        self._loop_fps = loop_fps
+        # key -> [tag, frames, display image, frame shown]
+        self._loops = {}
+        # tag -> [frames, start time or None, duration, final image,
+        #         frame shown]
+        self._one_shots = {}
+        self._tags = 0
+        # the loop frame number last shown, and whether any loop had items
+        self._loop_tick = None
+        self._loops_running = False
+
+    def get_loop_image(
+            self,
+            key: Hashable,
+            frames: list[tk.PhotoImage]
+        ) -> tuple[tk.PhotoImage, str]:
+        """ Returns the display image of a loop, and the tag its items must
+            have for the loop to run, for a new item that shows the loop. The
+            loop is created on first use.
+
+        Parameters:
+            key: Identifies the loop, e.g. by sprite and size.
+            frames: The frames of the loop, used if it is created.
+        """
+        loop = self._loops.get(key)
+        if loop is None:
+            display = tk.PhotoImage(master=self._canvas,
+                                    width=frames[0].width(),
+                                    height=frames[0].height())
+            display.tk.call(display, 'copy', frames[0],
+                            '-compositingrule', 'set')
+            loop = [f'loop{len(self._loops)}', frames, display, 0]
+            self._loops[key] = loop
+        # the image is wanted for a new item, so the loop has one to run on
+        self._loops_running = True
+        return loop[2], loop[0]
+
+    def new_tag(self, prefix: str) -> str:
+        """ Returns a tag that no other animation uses, for a group of items
+            to play a one-shot animation on.
+        """
+        self._tags += 1
+        return f'{prefix}{self._tags}'
+
+    def play(self, tag: str, frames: list[tk.PhotoImage], duration: float,
+             final_image: tk.PhotoImage) -> None:
+        """ Plays frames once, evenly over a duration, on every item with a
+            tag, starting from the next step. At the end the items show the
+            final image and lose the tag. Playing a tag that is already
+            playing starts it again.
+
+        Parameters:
+            tag: The tag of the items to animate.
+            frames: The frames to play.
+            duration: The length of the animation in seconds.
+            final_image: The image the items show afterwards.
+        """
+        self._one_shots[tag] = [frames, None, duration, final_image, -1]
+
+    def stop(self, tag: str) -> None:
+        """ Stops a one-shot animation where it is, leaving its items showing
+            their current frame, and removes its tag from them.
+        """
+        if self._one_shots.pop(tag, None) is not None:
+            self._canvas.dtag(tag)
+
+    def is_playing(self, tag: str) -> bool:
+        """ Returns True iff a one-shot animation with the tag is playing. """
+        return tag in self._one_shots
+
+    def step(self, now: float) -> bool:
+        """ Shows the frame that every running animation should show at a
+            time, touching only the images and items whose frame changes.
+
+        Parameters:
+            now: The current time in seconds.
+
+        Returns:
+            True iff any animation is still running, so more steps are
+            wanted.
+        """
+        canvas = self._canvas
+        tick = int(now * self._loop_fps)
+        # loops only change frame a few times a second, and are left alone
+        # by the steps in between
+        if tick != self._loop_tick:
+            self._loop_tick = tick
+            self._loops_running = False
+            for phase, loop in enumerate(self._loops.values()):
+                tag, frames, display, shown = loop
+                # type() looks at the first item with the tag only, so
+                # checking for items costs the same however many there are
+                if canvas.type(tag) is None:
+                    continue
+                self._loops_running = True
+                # each sprite starts at a different frame, so the whole
+                # field does not sway in step
+                frame = (tick + phase) % len(frames)
+                if frame != shown:
+                    display.tk.call(display, 'copy', frames[frame],
+                                    '-compositingrule', 'set')
+                    loop[3] = frame
+
+        for tag, one_shot in list(self._one_shots.items()):
+            frames, start, duration, final_image, shown = one_shot
+            if start is None:
+                start = one_shot[1] = now
+            frame = int((now - start) / duration * len(frames))
+            if frame >= len(frames):
+                canvas.itemconfigure(tag, image=final_image)
+                canvas.dtag(tag)
+                del self._one_shots[tag]
+            elif frame != shown:
+                canvas.itemconfigure(tag, image=frames[frame])
+                one_shot[4] = frame
+        return self._loops_running or bool(self._one_shots)
@@ -1,20 +1,6 @@
-# Map representation of different tiles
-GRASS = 'G'
-SOIL = 'S'
-UNTILLED = 'U'
-
-# Constants related to moving the player
-UP = 'w'
-DOWN = 's'
-LEFT = 'a'
-RIGHT = 'd'
-
-MOVE_DELTAS = {
-    LEFT: (0, -1),
-    DOWN: (1, 0),
-    RIGHT: (0, 1),
-    UP: (-1, 0),
-}
+# The rules of the game (tiles, directions, costs, items and prices) are
+# defined in farmcore/constants.py. This file adds what the GUI needs
+from farmcore.constants import *
 
 # Colours
 INVENTORY_COLOUR = '#fdc074'
@@ -33,54 +19,75 @@ IMAGES = {
     RIGHT: 'player_d.png',
 }
 
+# Colours used for the flat tile mode of a zoomed out FarmView
+TILE_COLOURS = {
+    GRASS: '#6aa84f',
+    SOIL: '#7a5230',
+    UNTILLED: '#b08d57',
+}
+PLANT_COLOURS = {crop.name: crop.colour for crop in CROPS.values()}
+PLAYER_COLOUR = '#1565c0'
+VIEWPORT_COLOUR = '#ffffff'
+
+# Hover inspector highlight and tooltip
+HOVER_COLOUR = '#ffeb3b'
+TOOLTIP_COLOUR = '#fffde7'
+TILE_NAMES = {
+    GRASS: 'Grass',
+    SOIL: 'Tilled soil',
+    UNTILLED: 'Untilled soil',
+}
+
+# Metrics plotted by the chart panel, and the colour of each line
+CHART_SERIES = {
+    'money': '#2e7d32',
+    'energy_used': '#c62828',
+    'tilled': '#7a5230',
+}
+
 # Fonts
 HEADING_FONT = ('Helvetica', 15, 'bold')
+TOOLTIP_FONT = ('Helvetica', 10)
 
 # Dimensions
 FARM_WIDTH = 500
 INVENTORY_WIDTH = 200
 INFO_BAR_HEIGHT = 90
 BANNER_HEIGHT = 130
+CHART_HEIGHT = 200
+MINIMAP_SIZE = 150
+CHART_MARGIN = 20
+TAB_HEIGHT = 25
 
-# Energy cost of actions (only applied if action was successful)
-MOVE_COST = 1
-HARVEST_COST = 3
-PLANT_COST = 2
-REMOVE_COST = 2
-TILL_COST = 3
-UNTILL_COST = 3
+# Cell sizes (in pixels) that the FarmView can be zoomed between. The size that
+# fits the whole map into FARM_WIDTH is always added as an extra level.
+ZOOM_LEVELS = (1, 2, 3, 4, 6, 8, 12, 16, 24, 32, 48, 64)
 
-# All seeds available in the game
-SEEDS = [
-    'Potato Seed',
-    'Kale Seed',
-    'Berry Seed',
-]
+# Cells smaller than this are drawn as flat colours rather than sprites
+FLAT_TILE_SIZE = 8
 
-# All items, listed in the order in which they should appear in the inventory
-ITEMS = [
-    'Potato Seed',
-    'Kale Seed',
-    'Berry Seed',
-    'Potato',
-    'Kale',
-    'Berry',
-]
-    
-# How much it costs to buy certain items from the store
-# Any items not listed cannot be bought at the store
-BUY_PRICES = {
-    'Potato Seed': 10,
-    'Kale Seed': 70,
-    'Berry Seed': 80,
-}
+# Game loop rates. The simulation always runs at TICK_RATE ticks per second,
+# while rendering is capped at MAX_FPS frames per second
+TICK_RATE = 30
+MAX_FPS = 60
 
-# How much you can sell items for at the store
-SELL_PRICES = {
-    'Potato Seed': 5,
-    'Potato': 25,
-    'Kale Seed': 35,
-    'Kale': 110,
-    'Berry': 50,
-    'Berry Seed': 40,
+# Macro actions performed per game loop tick when a macro runs in the game
+MACRO_ACTIONS_PER_TICK = 2
+
+# Ticks between moves while a movement key is held down
+MOVE_REPEAT_TICKS = 5
+
+# Sprite animation effects, each a list of per-frame amounts as fractions of
+# the sprite size: how far the top of a swaying crop leans, how much larger
+# than its cell a plant that has grown a stage is drawn, and how high the
+# player bobs while walking
+ANIMATION_EFFECTS = {
+    'sway': (0, 0.05, 0, -0.05),
+    'pop': (-0.3, 0.15, 0.05, 0),
+    'walk': (0, 0.06, 0, 0.06),
 }
+
+# Sway frames per second, and the length in seconds of a growth pop. A walk
+# cycle lasts as long as the move it animates
+SWAY_FPS = 3
+POP_DURATION = 0.3
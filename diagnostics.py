@@ -0,0 +1,170 @@
+""" Memory accounting for the farm game.
+
+    A report breaks the process's memory down by subsystem: the sprite cache,
+    the tk canvas items of every AbstractGrid, the model's plants, map and
+    player inventories. Python side sizes are measured by walking the objects,
+    tk images are sized from their pixel dimensions, and if tracemalloc is
+    running the report also includes the traced total and the largest
+    allocation sites. Two reports can be diffed to see what grew between two
+    points in time, and both reports and diffs are written as JSON so that
+    soak tests can assert on them.
+"""
+import gc
+import json
+import time
+import tracemalloc
+from collections import Counter
+from typing import Optional
+from farmcore.sizeof import deep_sizeof
+
+# Tk stores photo images as 4 bytes per pixel
+PHOTO_BYTES_PER_PIXEL = 4
+
+# Object types counted in every report
+COUNTED_TYPES = ('Plant', 'Player', 'FarmModel', 'PhotoImage', 'RemotePlant')
+
+
+def start_tracing(frames: int = 1) -> None:
+    """ Starts tracemalloc if it is not already running. Allocations made
+        before this call are not attributed to their source lines.
+
+    Parameters:
+        frames: The number of stack frames stored per allocation.
+    """
+    if not tracemalloc.is_tracing():
+        tracemalloc.start(frames)
+
+
+def count_objects() -> dict[str, int]:
+    """ Returns the number of live objects of each of the COUNTED_TYPES. """
+    counts = Counter(type(obj).__name__ for obj in gc.get_objects())
+    return {name: counts.get(name, 0) for name in COUNTED_TYPES}
+
+
+def sprite_cache_usage(image_cache: dict) -> dict:
+    """ Returns the number of images and their pixel memory in a sprite cache,
+        which maps image names (or sizes to nested caches) to images or lists
+        of animation frames.
+
+    Parameters:
+        image_cache: The cache to measure.
+    """
+    images = 0
+    pixels = 0
+    stack = [image_cache]
+    while stack:
+        for image in stack.pop().values():
+            if isinstance(image, dict):
+                stack.append(image)
+            elif isinstance(image, list):
+                # the frames of an animation
+                stack.append(dict(enumerate(image)))
+            else:
+                images += 1
+                pixels += image.width() * image.height()
+    return {'objects': images, 'bytes': pixels * PHOTO_BYTES_PER_PIXEL}
+
+
+def canvas_item_counts(root: 'tk.Misc') -> dict[str, int]:
+    """ Returns the number of live canvas items in every AbstractGrid below
+        the given widget, keyed by the grid's class and tk path name.
+
+    Parameters:
+        root: The widget to search from, usually the tk root.
+    """
+    from a3_support import AbstractGrid
+
+    counts = {}
+    stack = [root]
+    while stack:
+        widget = stack.pop()
+        if isinstance(widget, AbstractGrid):
+            name = f'{type(widget).__name__}{widget}'
+            counts[name] = len(widget.find_all())
+        stack.extend(widget.winfo_children())
+    return counts
+
+
+def collect_report(
+        model: 'FarmModel',
+        image_cache: Optional[dict] = None,
+        root: Optional['tk.Misc'] = None,
+        top: int = 10
+    ) -> dict:
+    """ Measures the memory used by each subsystem of the game.
+
+    Parameters:
+        model: The farm to measure.
+        image_cache: The FarmView sprite cache, if there is a view.
+        root: The tk root, if there is a window.
+        top: The number of allocation sites to list if tracemalloc is running.
+
+    Returns:
+        The report, as a JSON serialisable dictionary.
+    """
+    from farmcore.crops import CROPS
+
+    shared = {id(crop) for crop in CROPS.values()}
+    plants = model.get_plants()
+    players = model.get_players()
+    report = {
+        'time': time.time(),
+        'day': model.get_days_elapsed(),
+        'subsystems': {
+            'plants': {'objects': len(plants),
+                       'bytes': deep_sizeof(plants, shared)},
+            'map': {'objects': len(model.get_map()),
+                    'bytes': deep_sizeof(model.get_map(), shared)},
+            'inventories': {
+                'objects': sum(len(p.get_amounts()) for p in players),
+                'bytes': sum(deep_sizeof(p.get_amounts(), shared)
+                             for p in players)},
+        },
+        'objects': count_objects(),
+    }
+    if image_cache is not None:
+        report['subsystems']['sprite_cache'] = sprite_cache_usage(image_cache)
+    if root is not None:
+        report['canvas_items'] = canvas_item_counts(root)
+    if tracemalloc.is_tracing():
+        current, peak = tracemalloc.get_traced_memory()
+        statistics = tracemalloc.take_snapshot().statistics('lineno')
+        report['tracemalloc'] = {
+            'current': current,
+            'peak': peak,
+            'top': [{'site': str(stat.traceback), 'bytes': stat.size,
+                     'count': stat.count} for stat in statistics[:top]],
+        }
+    return report
+
+
+def diff_reports(before: dict, after: dict) -> dict:
+    """ Returns how every number in a report changed between two reports.
+        Entries that only appear in one report are compared against zero,
+        and lists such as the top allocation sites are taken from after.
+
+    Parameters:
+        before: The earlier report.
+        after: The later report.
+    """
+    diff = {}
+    for key in before.keys() | after.keys():
+        old, new = before.get(key, 0), after.get(key, 0)
+        if isinstance(old, dict) or isinstance(new, dict):
+            diff[key] = diff_reports(old or {}, new or {})
+        elif isinstance(new, (int, float)) and isinstance(old, (int, float)):
+            diff[key] = new - old
+        else:
+            diff[key] = new
+    return diff
+
+
+def write_report(path: str, report: dict) -> None:
+    """ Writes a report or diff to a JSON file.
+
+    Parameters:
+        path: The file to write.
+        report: The report to write.
+    """
+    with open(path, 'w') as file:
+        json.dump(report, file, indent=2, sort_keys=True)
@@ -0,0 +1,445 @@
+""" Exports a farm's history as an animated GIF or a PNG sequence.
+
+    A macro script, which is how a session is recorded, is played against a
+    FarmModel, and a frame is taken after every action or every day. The
+    farm can then be left to grow for a number of days, or simulated
+    headlessly with no script at all. Frames are drawn offscreen with PIL
+    from the same sprites as the FarmView, or for tiles smaller than
+    FLAT_TILE_SIZE the same flat colours, without Tk.
+
+    Only the first frame is drawn in full. For every later frame the model's
+    journal gives the cells that changed since the frame before, and the
+    frame is a delta: the contents of the smallest rectangle of cells that
+    covers them. The main process only runs the simulation and works out
+    the deltas; they are drawn and encoded in batches on a process pool.
+    A worker draws only the rectangle of a delta, pasting cell images it
+    composes once and caches, and encodes it as a GIF image block placed at
+    the rectangle's offset on top of the frame before, or as a cropped PNG.
+    The main process writes the encoded frames in order as batches finish,
+    with only a few batches in flight at once, so memory stays flat however
+    many frames are exported. Every frame uses one palette built from all
+    the sprites, so no delta needs a colour table of its own.
+
+    A PNG sequence is a directory of the cropped frames, with frames.csv
+    giving the pixel rectangle each one covers.
+
+    e.g.
+        python export.py patch.txt --map maps/map1.txt --out patch.gif
+        python export.py --days 300 --every day --out season --workers 4
+"""
+import argparse
+import csv
+import os
+import struct
+import time
+from collections import deque
+from itertools import islice
+from multiprocessing import Pool
+from typing import Iterable, Iterator, Optional
+from PIL import GifImagePlugin, Image
+from model import *
+from macros import MacroRunner, compile_macro
+
+# A cell as drawn: (tile, crop name, stage, player direction), where the
+# crop is None with no plant and the direction None with no player
+CellKey = tuple[str, Optional[str], int, Optional[str]]
+
+# A delta: the top row and left column of a rectangle of cells, and the
+# cells in each of its rows
+Delta = tuple[int, int, list[tuple[CellKey, ...]]]
+
+# The pixel rectangle (x, y, width, height) an encoded frame covers, and its
+# GIF image block, or None for a PNG that the worker has already written
+EncodedFrame = tuple[int, int, int, int, Optional[bytes]]
+
+# Frames per pool task, and pool tasks in flight per worker
+DEFAULT_BATCH_SIZE = 64
+BATCHES_IN_FLIGHT = 2
+
+
+class DeltaRecorder:
+    """ Gathers the cells of a farm that change between frames from the
+        farm's journal.
+    """
+
+    def __init__(self, model: FarmModel) -> None:
+        """ Constructor for a recorder that has not taken a frame yet.
+
+        Parameters:
+            model: The farm to record.
+        """
+        self._model = model
+        self._journal = model.get_journal()
+        self._version = self._journal.get_version()
+        self._player_position = model.get_player_position()
+        # cells changed since the last frame, or None if every cell has
+        self._pending = None
+
+    def collect(self) -> None:
+        """ Adds the cells changed since the last call to the cells of the
+            next frame. Collecting after each action keeps the journal from
+            losing changes between frames that are far apart.
+        """
+        changes = self._journal.changes_since(self._version)
+        self._version = self._journal.get_version()
+        if self._pending is None:
+            return
+        if changes is None:
+            self._pending = None
+            return
+        self._pending |= changed_cells(changes)
+        if any(kind in (PLAYER_MOVED, PLAYER_TURNED)
+               for _, kind, _, _ in changes):
+            self._pending.add(self._player_position)
+            self._player_position = self._model.get_player_position()
+            self._pending.add(self._player_position)
+
+    def take(self) -> Optional[Delta]:
+        """ Returns the delta of the next frame, the whole farm for the
+            first frame, or None if no cell has changed since the last frame.
+        """
+        self.collect()
+        cells, self._pending = self._pending, set()
+        if cells is None:
+            rows, columns = self._model.get_dimensions()
+            self._player_position = self._model.get_player_position()
+            return self.cells_in(0, 0, rows, columns)
+        if not cells:
+            return None
+        rows = [row for row, _ in cells]
+        columns = [col for _, col in cells]
+        return self.cells_in(min(rows), min(columns),
+                             max(rows) + 1, max(columns) + 1)
+
+    def cells_in(self, top: int, left: int, bottom: int,
+                 right: int) -> Delta:
+        """ Returns the delta of the cells in rows top to bottom - 1 and
+            columns left to right - 1.
+        """
+        ground = self._model.get_map()
+        plants = self._model.get_plants()
+        player = self._model.get_player_position()
+        direction = self._model.get_player_direction()
+        keys = []
+        for row in range(top, bottom):
+            line = ground[row]
+            row_keys = []
+            for col in range(left, right):
+                plant = plants.get((row, col))
+                row_keys.append((line[col],
+                                 plant and plant.get_name(),
+                                 plant.get_stage() if plant else 0,
+                                 direction if (row, col) == player else None))
+            keys.append(tuple(row_keys))
+        return top, left, keys
+
+
+def iter_deltas(
+        model: FarmModel,
+        runner: Optional[MacroRunner] = None,
+        every: str = 'action',
+        days: int = 0
+    ) -> Iterator[Delta]:
+    """ Plays a macro against a farm, then ends the day a number of times,
+        yielding the delta of each frame as it goes. Frames in which nothing
+        changed are left out.
+
+    Parameters:
+        model: The farm.
+        runner: Plays the recorded session, if there is one.
+        every: 'action' to take a frame after every action of the macro, or
+            'day' to take one whenever a day ends.
+        days: The number of days to simulate after the macro.
+    """
+    recorder = DeltaRecorder(model)
+    yield recorder.take()
+    day = model.get_days_elapsed()
+    while runner is not None and not runner.is_done():
+        runner.run(1)
+        if every == 'action' or model.get_days_elapsed() != day:
+            day = model.get_days_elapsed()
+            delta = recorder.take()
+            if delta is not None:
+                yield delta
+        else:
+            recorder.collect()
+    for _ in range(days):
+        model.new_day()
+        delta = recorder.take()
+        if delta is not None:
+            yield delta
+
+
+class FrameRenderer:
+    """ Draws deltas with PIL, from cell images composed once and cached.
+    """
+
+    def __init__(self, tile_size: int) -> None:
+        """ Constructor for a renderer. Builds the palette of every frame.
+
+        Parameters:
+            tile_size: The width and height of a cell in pixels.
+        """
+        self._tile_size = tile_size
+        self._flat = tile_size < FLAT_TILE_SIZE
+        self._sprites = {}
+        self._cells = {}
+        self.palette = self.build_palette()
+
+    def get_sprite(self, image_name: str) -> Image.Image:
+        """ Returns the RGBA sprite with the given name, resized to a cell.
+        """
+        sprite = self._sprites.get(image_name)
+        if sprite is None:
+            sprite = Image.open(f'images/{image_name}').convert('RGBA')
+            sprite = sprite.resize((self._tile_size, self._tile_size))
+            self._sprites[image_name] = sprite
+        return sprite
+
+    def compose(self, key: CellKey) -> Image.Image:
+        """ Returns a cell drawn in full colour: its tile, then its plant,
+            then the player. In flat mode the cell is one colour, of the
+            player, else the plant, else the tile, as in the FarmView.
+        """
+        tile, crop, stage, direction = key
+        size = (self._tile_size, self._tile_size)
+        if self._flat:
+            colour = (PLAYER_COLOUR if direction
+                      else PLANT_COLOURS[crop] if crop
+                      else TILE_COLOURS[tile])
+            return Image.new('RGB', size, colour)
+        cell = self.get_sprite(IMAGES[tile]).copy()
+        if crop:
+            plant = self.get_sprite(CROPS[crop].get_image_name(stage))
+            cell.alpha_composite(plant)
+        if direction:
+            cell.alpha_composite(self.get_sprite(IMAGES[direction]))
+        return cell.convert('RGB')
+
+    def build_palette(self) -> Image.Image:
+        """ Returns a palette image with up to 256 colours, taken from every
+            ground tile, plant on tilled soil and player on grass. The
+            palette only depends on the tile size, so every process that
+            builds it gets the same one.
+        """
+        keys = [(tile, None, 0, None) for tile in TILE_COLOURS]
+        keys += [(SOIL, crop.name, stage, None) for crop in CROPS.values()
+                 for stage in range(1, crop.final_stage + 1)]
+        keys += [(GRASS, None, 0, direction)
+                 for direction in (UP, DOWN, LEFT, RIGHT)]
+        size = self._tile_size
+        sheet = Image.new('RGB', (size * len(keys), size))
+        for i, key in enumerate(keys):
+            sheet.paste(self.compose(key), (i * size, 0))
+        return sheet.quantize(256, method=Image.Quantize.MEDIANCUT,
+                              dither=Image.Dither.NONE)
+
+    def get_cell(self, key: CellKey) -> Image.Image:
+        """ Returns the cached cell with the given key, mapped to the palette.
+        """
+        cell = self._cells.get(key)
+        if cell is None:
+            cell = self.compose(key).quantize(palette=self.palette,
+                                              dither=Image.Dither.NONE)
+            self._cells[key] = cell
+        return cell
+
+    def draw(self, delta: Delta) -> tuple[int, int, Image.Image]:
+        """ Draws the rectangle of a delta.
+
+        Returns:
+            The pixel (x, y) of the rectangle in the frame, and its image.
+        """
+        top, left, keys = delta
+        size = self._tile_size
+        image = Image.new('P', (len(keys[0]) * size, len(keys) * size))
+        image.putpalette(self.palette.getpalette())
+        for i, row in enumerate(keys):
+            for j, key in enumerate(row):
+                image.paste(self.get_cell(key), (j * size, i * size))
+        return left * size, top * size, image
+
+
+# The renderer and options of a pool worker, set by _init_worker
+_worker = {}
+
+
+def _init_worker(tile_size: int, duration: int,
+                 directory: Optional[str]) -> None:
+    """ Pool initializer: builds the worker's renderer.
+
+    Parameters:
+        tile_size: The width and height of a cell in pixels.
+        duration: The milliseconds each GIF frame is shown for.
+        directory: The directory to write PNG frames to, or None to encode
+            GIF image blocks.
+    """
+    _worker['renderer'] = FrameRenderer(tile_size)
+    _worker['duration'] = duration
+    _worker['directory'] = directory
+
+
+def _encode_batch(batch: list[tuple[int, Delta]]) -> list[EncodedFrame]:
+    """ Pool task: draws and encodes a batch of numbered deltas. """
+    renderer = _worker['renderer']
+    directory = _worker['directory']
+    encoded = []
+    for index, delta in batch:
+        x, y, image = renderer.draw(delta)
+        data = None
+        if directory is None:
+            # disposal 1 leaves the frame in place, so the next delta is
+            # drawn on top of it
+            data = b''.join(GifImagePlugin.getdata(
+                image, offset=(x, y), duration=_worker['duration'],
+                disposal=1))
+        else:
+            image.save(os.path.join(directory, f'frame{index:06d}.png'))
+        encoded.append((x, y, image.width, image.height, data))
+    return encoded
+
+
+def gif_header(width: int, height: int, palette: list[int]) -> bytes:
+    """ Returns the header of a looping GIF with a global colour table.
+
+    Parameters:
+        width: The width of the animation in pixels.
+        height: The height of the animation in pixels.
+        palette: The 256 colours of the table, as flat R, G, B values.
+    """
+    colours = bytes(palette[:768]).ljust(768, b'\0')
+    # 0xf7: a global table of 2 ** (7 + 1) colours
+    return (b'GIF89a' + struct.pack('<HHBBB', width, height, 0xf7, 0, 0)
+            + colours
+            # loop forever
+            + b'!\xff\x0bNETSCAPE2.0\x03\x01' + struct.pack('<H', 0) + b'\0')
+
+
+def export(
+        deltas: Iterable[Delta],
+        dimensions: tuple[int, int],
+        path: str,
+        tile_size: int = 16,
+        duration: int = 100,
+        workers: int = 1,
+        batch_size: int = DEFAULT_BATCH_SIZE
+    ) -> int:
+    """ Draws and writes the frames of an export.
+
+    Parameters:
+        deltas: The delta of every frame, in order, starting with the whole
+            farm.
+        dimensions: The (rows, columns) of the farm.
+        path: The GIF file to write if it ends in .gif, otherwise the
+            directory to write a PNG sequence to.
+        tile_size: The width and height of a cell in pixels.
+        duration: The milliseconds each GIF frame is shown for.
+        workers: The number of worker processes. With one, frames are drawn
+            in this process.
+        batch_size: The number of frames drawn by each pool task.
+
+    Returns:
+        The number of frames written.
+    """
+    is_gif = path.lower().endswith('.gif')
+    directory = None if is_gif else path
+    if directory is not None:
+        os.makedirs(directory, exist_ok=True)
+    numbered = enumerate(deltas)
+    batches = iter(lambda: list(islice(numbered, batch_size)), [])
+
+    pool = None
+    if workers > 1:
+        pool = Pool(workers, _init_worker, (tile_size, duration, directory))
+    else:
+        _init_worker(tile_size, duration, directory)
+    frames = 0
+    with open(path if is_gif else os.path.join(directory, 'frames.csv'),
+              'wb' if is_gif else 'w', newline=None if is_gif else '') as out:
+        if is_gif:
+            rows, columns = dimensions
+            palette = FrameRenderer(tile_size).palette.getpalette()
+            out.write(gif_header(columns * tile_size, rows * tile_size,
+                                 palette))
+        else:
+            index = csv.writer(out)
+            index.writerow(['frame', 'x', 'y', 'width', 'height'])
+
+        def write(encoded: list[EncodedFrame]) -> None:
+            nonlocal frames
+            for x, y, width, height, data in encoded:
+                if is_gif:
+                    out.write(data)
+                else:
+                    index.writerow([f'frame{frames:06d}.png',
+                                    x, y, width, height])
+                frames += 1
+
+        try:
+            if pool is None:
+                for batch in batches:
+                    write(_encode_batch(batch))
+            else:
+                pending = deque()
+                for batch in batches:
+                    pending.append(pool.apply_async(_encode_batch, (batch,)))
+                    if len(pending) >= BATCHES_IN_FLIGHT * workers:
+                        write(pending.popleft().get())
+                while pending:
+                    write(pending.popleft().get())
+        finally:
+            if pool is not None:
+                pool.terminate()
+        if is_gif:
+            out.write(b';')
+    return frames
+
+
+def main() -> None:
+    """ Exports a macro session, a headless simulation or both. """
+    parser = argparse.ArgumentParser(description='Export a farm animation')
+    parser.add_argument('script', nargs='?',
+                        help='macro script of the session to play')
+    parser.add_argument('--map', default='maps/map1.txt')
+    parser.add_argument('--out', default='farm.gif',
+                        help='a .gif file, or a directory for PNG frames')
+    parser.add_argument('--every', choices=('action', 'day'),
+                        default='action')
+    parser.add_argument('--days', type=int, default=0,
+                        help='days to simulate after the script')
+    parser.add_argument('--tile', type=int, default=16,
+                        help='pixels per cell')
+    parser.add_argument('--duration', type=int, default=100,
+                        help='milliseconds per GIF frame')
+    parser.add_argument('--workers', type=int, default=os.cpu_count())
+    parser.add_argument('--batch', type=int, default=DEFAULT_BATCH_SIZE)
+    args = parser.parse_args()
+
+    model = FarmModel(args.map)
+    runner = None
+    if args.script:
+        with open(args.script) as file:
+            runner = MacroRunner(model, compile_macro(
+                file.read(), model.get_dimensions()))
+    start = time.perf_counter()
+    frames = export(iter_deltas(model, runner, args.every, args.days),
+                    model.get_dimensions(), args.out, args.tile,
+                    args.duration, args.workers, args.batch)
+    elapsed = time.perf_counter() - start
+    print(f'{frames} frames in {elapsed:.2f}s '
+          f'({frames / elapsed:,.0f} frames/s)')
+    try:
+        import resource
+    except ImportError:
+        # resource is Unix only
+        pass
+    else:
+        # ru_maxrss is in kilobytes on Linux
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+        print(f'peak memory of this process {peak:.0f}MB')
+    if runner is not None and runner.stopped:
+        print(f'stopped: {runner.stopped}')
+
+
+if __name__ == '__main__':
+    main()
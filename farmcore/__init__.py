@@ -0,0 +1,9 @@
+""" The farm game's rules, with no GUI dependencies.
+
+    The model, map files, crops, market, journal, metrics and parallel
+    growth live here. At module level they import only the standard library
+    and each other, by name, so that headless tools (the server, sessions,
+    benchmarks and process pool workers) start without loading tkinter or
+    PIL. The GUI modules at the top level import from this package, never the
+    other way around.
+"""
@@ -0,0 +1,103 @@
+# Crops, seeds and their prices are defined in crops.json
+from farmcore.crops import CROPS
+
+# Map representation of different tiles
+GRASS = 'G'
+SOIL = 'S'
+UNTILLED = 'U'
+
+# Constants related to moving the player
+UP = 'w'
+DOWN = 's'
+LEFT = 'a'
+RIGHT = 'd'
+
+MOVE_DELTAS = {
+    LEFT: (0, -1),
+    DOWN: (1, 0),
+    RIGHT: (0, 1),
+    UP: (-1, 0),
+}
+
+# Energy cost of actions (only applied if action was successful)
+MOVE_COST = 1
+HARVEST_COST = 3
+PLANT_COST = 2
+REMOVE_COST = 2
+TILL_COST = 3
+UNTILL_COST = 3
+
+# All seeds available in the game
+SEEDS = [crop.seed for crop in CROPS.values()]
+
+# All items, listed in the order in which they should appear in the inventory
+ITEMS = SEEDS + [crop.produce for crop in CROPS.values()]
+    
+# How much it costs to buy certain items from the store
+# Any items not listed cannot be bought at the store
+BUY_PRICES = {crop.seed: crop.seed_buy_price for crop in CROPS.values()}
+
+# How much you can sell items for at the store
+SELL_PRICES = {}
+for crop in CROPS.values():
+    SELL_PRICES[crop.seed] = crop.seed_sell_price
+    SELL_PRICES[crop.produce] = crop.produce_sell_price
+del crop
+
+# Items that are grown rather than bought, in inventory order
+PRODUCE = [crop.produce for crop in CROPS.values()]
+
+# Item IDs index the inventory arrays, in the same order as ITEMS
+ITEM_IDS = {item: item_id for item_id, item in enumerate(ITEMS)}
+
+# Buy and sell prices indexed by item ID. Items that cannot be bought have a
+# buy price of None
+BUY_PRICE_VECTOR = tuple(BUY_PRICES.get(item) for item in ITEMS)
+SELL_PRICE_VECTOR = tuple(SELL_PRICES[item] for item in ITEMS)
+
+# Market dynamics. Each day's trades are added to supply and demand levels
+# that decay by MARKET_MEMORY per day. Sell prices fall as supply grows and
+# buy prices rise as demand grows, within the given factors of the base price
+MARKET_MEMORY = 0.8
+SUPPLY_SENSITIVITY = 0.01
+DEMAND_SENSITIVITY = 0.005
+MIN_PRICE_FACTOR = 0.3
+MAX_PRICE_FACTOR = 3.0
+
+# The most change records the model's journal keeps. Consumers that fall
+# further behind than this must resynchronise from the full state
+JOURNAL_CAPACITY = 4096
+
+# Per-day metrics history. The latest METRICS_CAPACITY days are kept at full
+# resolution, and older days are merged into rows covering METRICS_DOWNSAMPLE
+# times as many days per tier, over METRICS_TIERS tiers. The oldest rows of
+# the last tier are discarded, so the history never grows past
+# METRICS_TIERS * METRICS_CAPACITY rows
+METRICS_CAPACITY = 1024
+METRICS_DOWNSAMPLE = 8
+METRICS_TIERS = 4
+
+# Environment simulation, used only when a farm turns it on. Each day it
+# rains with RAIN_CHANCE, adding RAIN_AMOUNT of moisture to every tile;
+# moisture then evaporates by EVAPORATION and evens out with the neighbouring
+# tiles by MOISTURE_DIFFUSION. Fertility recovers by FERTILITY_RECOVERY of
+# what is missing each day on tiles without plants, and each harvest uses
+# HARVEST_FERTILITY of it. Pests multiply by PEST_GROWTH on plants, spread
+# PEST_SPREAD of their pressure to neighbouring plants, and break out with
+# PEST_OUTBREAK pressure on a plant with PEST_OUTBREAK_CHANCE. Plants do not
+# grow on days their tile is drier than GROWTH_MOISTURE or has more pests
+# than PEST_BLIGHT. All levels are between 0 and 1
+RAIN_CHANCE = 0.3
+RAIN_AMOUNT = 0.5
+EVAPORATION = 0.2
+MOISTURE_DIFFUSION = 0.2
+START_MOISTURE = 0.5
+FERTILITY_RECOVERY = 0.05
+HARVEST_FERTILITY = 0.2
+MIN_FERTILITY = 0.1
+PEST_GROWTH = 0.2
+PEST_SPREAD = 0.05
+PEST_OUTBREAK = 0.1
+PEST_OUTBREAK_CHANCE = 0.001
+GROWTH_MOISTURE = 0.2
+PEST_BLIGHT = 0.8
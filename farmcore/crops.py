@@ -0,0 +1,70 @@
+""" The crop registry.
+
+    Crops are defined in crops.json rather than as Plant subclasses. Each
+    entry gives the number of days the crop spends in each stage before its
+    final (harvest) stage, its yield, its optional regrow period, its prices
+    and its sprite folder. When loaded, every crop is compiled into a dense
+    table mapping days since planting to stage, so ageing a plant is a single
+    table lookup.
+"""
+import json
+import os
+from typing import Optional
+
+CROPS_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                          'crops.json')
+
+
+class Crop:
+    """ The compiled, immutable definition of one kind of crop. """
+
+    def __init__(self, definition: dict) -> None:
+        """ Compiles a crop from its entry in the crops file.
+
+        Parameters:
+            definition: The crop's entry in the crops file.
+        """
+        self.name = definition['name']
+        self.seed = definition['seed']
+        self.produce = definition['produce']
+        self.yield_amount = definition['yield']
+        self.seed_buy_price = definition['seed_buy_price']
+        self.seed_sell_price = definition['seed_sell_price']
+        self.produce_sell_price = definition['produce_sell_price']
+        self.sprites = definition['sprites']
+        self.colour = definition['colour']
+
+        # stages[day] is the stage on that day since planting, up to the first
+        # day of the final stage
+        stages = []
+        for stage, days in enumerate(definition['stage_days'], start=1):
+            stages.extend([stage] * days)
+        self.final_stage = len(definition['stage_days']) + 1
+        stages.append(self.final_stage)
+        self.stages = tuple(stages)
+
+        regrow = definition.get('regrow')
+        self.regrow_days: Optional[int] = regrow and regrow['days']
+        self.regrow_stage: Optional[int] = regrow and regrow['stage']
+
+    def get_image_name(self, stage: int) -> str:
+        """ Returns the image name of the given stage, relative to the images
+            directory.
+        """
+        return f'{self.sprites}/stage_{stage}.png'
+
+
+def load_crops(crops_file: str = CROPS_FILE) -> dict[str, Crop]:
+    """ Reads and compiles the crops in a crops file.
+
+    Parameters:
+        crops_file: The path to the crops file.
+
+    Returns:
+        The compiled crops, mapping crop names to crops, in file order.
+    """
+    with open(crops_file, 'r') as file:
+        return {crop.name: crop for crop in map(Crop, json.load(file))}
+
+
+CROPS = load_crops()
@@ -0,0 +1,151 @@
+""" Soil moisture, fertility and pests, simulated over the whole farm.
+
+    The environment holds one NumPy field per quantity, with one float32
+    entry per tile. On every new day the weather decides whether it rains,
+    and every field is updated with whole-array operations: rain adds
+    moisture everywhere, moisture evaporates and diffuses to the four
+    neighbouring tiles, fertility recovers on tiles without plants, and pests
+    multiply on plants and spread to the plants next to them. Plants only
+    grow on days when their tile is moist enough and not overrun by pests,
+    and a harvest yields less from tired or infested tiles and tires the
+    soil. No per-tile Python runs on a new day, so the cost of a day grows
+    with the size of the farm only through NumPy.
+
+    NumPy is only imported when a farm turns the environment on, so the
+    classic rules do not need it.
+
+    Run this file to benchmark a large farm, e.g.
+        python -m farmcore.environment --size 1000 --days 100
+"""
+import argparse
+import time
+from typing import Optional
+import numpy as np
+from farmcore.constants import (
+    EVAPORATION, FERTILITY_RECOVERY, GROWTH_MOISTURE, HARVEST_FERTILITY,
+    MIN_FERTILITY, MOISTURE_DIFFUSION, PEST_BLIGHT, PEST_GROWTH, PEST_OUTBREAK,
+    PEST_OUTBREAK_CHANCE, PEST_SPREAD, RAIN_AMOUNT, RAIN_CHANCE,
+    START_MOISTURE,
+)
+
+
+def neighbour_sum(field: np.ndarray, edge: bool) -> np.ndarray:
+    """ Returns the sum of the four neighbours of every entry of a field.
+
+    Parameters:
+        field: The field to sum.
+        edge: If True, entries beyond the edge of the farm repeat the entry
+            at the edge, so nothing flows out of the farm. Otherwise they are
+            zero.
+    """
+    padded = np.pad(field, 1, mode='edge' if edge else 'constant')
+    return (padded[:-2, 1:-1] + padded[2:, 1:-1]
+            + padded[1:-1, :-2] + padded[1:-1, 2:])
+
+
+class Environment:
+    """ The moisture, fertility and pest fields of a farm, and its weather.
+    """
+
+    def __init__(self, rows: int, columns: int,
+                 seed: Optional[int] = None) -> None:
+        """ Constructor for an environment with moist, fertile and pest free
+            soil everywhere.
+
+        Parameters:
+            rows: The number of rows in the farm.
+            columns: The number of columns in the farm.
+            seed: Seeds the weather and pest outbreaks, for repeatable runs.
+        """
+        shape = (rows, columns)
+        self.moisture = np.full(shape, START_MOISTURE, dtype=np.float32)
+        self.fertility = np.ones(shape, dtype=np.float32)
+        self.pests = np.zeros(shape, dtype=np.float32)
+        # True where a tile has a plant
+        self.plants = np.zeros(shape, dtype=bool)
+        self._rng = np.random.default_rng(seed)
+        self._raining = False
+
+    def is_raining(self) -> bool:
+        """ Returns True iff it rained at the start of the current day. """
+        return self._raining
+
+    def set_plant(self, position: tuple[int, int], present: bool) -> None:
+        """ Records whether there is a plant at the given position. A plant
+            that is removed takes its pests with it.
+        """
+        self.plants[position] = present
+        if not present:
+            self.pests[position] = 0
+
+    def new_day(self) -> list[tuple[int, int]]:
+        """ Advances the weather and every field by one day.
+
+        Returns:
+            The positions of the plants that cannot grow today, in row order.
+        """
+        self._raining = self._rng.random() < RAIN_CHANCE
+        moisture = self.moisture
+        if self._raining:
+            moisture += RAIN_AMOUNT
+        moisture *= 1 - EVAPORATION
+        moisture += MOISTURE_DIFFUSION * (neighbour_sum(moisture, True) / 4
+                                          - moisture)
+        np.clip(moisture, 0, 1, out=moisture)
+
+        self.fertility += (FERTILITY_RECOVERY * (1 - self.fertility)
+                           * ~self.plants)
+
+        pests = (self.pests * (1 + PEST_GROWTH)
+                 + PEST_SPREAD * neighbour_sum(self.pests, False))
+        outbreaks = self._rng.random(pests.shape, dtype=np.float32)
+        pests += PEST_OUTBREAK * (outbreaks < PEST_OUTBREAK_CHANCE)
+        pests *= self.plants
+        self.pests = np.clip(pests, 0, 1, out=pests)
+
+        stalled = self.plants & ((moisture < GROWTH_MOISTURE)
+                                 | (self.pests > PEST_BLIGHT))
+        return list(zip(*(axis.tolist() for axis in np.nonzero(stalled))))
+
+    def harvest(self, position: tuple[int, int], amount: int) -> int:
+        """ Takes a harvest from the tile at the given position, using up
+            some of its fertility and clearing its pests.
+
+        Parameters:
+            position: The position of the harvested plant.
+            amount: The amount the plant yields on perfect soil.
+
+        Returns:
+            The amount actually harvested, which is at least 1.
+        """
+        factor = self.fertility[position] * (1 - self.pests[position])
+        self.fertility[position] = max(MIN_FERTILITY,
+                                       self.fertility[position]
+                                       - HARVEST_FERTILITY)
+        self.pests[position] = 0
+        return max(1, round(amount * float(factor)))
+
+
+def main() -> None:
+    """ Times new days on a large farm with a plant on every other tile. """
+    parser = argparse.ArgumentParser(description='Environment benchmark')
+    parser.add_argument('--size', type=int, default=1000)
+    parser.add_argument('--days', type=int, default=100)
+    args = parser.parse_args()
+
+    environment = Environment(args.size, args.size, seed=0)
+    environment.plants[:, ::2] = True
+    start = time.perf_counter()
+    stalled = 0
+    for _ in range(args.days):
+        stalled += len(environment.new_day())
+    elapsed = time.perf_counter() - start
+    print(f'{args.size}x{args.size} farm: {args.days} days in '
+          f'{elapsed:.2f}s ({elapsed / args.days * 1000:.1f}ms per day)')
+    print(f'mean moisture {environment.moisture.mean():.2f}, '
+          f'mean pests {environment.pests.mean():.3f}, '
+          f'{stalled / args.days:.0f} plants stalled per day')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,123 @@
+""" A journal of fine-grained changes to a farm.
+
+    Every change to the model is appended to the journal as a record
+    (version, kind, subject, value), where the version is a global counter
+    that increases by one per record. Consumers remember the version they
+    last processed and pull every change since then, so views, the autosave
+    and network sync only handle what actually changed. Consumers can also
+    subscribe to be called with each record as it is appended, e.g. to
+    schedule a redraw.
+
+    The subject and value of each kind of record are:
+        TILE_CHANGED      (row, col)    the new tile
+        PLANT_ADDED       (row, col)    the plant's state
+        PLANT_REMOVED     (row, col)    None
+        PLANT_STAGED      (row, col)    the plant's state
+        PLAYER_MOVED      Player        the new (row, col) position
+        PLAYER_TURNED     Player        the new direction
+        ENERGY_CHANGED    Player        the new energy
+        MONEY_CHANGED     Player        the new money
+        INVENTORY_CHANGED Player        (item name, new amount)
+        ITEM_SELECTED     Player        the selected item name, or None
+        HARVESTED         (row, col)    (produce name, amount harvested)
+        DAY_CHANGED       None          the new number of days elapsed
+        RESTORED          None          (version, restore version): an undo
+                                        or redo has put the farm back as it
+                                        was at version, and every change
+                                        after restore version was made by
+                                        the undo or redo itself
+    where a plant's state is the tuple returned by Plant.get_state(). When a
+    new day starts, DAY_CHANGED is recorded after every other change the new
+    day makes, so consumers can treat it as the end of the day's changes.
+"""
+from collections import deque
+from itertools import islice
+from typing import Callable, Optional
+from farmcore.constants import JOURNAL_CAPACITY
+
+TILE_CHANGED = 'tile'
+PLANT_ADDED = 'plant_added'
+PLANT_REMOVED = 'plant_removed'
+PLANT_STAGED = 'plant_staged'
+PLAYER_MOVED = 'moved'
+PLAYER_TURNED = 'turned'
+ENERGY_CHANGED = 'energy'
+MONEY_CHANGED = 'money'
+INVENTORY_CHANGED = 'inventory'
+ITEM_SELECTED = 'selected'
+HARVESTED = 'harvested'
+DAY_CHANGED = 'day'
+RESTORED = 'restored'
+
+# Kinds of change to the plant in a cell, and to anything drawn in a cell
+PLANT_CHANGES = {PLANT_ADDED, PLANT_REMOVED, PLANT_STAGED}
+CELL_CHANGES = PLANT_CHANGES | {TILE_CHANGED}
+
+Change = tuple[int, str, object, object]
+
+
+class Journal:
+    """ An append-only, bounded log of changes with monotonic versions. """
+
+    def __init__(self, capacity: int = JOURNAL_CAPACITY) -> None:
+        """ Constructor for an empty journal at version 0.
+
+        Parameters:
+            capacity: The most records kept. Older records are discarded.
+        """
+        self._records = deque(maxlen=capacity)
+        self._version = 0
+        self._subscribers = []
+
+    def get_version(self) -> int:
+        """ Returns the version of the latest change, or 0 if there has been
+            none.
+        """
+        return self._version
+
+    def record(self, kind: str, subject: object, value: object) -> None:
+        """ Appends a change, giving it the next version, and passes it to
+            every subscriber.
+
+        Parameters:
+            kind: The kind of change, one of the constants in this module.
+            subject: The cell or player that changed, or None.
+            value: The new value.
+        """
+        self._version += 1
+        change = (self._version, kind, subject, value)
+        self._records.append(change)
+        for subscriber in self._subscribers:
+            subscriber(change)
+
+    def changes_since(self, version: int) -> Optional[list[Change]]:
+        """ Returns every change made after the given version, oldest first.
+
+        Parameters:
+            version: A version from get_version().
+
+        Returns:
+            The changes, or None if some of them have already been discarded,
+            in which case the consumer must resynchronise from the full state.
+        """
+        missing = self._version - version
+        if missing <= 0:
+            return []
+        if missing > len(self._records):
+            return None
+        return list(islice(self._records, len(self._records) - missing, None))
+
+    def subscribe(self, subscriber: Callable[[Change], None]) -> None:
+        """ Calls the given function with every change recorded from now on.
+        """
+        self._subscribers.append(subscriber)
+
+    def unsubscribe(self, subscriber: Callable[[Change], None]) -> None:
+        """ Stops calling a function passed to subscribe(). """
+        self._subscribers.remove(subscriber)
+
+
+def changed_cells(changes: list[Change]) -> set[tuple[int, int]]:
+    """ Returns the cells whose tile or plant changed in the given changes.
+    """
+    return {subject for _, kind, subject, _ in changes if kind in CELL_CHANGES}
@@ -0,0 +1,27 @@
+""" Reading and writing map files. """
+
+
+def read_map(map_file: str) -> list[str]:
+    """ Reads the map file and returns a list of strings, where each string
+        represents one row of the farm (first string represents top row), and
+        each character in a string represents a tile.
+
+    Parameters:
+        map_file: The path to the map file.
+
+    Returns:
+        A list of strings representing the tiles in the map.
+    """
+    with open(map_file, 'r') as file:
+        return [line.strip() for line in file.readlines()]
+
+
+def write_map(map_file: str, rows: list[str]) -> None:
+    """ Writes a map in the format read by read_map, one row per line.
+
+    Parameters:
+        map_file: The path to the map file.
+        rows: The rows of the map, top row first.
+    """
+    with open(map_file, 'w') as file:
+        file.write(''.join(row + '\n' for row in rows))
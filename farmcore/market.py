@@ -0,0 +1,97 @@
+""" The market that sets the store's buy and sell prices.
+
+    Prices react to what the players trade. Each day's sold and bought
+    volumes are folded into decaying supply and demand levels, and at the
+    start of each new day the prices of every item are recomputed together
+    from the base prices in constants.py: heavy selling lowers an item's sell
+    price and heavy buying raises its buy price, and both recover towards the
+    base price as the market forgets old trades. Prices never change during a
+    day, so a trade of any size is priced by a single lookup.
+"""
+from typing import Optional
+from farmcore.constants import (
+    BUY_PRICE_VECTOR, DEMAND_SENSITIVITY, ITEM_IDS, ITEMS, MARKET_MEMORY,
+    MAX_PRICE_FACTOR, MIN_PRICE_FACTOR, SELL_PRICE_VECTOR, SUPPLY_SENSITIVITY,
+)
+
+
+class Market:
+    """ Tracks supply and demand for every item and the prices they lead to.
+    """
+
+    def __init__(self) -> None:
+        """ Constructor for a market with every item at its base price. """
+        count = len(ITEMS)
+        self._sold_today = [0] * count
+        self._bought_today = [0] * count
+        self._supply = [0.0] * count
+        self._demand = [0.0] * count
+        self._buy_prices = list(BUY_PRICE_VECTOR)
+        self._sell_prices = list(SELL_PRICE_VECTOR)
+
+    def get_buy_price(self, item_name: str) -> Optional[int]:
+        """ Returns today's price to buy one of the item, or None if the item
+            cannot be bought.
+        """
+        return self._buy_prices[ITEM_IDS[item_name]]
+
+    def get_sell_price(self, item_name: str) -> int:
+        """ Returns today's price for selling one of the item. """
+        return self._sell_prices[ITEM_IDS[item_name]]
+
+    def get_buy_prices(self) -> list[Optional[int]]:
+        """ Returns today's buy prices, indexed by item ID. """
+        return self._buy_prices
+
+    def get_sell_prices(self) -> list[int]:
+        """ Returns today's sell prices, indexed by item ID. """
+        return self._sell_prices
+
+    def record_sale(self, item_name: str, quantity: int) -> None:
+        """ Records that a player sold the given quantity of an item today. """
+        self._sold_today[ITEM_IDS[item_name]] += quantity
+
+    def record_purchase(self, item_name: str, quantity: int) -> None:
+        """ Records that a player bought the given quantity of an item today.
+        """
+        self._bought_today[ITEM_IDS[item_name]] += quantity
+
+    def new_day(self, days: int = 1) -> None:
+        """ Folds today's trades into the supply and demand levels and
+            recomputes the prices of every item at once.
+
+        Parameters:
+            days: The number of days that pass. There are no trades on the
+                days after today, so the levels just decay over them.
+        """
+        decay = MARKET_MEMORY ** (days - 1)
+        supply = [decay * (MARKET_MEMORY * level + sold)
+                  for level, sold in zip(self._supply, self._sold_today)]
+        demand = [decay * (MARKET_MEMORY * level + bought)
+                  for level, bought in zip(self._demand, self._bought_today)]
+        sell_prices = [max(1, round(base * max(MIN_PRICE_FACTOR,
+                                               1 / (1 + SUPPLY_SENSITIVITY * level))))
+                       for base, level in zip(SELL_PRICE_VECTOR, supply)]
+        buy_prices = [None if base is None
+                      else round(base * min(MAX_PRICE_FACTOR,
+                                            1 + DEMAND_SENSITIVITY * level))
+                      for base, level in zip(BUY_PRICE_VECTOR, demand)]
+
+        # Never let an item sell for more than it can be bought for
+        self._sell_prices = [sell if buy is None else min(sell, buy)
+                             for sell, buy in zip(sell_prices, buy_prices)]
+        self._buy_prices = buy_prices
+        self._supply = supply
+        self._demand = demand
+        self._sold_today = [0] * len(ITEMS)
+        self._bought_today = [0] * len(ITEMS)
+
+    def get_state(self) -> list:
+        """ Returns the market's state as plain lists, for saving. """
+        return [self._sold_today, self._bought_today, self._supply,
+                self._demand, self._buy_prices, self._sell_prices]
+
+    def set_state(self, state: list) -> None:
+        """ Restores a state returned by get_state. """
+        (self._sold_today, self._bought_today, self._supply, self._demand,
+         self._buy_prices, self._sell_prices) = [list(part) for part in state]
@@ -0,0 +1,354 @@
+""" A bounded, columnar history of per-day farm metrics.
+
+    At the end of every day the farm records one row: the players' money,
+    the energy they used, the produce harvested of each crop, the number of
+    plants at each stage and the number of tilled tiles. Each column is a
+    compact integer array, and the rows are kept in tiers of ring buffers:
+    the first tier holds the latest days one row per day, and every row that
+    falls out of a tier is merged with its neighbours into a row of the next
+    tier, which covers METRICS_DOWNSAMPLE times as many days. Flows (energy
+    used, harvests) are summed when rows are merged and levels (money, plants,
+    tiles) keep the latest value, so totals over any day range stay exact.
+    Rows that fall out of the last tier are discarded, so even campaigns of
+    hundreds of thousands of days use bounded memory.
+
+    Histories can be queried by day range and exported to CSV, or to a simple
+    columnar file: a JSON header line naming each column and its length,
+    followed by each column's raw little endian 64 bit integers.
+
+    Run this file to benchmark a long headless campaign, e.g.
+        python -m farmcore.metrics --days 100000 --csv history.csv
+"""
+import argparse
+import csv
+import json
+import random
+import sys
+import time
+from array import array
+from typing import Iterator, Optional
+from farmcore.constants import (
+    CROPS, METRICS_CAPACITY, METRICS_DOWNSAMPLE, METRICS_TIERS, PRODUCE, SEEDS,
+    SOIL,
+)
+
+# Every column, in order. 'day' is the first day a row covers and 'days' the
+# number of days it covers
+PRODUCE_COLUMNS = ['harvested_' + item.lower().replace(' ', '_')
+                   for item in PRODUCE]
+MAX_STAGE = max(crop.final_stage for crop in CROPS.values())
+STAGE_COLUMNS = [f'stage_{stage}' for stage in range(1, MAX_STAGE + 1)]
+COLUMNS = (['day', 'days', 'money', 'energy_used'] + PRODUCE_COLUMNS
+           + STAGE_COLUMNS + ['tilled'])
+
+# Columns summed when rows are merged. Every other column keeps the value of
+# the latest row
+SUMMED_COLUMNS = {'days', 'energy_used', *PRODUCE_COLUMNS}
+
+COLUMNAR_MAGIC = 'farm-metrics-columnar-1'
+
+
+def merge_rows(older: list[int], newer: list[int]) -> list[int]:
+    """ Returns a row covering the days of two adjacent rows. """
+    return [old if name == 'day'
+            else old + new if name in SUMMED_COLUMNS
+            else new
+            for name, old, new in zip(COLUMNS, older, newer)]
+
+
+class MetricsTier:
+    """ A ring buffer of rows, stored as one integer array per column. """
+
+    def __init__(self, capacity: int, resolution: int) -> None:
+        """ Constructor for an empty tier. Its arrays grow as rows are added,
+            up to the capacity.
+
+        Parameters:
+            capacity: The most rows the tier holds.
+            resolution: The number of days each full row covers.
+        """
+        self.capacity = capacity
+        self.resolution = resolution
+        self._columns = [array('q') for _ in COLUMNS]
+        self._start = 0
+        self._count = 0
+
+    def __len__(self) -> int:
+        """ Returns the number of rows in the tier. """
+        return self._count
+
+    def append(self, row: list[int]) -> Optional[list[int]]:
+        """ Adds a row after the latest one.
+
+        Returns:
+            The oldest row, if it had to be removed to make room.
+        """
+        if self._count == self.capacity:
+            oldest = self.row(0)
+            for column, value in zip(self._columns, row):
+                column[self._start] = value
+            self._start = (self._start + 1) % self.capacity
+            return oldest
+        index = (self._start + self._count) % self.capacity
+        for column, value in zip(self._columns, row):
+            if index < len(column):
+                column[index] = value
+            else:
+                column.append(value)
+        self._count += 1
+        return None
+
+    def row(self, index: int) -> list[int]:
+        """ Returns the row at the given index, oldest first. """
+        position = (self._start + index) % self.capacity
+        return [column[position] for column in self._columns]
+
+    def rows(self) -> Iterator[list[int]]:
+        """ Yields every row, oldest first. """
+        for index in range(self._count):
+            yield self.row(index)
+
+    def remove_from(self, day: int) -> None:
+        """ Removes the latest rows, as long as they start on or after the
+            given day.
+        """
+        day_column = self._columns[0]
+        while (self._count
+               and day_column[(self._start + self._count - 1) % self.capacity]
+               >= day):
+            self._count -= 1
+
+
+class MetricsHistory:
+    """ The per-day metrics of a farm, downsampled as they grow older. """
+
+    def __init__(
+            self,
+            capacity: int = METRICS_CAPACITY,
+            downsample: int = METRICS_DOWNSAMPLE,
+            tiers: int = METRICS_TIERS
+        ) -> None:
+        """ Constructor for an empty history.
+
+        Parameters:
+            capacity: The most rows kept in each tier.
+            downsample: How many rows of a tier are merged into one row of
+                the next.
+            tiers: The number of tiers.
+        """
+        self._tiers = [MetricsTier(capacity, downsample ** level)
+                       for level in range(tiers)]
+        # Rows that fell out of tier i - 1 and are being merged into the next
+        # row of tier i
+        self._pending = [None] * tiers
+        self._latest = None
+
+    def record(self, values: dict[str, int]) -> None:
+        """ Records the metrics of one day. A day that has already been
+            recorded (e.g. after an undo) replaces the earlier rows from that
+            day on.
+
+        Parameters:
+            values: The value of each column for the day. 'day' is required,
+                and any other missing column is recorded as 0.
+        """
+        row = [values.get(name, 0) for name in COLUMNS]
+        row[1] = 1
+        if self._latest is not None and row[0] <= self._latest[0]:
+            self._tiers[0].remove_from(row[0])
+        self._latest = row
+        self._push(0, row)
+
+    def _push(self, level: int, row: list[int]) -> None:
+        """ Appends a row to a tier, merging the row it pushes out into the
+            next tier.
+        """
+        evicted = self._tiers[level].append(row)
+        if evicted is None or level + 1 == len(self._tiers):
+            return
+        pending = self._pending[level + 1]
+        pending = evicted if pending is None else merge_rows(pending, evicted)
+        if pending[1] >= self._tiers[level + 1].resolution:
+            self._pending[level + 1] = None
+            self._push(level + 1, pending)
+        else:
+            self._pending[level + 1] = pending
+
+    def __len__(self) -> int:
+        """ Returns the number of rows held, across every tier. """
+        return (sum(len(tier) for tier in self._tiers)
+                + sum(pending is not None for pending in self._pending))
+
+    def get_state(self) -> list:
+        """ Returns the history as plain lists, for saving: the rows of each
+            tier, oldest first, the pending rows and the latest row.
+        """
+        return [[list(tier.rows()) for tier in self._tiers],
+                list(self._pending), self._latest]
+
+    def set_state(self, state: list) -> None:
+        """ Restores a state returned by get_state. The history must have
+            the same number of tiers as the one that was saved.
+        """
+        tiers, pending, latest = state
+        for tier, rows in zip(self._tiers, tiers):
+            tier.__init__(tier.capacity, tier.resolution)
+            for row in rows:
+                tier.append(list(row))
+        self._pending = [row and list(row) for row in pending]
+        self._latest = latest and list(latest)
+
+    def latest(self) -> Optional[dict[str, int]]:
+        """ Returns the most recently recorded day, or None if there is none.
+        """
+        return None if self._latest is None else dict(zip(COLUMNS,
+                                                          self._latest))
+
+    def rows(self) -> Iterator[list[int]]:
+        """ Yields every row, oldest first. Older rows cover more days. """
+        for level in reversed(range(len(self._tiers))):
+            yield from self._tiers[level].rows()
+            if level > 0 and self._pending[level] is not None:
+                yield self._pending[level]
+            
+    def query(
+            self,
+            first_day: Optional[int] = None,
+            last_day: Optional[int] = None
+        ) -> dict[str, list[int]]:
+        """ Returns the rows that overlap a range of days, as a list of values
+            per column.
+
+        Parameters:
+            first_day: The first day of the range, or None for no limit.
+            last_day: The last day of the range, or None for no limit.
+        """
+        result = {name: [] for name in COLUMNS}
+        columns = list(result.values())
+        for row in self.rows():
+            if first_day is not None and row[0] + row[1] <= first_day:
+                continue
+            if last_day is not None and row[0] > last_day:
+                break
+            for column, value in zip(columns, row):
+                column.append(value)
+        return result
+
+    def export_csv(
+            self,
+            path: str,
+            first_day: Optional[int] = None,
+            last_day: Optional[int] = None
+        ) -> None:
+        """ Writes the rows that overlap a range of days to a CSV file with a
+            header row of column names.
+        """
+        with open(path, 'w', newline='') as file:
+            writer = csv.writer(file)
+            writer.writerow(COLUMNS)
+            writer.writerows(zip(*self.query(first_day, last_day).values()))
+
+    def export_columnar(
+            self,
+            path: str,
+            first_day: Optional[int] = None,
+            last_day: Optional[int] = None
+        ) -> None:
+        """ Writes the rows that overlap a range of days to a columnar file,
+            which load_columnar() reads back.
+        """
+        data = self.query(first_day, last_day)
+        arrays = [array('q', values) for values in data.values()]
+        if sys.byteorder != 'little':
+            for values in arrays:
+                values.byteswap()
+        header = {'format': COLUMNAR_MAGIC, 'columns': COLUMNS,
+                  'rows': len(data['day'])}
+        with open(path, 'wb') as file:
+            file.write(json.dumps(header).encode() + b'\n')
+            for values in arrays:
+                values.tofile(file)
+
+
+def load_columnar(path: str) -> dict[str, array]:
+    """ Reads a file written by MetricsHistory.export_columnar.
+
+    Returns:
+        An integer array of values for each column, keyed by column name.
+
+    Raises:
+        ValueError: If the file is not a metrics columnar file.
+    """
+    with open(path, 'rb') as file:
+        header = json.loads(file.readline())
+        if header.get('format') != COLUMNAR_MAGIC:
+            raise ValueError(f'{path} is not a metrics columnar file')
+        columns = {}
+        for name in header['columns']:
+            values = array('q')
+            values.fromfile(file, header['rows'])
+            if sys.byteorder != 'little':
+                values.byteswap()
+            columns[name] = values
+    return columns
+
+
+def run_campaign(days: int, seed: int = 0) -> 'FarmModel':
+    """ Plays a headless farm for the given number of days, tilling, planting
+        and harvesting at random.
+
+    Returns:
+        The farm, with its metrics history.
+    """
+    from farmcore.model import FarmModel, SEED_FACTORIES
+
+    rng = random.Random(seed)
+    model = FarmModel('maps/map1.txt')
+    player = model.get_player()
+    rows, columns = model.get_dimensions()
+    for _ in range(days):
+        for _ in range(5):
+            position = (rng.randrange(rows), rng.randrange(columns))
+            player.set_position(position)
+            model.till_soil(position)
+            if position in model.get_plants():
+                harvest = model.harvest_plant(position)
+                if harvest is not None:
+                    player.add_item(harvest)
+            elif model.get_map()[position[0]][position[1]] == SOIL:
+                seed_name = rng.choice(SEEDS)
+                model.add_plant(position, SEED_FACTORIES[seed_name]())
+        model.sell_all_produce()
+        model.new_day()
+    return model
+
+
+def main() -> None:
+    """ Runs a headless campaign and reports the size of its history. """
+    from farmcore.sizeof import deep_sizeof
+
+    parser = argparse.ArgumentParser(description='Metrics history benchmark')
+    parser.add_argument('--days', type=int, default=100000)
+    parser.add_argument('--csv')
+    parser.add_argument('--columnar')
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    model = run_campaign(args.days)
+    elapsed = time.perf_counter() - start
+    history = model.get_metrics()
+    print(f'{args.days} days in {elapsed:.2f}s '
+          f'({elapsed / args.days * 1e6:.1f}us per day)')
+    print(f'{len(history)} rows, {deep_sizeof(history, set())} bytes')
+    data = history.query()
+    print(f'oldest row covers days {data["day"][0]}-'
+          f'{data["day"][0] + data["days"][0] - 1}, '
+          f'harvests recorded: {sum(sum(data[c]) for c in PRODUCE_COLUMNS)}')
+    if args.csv:
+        history.export_csv(args.csv)
+    if args.columnar:
+        history.export_columnar(args.columnar)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,904 @@
+from array import array
+from functools import partial
+from typing import Optional
+from farmcore.constants import (
+    DOWN, HARVEST_COST, ITEM_IDS, ITEMS, JOURNAL_CAPACITY, MOVE_COST,
+    MOVE_DELTAS, PLANT_COST, PRODUCE, REMOVE_COST, SOIL, TILL_COST,
+    UNTILL_COST, UNTILLED,
+)
+from farmcore.crops import Crop, CROPS
+from farmcore.journal import (
+    DAY_CHANGED, ENERGY_CHANGED, HARVESTED, INVENTORY_CHANGED, ITEM_SELECTED,
+    MONEY_CHANGED, PLANT_ADDED, PLANT_REMOVED, PLANT_STAGED, PLAYER_MOVED,
+    PLAYER_TURNED, TILE_CHANGED, Journal,
+)
+from farmcore.mapio import read_map
+from farmcore.market import Market
+from farmcore.metrics import MetricsHistory
+
+class Plant:
+    """ A plant of one of the crops in the crop registry. Its behaviour is
+        driven entirely by the crop's compiled tables, so adding a crop does
+        not require a new plant class.
+    """
+
+    def __init__(self, crop: Crop):
+        """ Constructor for a newly planted plant of the given crop.
+
+        Parameters:
+            crop: The crop this plant grows as.
+        """
+        self._crop = crop
+        self._stage = crop.stages[0]
+        self._days = 0
+        self._days_since_harvest = 0
+    
+    def get_name(self) -> str:
+        """ Returns the name of the plant. """
+        return self._crop.name
+
+    def get_crop(self) -> Crop:
+        """ Returns the crop this plant grows as. """
+        return self._crop
+
+    def get_state(self) -> tuple[str, int, int, int]:
+        """ Returns the plant's state as an immutable
+            (crop name, stage, days, days since harvest) tuple.
+        """
+        return (self._crop.name, self._stage, self._days,
+                self._days_since_harvest)
+
+    @classmethod
+    def from_state(cls, state: tuple[str, int, int, int]) -> 'Plant':
+        """ Returns a new plant with a state returned by get_state(). """
+        name, stage, days, days_since_harvest = state
+        plant = cls(CROPS[name])
+        plant._stage = stage
+        plant._days = days
+        plant._days_since_harvest = days_since_harvest
+        return plant
+    
+    def get_stage(self) -> int:
+        """ Returns the current stage of the plant. """
+        return self._stage
+    
+    def can_harvest(self) -> bool:
+        """ Returns True iff the plant is ready to be harvested. """
+        return self._stage == self._crop.final_stage
+    
+    def days_until_harvest(self) -> int:
+        """ Returns the number of days until the plant is ready to be
+            harvested, or 0 if it is ready now.
+        """
+        if self.can_harvest():
+            return 0
+        stages = self._crop.stages
+        if self._days < len(stages) - 1:
+            return len(stages) - 1 - self._days
+        return self._crop.regrow_days - self._days_since_harvest
+
+    def remove_on_harvest(self) -> bool:
+        """ Returns True iff the plant should be removed from the grid after
+            being harvested. """
+        return self._crop.regrow_days is None
+
+    def age(self, days: int = 1) -> None:
+        """ Ages the plant by the given number of days, and makes any
+            necessary changes to the plants stage. Ageing by several days at
+            once gives the same result as ageing one day at a time.
+        """
+        before = self._days
+        self._days += days
+        stages = self._crop.stages
+
+        # Before first reaching the final stage, use the stage table
+        if self._days < len(stages):
+            self._stage = stages[self._days]
+            return
+        if self._crop.regrow_days is None:
+            self._stage = self._crop.final_stage
+            return
+
+        # After plant has matured, it can be harvested after the regrow period
+        # has elapsed since the last harvest
+        if before < len(stages) - 1:
+            self._stage = self._crop.final_stage
+        self._days_since_harvest += self._days - max(before, len(stages) - 1)
+        if (self._days_since_harvest >= self._crop.regrow_days
+                or self._stage == self._crop.final_stage):
+            self._stage = self._crop.final_stage
+        else:
+            self._stage = self._crop.regrow_stage
+    
+    def harvest(self) -> Optional[tuple[str, int]]:
+        """ Harvests the plant iff it is ready to be harvested. Otherwise, does
+            nothing.
+        
+            Returns:
+                The name and quantity of the harvested item, or None if the
+                harvest is unsuccessful.
+        """
+        if self.can_harvest():
+            if self._crop.regrow_days is not None:
+                self._stage = self._crop.regrow_stage
+                self._days_since_harvest = 0
+            return (self._crop.produce, self._crop.yield_amount)
+
+
+# Planting a seed is one lookup in this table and one allocation
+SEED_FACTORIES = {crop.seed: partial(Plant, crop) for crop in CROPS.values()}
+
+
+class PotatoPlant(Plant):
+    """ Potato plant has 5 stages, with stages 0-4 lasting one day each. At \
+        stage 5 it is ready for harvest.
+    """
+    def __init__(self) -> None:
+        super().__init__(CROPS['potato'])
+
+
+class KalePlant(Plant):
+    """ Kale plant has 5 stages, with stage 5 being harvest. """
+    def __init__(self) -> None:
+        super().__init__(CROPS['kale'])
+
+
+class BerryPlant(Plant):
+    """ Berry plant has 6 stages, with stage 6 being harvest. After harvest,
+        the berry tree returns to stage 5 and regrows to stage 6 every 4
+        days.
+    """
+    def __init__(self) -> None:
+        super().__init__(CROPS['berry'])
+
+
+def _is_quantity(quantity: object) -> bool:
+    """ Returns True iff quantity is a whole number of items, at least one.
+        bool is a subclass of int but is not a quantity.
+    """
+    return (isinstance(quantity, int) and not isinstance(quantity, bool)
+            and quantity >= 1)
+
+
+class Player:
+    """ Represents the player in the game. The inventory is a fixed array of
+        amounts indexed by item ID (see ITEM_IDS), and every change to it
+        advances an inventory version, so that views can skip work when the
+        inventory has not changed and ask which items changed when it has.
+        If the player belongs to a farm, every change to the player is also
+        recorded in the farm's journal.
+    """
+
+    START_ENERGY = 100
+
+    def __init__(self, journal: Optional[Journal] = None) -> None:
+        """ Constructor for the player.
+
+        Parameters:
+            journal: The journal to record changes to the player in, if any.
+        """
+        self._journal = journal
+        self._energy = self.START_ENERGY
+        self._money = 0
+        self._amounts = array('q', bytes(8 * len(ITEMS)))
+        self._amounts[ITEM_IDS['Potato Seed']] = 5
+        self._amounts[ITEM_IDS['Kale Seed']] = 5
+        # The inventory version at which each item's amount last changed
+        self._changed_at = array('q', bytes(8 * len(ITEMS)))
+        self._inventory_version = 0
+        self._position = (0, 0)
+        self._direction = DOWN
+        self._selected_item = None
+
+    def _record(self, kind: str, value: object) -> None:
+        """ Records a change to this player in the journal, if there is one.
+        """
+        if self._journal is not None:
+            self._journal.record(kind, self, value)
+
+    def get_energy(self) -> int:
+        """ Returns the player's current energy. """
+        return self._energy
+    
+    def get_money(self) -> int:
+        """ Returns the player's current money. """
+        return self._money
+    
+    def get_inventory(self) -> dict[str, int]:
+        """ Returns a new dictionary mapping the names of the items the player
+            has to their amounts.
+        """
+        return {item: amount for item, amount in zip(ITEMS, self._amounts)
+                if amount > 0}
+
+    def get_amounts(self) -> array:
+        """ Returns the inventory array, holding the amount of each item
+            indexed by item ID. The array must not be modified.
+        """
+        return self._amounts
+
+    def get_amount(self, item_name: str) -> int:
+        """ Returns the amount of the given item in the inventory. """
+        return self._amounts[ITEM_IDS[item_name]]
+
+    def get_inventory_version(self) -> int:
+        """ Returns the inventory version, which increases with every change
+            to the inventory.
+        """
+        return self._inventory_version
+
+    def inventory_changes(self, since_version: int) -> dict[str, int]:
+        """ Returns the items whose amounts have changed since the given
+            inventory version, mapped to their current amounts.
+
+        Parameters:
+            since_version: An inventory version from get_inventory_version().
+        """
+        if since_version >= self._inventory_version:
+            return {}
+        return {item: amount for item, amount, changed_at
+                in zip(ITEMS, self._amounts, self._changed_at)
+                if changed_at > since_version}
+
+    def set_amount(self, item_name: str, amount: int) -> None:
+        """ Sets the amount of the given item in the inventory.
+
+        Parameters:
+            item_name: The name of the item.
+            amount: The new amount, which must not be negative.
+        """
+        item_id = ITEM_IDS[item_name]
+        if self._amounts[item_id] != amount:
+            self._inventory_version += 1
+            self._amounts[item_id] = amount
+            self._changed_at[item_id] = self._inventory_version
+            self._record(INVENTORY_CHANGED, (item_name, amount))
+    
+    def select_item(self, item_name: str) -> None:
+        """ Selects the item with the given name, if it's in the inventory. """
+        if item_name in ITEM_IDS and self._amounts[ITEM_IDS[item_name]] > 0:
+            self.set_selected_item(item_name)
+    
+    def get_selected_item(self) -> Optional[str]:
+        """ Returns the name of the currently selected item, or None if no item
+            is selected.
+        """
+        return self._selected_item
+    
+    def get_position(self) -> tuple[int, int]:
+        """ Returns the player's current (row, col) position. """
+        return self._position
+    
+    def reset_energy(self) -> None:
+        """ Resets the player's energy to the starting amount. """
+        self.set_energy(self.START_ENERGY)
+
+    def reduce_energy(self, amount: int) -> None:
+        """ Reduces the player's energy by the given amount. Note that this
+            method will not ensure the player's energy remains non-negative.
+        
+        Parameters:
+            amount: The amount to reduce the player's energy by.
+        """
+        self.set_energy(self._energy - amount)
+
+    def sell(self, item_name: str, price: int, quantity: int = 1) -> bool:
+        """ Sells the given quantity of the given item for the given price
+            each, if the player has that many available. Either the whole
+            quantity is sold or none of it is.
+        
+        Parameters:
+            item_name: The name of the item to sell.
+            price: The price to sell each item for.
+            quantity: The number of items to sell, a positive whole number.
+
+        Returns:
+            True iff the items were sold.
+        """
+        if (not _is_quantity(quantity)
+                or self._amounts[ITEM_IDS[item_name]] < quantity):
+            return False
+        self.remove_item((item_name, quantity))
+        self.set_money(self._money + price * quantity)
+        return True
+
+    def buy(self, item_name: str, price: int, quantity: int = 1) -> bool:
+        """ Buys the given quantity of the given item for the given price
+            each, if the player has enough money for all of them. Either the
+            whole quantity is bought or none of it is.
+
+        Parameters:
+            item_name: The name of the item to buy.
+            price: The price to buy each item for.
+            quantity: The number of items to buy, a positive whole number.
+
+        Returns:
+            True iff the items were bought.
+        """
+        if not _is_quantity(quantity) or self._money < price * quantity:
+            return False
+        self.add_item((item_name, quantity))
+        self.set_money(self._money - price * quantity)
+        return True
+
+    def add_item(self, to_add: tuple[str, int]) -> None:
+        """ Adds the given amount of the given item to the player's inventory.
+        
+        Parameters:
+            to_add: A tuple of the item name and amount to add.
+        """
+        item_name, amount = to_add
+        item_id = ITEM_IDS[item_name]
+        self._inventory_version += 1
+        self._amounts[item_id] += amount
+        self._changed_at[item_id] = self._inventory_version
+        self._record(INVENTORY_CHANGED, (item_name, self._amounts[item_id]))
+
+    def remove_item(self, to_remove: tuple[str, int]) -> None:
+        """ Removes the given amount of the given item from the player's
+            inventory. The amount never goes below zero.
+
+        Parameters:
+            to_remove: A tuple of the item name and amount to remove.
+        """
+        item_name, amount = to_remove
+        item_id = ITEM_IDS[item_name]
+        self._inventory_version += 1
+        self._amounts[item_id] = max(0, self._amounts[item_id] - amount)
+        self._changed_at[item_id] = self._inventory_version
+        self._record(INVENTORY_CHANGED, (item_name, self._amounts[item_id]))
+
+    def set_energy(self, energy: int) -> None:
+        """ Sets the player's energy, e.g. when restoring a saved player. """
+        if energy != self._energy:
+            self._energy = energy
+            self._record(ENERGY_CHANGED, energy)
+
+    def set_money(self, money: int) -> None:
+        """ Sets the player's money, e.g. when restoring a saved player. """
+        if money != self._money:
+            self._money = money
+            self._record(MONEY_CHANGED, money)
+
+    def set_selected_item(self, item_name: Optional[str]) -> None:
+        """ Sets the selected item, whether or not it is in the inventory, e.g.
+            when restoring a saved player.
+        """
+        if item_name != self._selected_item:
+            self._selected_item = item_name
+            self._record(ITEM_SELECTED, item_name)
+
+    def set_position(self, position: tuple[int, int]) -> None:
+        """ Sets the player's position to the given position.
+        
+        Parameters:
+            position: The new position to set.
+        """
+        if position != self._position:
+            self._position = position
+            self._record(PLAYER_MOVED, position)
+    
+    def set_direction(self, new_direction: str) -> None:
+        """ Sets the player's direction to the given direction.
+
+        Parameters:
+            new_direction: The new direction to set.
+        
+        Pre-condition:
+            new_direction in {UP, DOWN, LEFT, RIGHT}
+        """
+        if new_direction != self._direction:
+            self._direction = new_direction
+            self._record(PLAYER_TURNED, new_direction)
+    
+    def get_direction(self) -> str:
+        """ Returns the player's current direction. """
+        return self._direction
+
+
+class FarmModel:
+    """ Represents the model for the farm game. Every change to the farm and
+        its players is recorded in the farm's journal.
+    """
+
+    def __init__(
+            self,
+            map_file: str,
+            shared_map: Optional[tuple[str, ...]] = None,
+            journal_capacity: int = JOURNAL_CAPACITY
+        ) -> None:
+        """ Constructor for the farm model.
+        
+        Parameters:
+            map_file: The path to the file containing the map to use.
+            shared_map: The rows of map_file if they have already been read.
+                The row strings are shared rather than copied, so many models
+                of the same map only pay for the rows they change.
+            journal_capacity: The most change records the journal keeps.
+        """
+        self._map_file = map_file
+        self._map = list(shared_map) if shared_map else read_map(map_file)
+        self._plants = {}
+        self._journal = Journal(journal_capacity)
+        self._player = Player(self._journal)
+        self._players = [self._player]
+        self._market = Market()
+        self._metrics = MetricsHistory()
+        self._growth = None
+        self._environment = None
+        self._harvested_today = dict.fromkeys(PRODUCE, 0)
+        self._days_elapsed = 1
+    
+    def get_plants(self) -> dict[tuple[int, int], Plant]:
+        """ Returns the plants currently on the farm, as a dictionary mapping
+            positions to plants.
+        """
+        return self._plants
+    
+    def get_player(self) -> Player:
+        """ Returns the player in this game. """
+        return self._player
+
+    def get_journal(self) -> Journal:
+        """ Returns the journal that every change to this farm is recorded
+            in.
+        """
+        return self._journal
+
+    def get_players(self) -> list[Player]:
+        """ Returns every player on this farm, in the order they joined. """
+        return self._players
+
+    def add_player(self) -> Player:
+        """ Adds a new player to the farm and returns it. The new player does
+            not become the active player.
+        """
+        player = Player(self._journal)
+        self._players.append(player)
+        return player
+
+    def set_players(self, players: list[Player]) -> None:
+        """ Replaces every player on the farm, e.g. when restoring a saved
+            farm. The first player becomes the active player.
+
+        Parameters:
+            players: The players, which should record their changes in this
+                farm's journal.
+        """
+        self._players = list(players)
+        self._player = self._players[0]
+
+    def set_active_player(self, player: Player) -> None:
+        """ Sets the player that subsequent actions (moving, tilling, planting,
+            etc.) are performed by.
+
+        Parameters:
+            player: The player to make active.
+
+        Pre-condition:
+            player in self.get_players()
+        """
+        self._player = player
+    
+    def add_plant(self, position: tuple[int, int], plant: Plant) -> bool:
+        """ Adds the given plant to the given position, if the player has enough
+            energy and there is no plant already at that position. Also handles
+            reducing the player's energy appropriately for planting.
+        
+        Parameters:
+            position: The position at which to add the plant.
+            plant: The plant to add.
+        
+        Returns:
+            True if the plant was added, False otherwise.
+        """
+        # Return early if not enough energy
+        if self._player.get_energy() < PLANT_COST:
+            return False
+
+        if self._plants.get(position) is None:
+            self._player.reduce_energy(PLANT_COST)
+            self._place_plant(position, plant)
+            self._journal.record(PLANT_ADDED, position, plant.get_state())
+            return True
+    
+        return False
+    
+    def harvest_plant(
+            self,
+            position: tuple[int, int]
+        ) -> Optional[tuple[str, int]]:
+        """ Harvests the plant at the given position, if there is one that is
+            ready for harvest. Also handles reducing the player's energy
+            appropriately for harvesting, and removing the plant from the farm
+            if it should be removed on harvest.
+
+        Parameters:
+            position: The position at which to harvest the plant.
+
+        Returns:
+            The result of harvesting the plant, or None if there was no plant
+            at the given position.
+        """
+        # Return early if not enough energy
+        if self._player.get_energy() < HARVEST_COST:
+            return
+
+        if self._plants.get(position) is not None:
+            plant = self._plants[position]
+            harvest_result = plant.harvest()
+            if harvest_result is not None:
+                if self._environment is not None:
+                    produce, amount = harvest_result
+                    harvest_result = (produce, self._environment.harvest(
+                        position, amount))
+                if plant.remove_on_harvest():
+                    self.remove_plant(position)
+                else:
+                    self._journal.record(PLANT_STAGED, position,
+                                         plant.get_state())
+                self._player.reduce_energy(HARVEST_COST)
+                self._harvested_today[harvest_result[0]] += harvest_result[1]
+                self._journal.record(HARVESTED, position, harvest_result)
+                return harvest_result
+    
+    def get_market(self) -> Market:
+        """ Returns the market that sets this farm's store prices. """
+        return self._market
+
+    def buy(self, item_name: str, quantity: int = 1) -> bool:
+        """ Buys the given quantity of an item for the player at today's
+            market price. Either the whole quantity is bought or none of it.
+
+        Parameters:
+            item_name: The name of the item to buy.
+            quantity: The number of items to buy.
+
+        Returns:
+            True iff the items were bought.
+        """
+        price = self._market.get_buy_price(item_name)
+        if price is None or not self._player.buy(item_name, price, quantity):
+            return False
+        self._market.record_purchase(item_name, quantity)
+        return True
+
+    def sell(self, item_name: str, quantity: int = 1) -> bool:
+        """ Sells the given quantity of the player's item at today's market
+            price. Either the whole quantity is sold or none of it.
+
+        Parameters:
+            item_name: The name of the item to sell.
+            quantity: The number of items to sell.
+
+        Returns:
+            True iff the items were sold.
+        """
+        price = self._market.get_sell_price(item_name)
+        if not self._player.sell(item_name, price, quantity):
+            return False
+        self._market.record_sale(item_name, quantity)
+        return True
+
+    def sell_all_produce(self) -> int:
+        """ Sells all of the player's produce at today's market prices.
+
+        Returns:
+            The money earned.
+        """
+        money = self._player.get_money()
+        for item_name in PRODUCE:
+            amount = self._player.get_amount(item_name)
+            if amount > 0:
+                self.sell(item_name, amount)
+        return self._player.get_money() - money
+
+    def get_map_file(self) -> str:
+        """ Returns the path of the map file this farm was created from. """
+        return self._map_file
+
+    def get_map(self) -> list[str]:
+        """ Returns the map for this game. """
+        return self._map
+    
+    def get_dimensions(self) -> tuple[int, int]:
+        """ Returns the dimensions of the map for this game, as
+            (number of rows, number of columns).
+        """
+        return (len(self._map), len(self._map[0]))
+    
+    def _place_plant(self, position: tuple[int, int], plant: Plant) -> None:
+        """ Puts a plant on the farm, moving its state into shared memory in
+            parallel mode.
+        """
+        if self._growth is not None:
+            plant = self._growth.adopt(position, plant)
+        if self._environment is not None:
+            self._environment.set_plant(position, True)
+        self._plants[position] = plant
+
+    def _lift_plant(self, position: tuple[int, int]) -> None:
+        """ Takes the plant at the given position off the farm. """
+        self._plants.pop(position)
+        if self._growth is not None:
+            self._growth.clear(position)
+        if self._environment is not None:
+            self._environment.set_plant(position, False)
+
+    def start_parallel_growth(self, workers: int) -> None:
+        """ Switches to parallel mode, in which new_day ages the plants in
+            bands of rows on worker processes. Intended for huge farms; the
+            result of each day is the same as in serial mode.
+
+        Parameters:
+            workers: The number of worker processes.
+        """
+        from farmcore.parallel import ParallelGrowth
+
+        self.stop_parallel_growth()
+        self._growth = ParallelGrowth(*self.get_dimensions(), workers)
+        for position, plant in self._plants.items():
+            self._plants[position] = self._growth.adopt(position, plant)
+
+    def stop_parallel_growth(self) -> None:
+        """ Leaves parallel mode, stopping the workers. Does nothing if the
+            farm is not in parallel mode.
+        """
+        if self._growth is None:
+            return
+        for position, plant in self._plants.items():
+            self._plants[position] = Plant.from_state(plant.get_state())
+        self._growth.close()
+        self._growth = None
+
+    def start_environment(self, seed: Optional[int] = None) -> None:
+        """ Turns on the environment simulation, in which soil moisture,
+            fertility and pests change every day and hold back growth and
+            harvests. Needs NumPy. Without it the farm follows the classic
+            rules.
+
+        Parameters:
+            seed: Seeds the weather and pest outbreaks, for repeatable runs.
+        """
+        from farmcore.environment import Environment
+
+        self._environment = Environment(*self.get_dimensions(), seed)
+        for position in self._plants:
+            self._environment.set_plant(position, True)
+
+    def stop_environment(self) -> None:
+        """ Turns off the environment simulation, returning to the classic
+            rules.
+        """
+        self._environment = None
+
+    def get_environment(self) -> Optional['Environment']:
+        """ Returns the farm's environment, or None under the classic rules.
+        """
+        return self._environment
+
+    def get_metrics(self) -> MetricsHistory:
+        """ Returns the history of this farm's per-day metrics. """
+        return self._metrics
+
+    def get_harvested_today(self) -> dict[str, int]:
+        """ Returns a new dictionary mapping each produce to the amount
+            harvested so far today.
+        """
+        return dict(self._harvested_today)
+
+    def set_harvested_today(self, harvested: dict[str, int]) -> None:
+        """ Sets the amounts of each produce harvested so far today, e.g. when
+            undoing a harvest.
+        """
+        self._harvested_today.update(harvested)
+
+    def record_metrics(self) -> None:
+        """ Records the metrics of the day that is ending in the metrics
+            history, and starts counting the next day's harvests from zero.
+        """
+        values = {'day': self._days_elapsed,
+                  'money': sum(player.get_money() for player in self._players),
+                  'energy_used': sum(Player.START_ENERGY - player.get_energy()
+                                     for player in self._players),
+                  'tilled': sum(row.count(SOIL) for row in self._map)}
+        for item, amount in self._harvested_today.items():
+            values['harvested_' + item.lower().replace(' ', '_')] = amount
+            self._harvested_today[item] = 0
+        for plant in self._plants.values():
+            column = f'stage_{plant.get_stage()}'
+            values[column] = values.get(column, 0) + 1
+        self._metrics.record(values)
+
+    def new_day(self) -> None:
+        """ Advances the game by one day, after recording the metrics of the
+            day that is ending. Plants whose stage changes are recorded in the
+            journal; plants that only grow a day older are not. With the
+            environment on, its fields advance first and plants on dry or
+            blighted tiles do not grow.
+        """
+        self.fast_forward(1)
+    
+    def fast_forward(self, days: int) -> None:
+        """ Advances the game by the given number of days with no player
+            actions in between, e.g. to catch up a farm that was not being
+            played. Plants jump straight to their age after the last day, and
+            the journal gets one record per plant whose stage changed and one
+            DAY_CHANGED record, however many days pass. Only the metrics of
+            the day that is ending are recorded.
+
+            With the environment on, the weather decides which plants grow on
+            each day, so the fields and plants still advance one day at a
+            time; only the journal records are batched.
+        """
+        if days < 1:
+            return
+        self.record_metrics()
+        if self._environment is None:
+            if self._growth is not None:
+                # Returns only once every band of the farm has been aged
+                staged = self._growth.age((), days)
+            else:
+                staged = []
+                for position, plant in self._plants.items():
+                    stage = plant.get_stage()
+                    plant.age(days)
+                    if plant.get_stage() != stage:
+                        staged.append(position)
+        else:
+            stages = {position: plant.get_stage()
+                      for position, plant in self._plants.items()}
+            for _ in range(days):
+                stalled = self._environment.new_day()
+                if self._growth is not None:
+                    self._growth.age(stalled)
+                    continue
+                stalled = set(stalled)
+                for position, plant in self._plants.items():
+                    if position not in stalled:
+                        plant.age()
+            staged = [position for position, stage in stages.items()
+                      if self._plants[position].get_stage() != stage]
+        for position in staged:
+            self._journal.record(PLANT_STAGED, position,
+                                 self._plants[position].get_state())
+        self._market.new_day(days)
+        for player in self._players:
+            player.reset_energy()
+        # The day changes last, so that its record follows every change the
+        # new day makes
+        self.set_days_elapsed(self._days_elapsed + days)
+
+    def get_days_elapsed(self) -> int:
+        """ Returns the number of days elapsed in this game. """
+        return self._days_elapsed
+    
+    def get_player_position(self) -> tuple[int, int]:
+        """ Returns the player's current position. """
+        return self.get_player().get_position()
+
+    def get_player_direction(self) -> str:
+        """ Returns the player's current direction, as one of UP, DOWN, LEFT,
+            or RIGHT.
+        """
+        return self.get_player().get_direction()
+
+    def move_player(self, direction: str) -> None:
+        """ Moves the player in the given direction, if possible. Also handles
+            reducing the player's energy appropriately for moving.
+
+        Parameters:
+            direction: The direction to move the player in.
+
+        Pre-condition:
+            direction in {UP, DOWN, LEFT, RIGHT}
+        """
+        # Return early if not enough energy
+        if self._player.get_energy() < MOVE_COST:
+            return
+
+        # Calculate new position
+        move_delta = MOVE_DELTAS[direction]
+        d_row, d_col = move_delta
+        old_row, old_col = self.get_player_position()
+        new_row, new_col = old_row + d_row, old_col + d_col
+
+        # Cap positions at boundaries of map
+        new_row = max(0, min(new_row, self.get_dimensions()[0] - 1))
+        new_col = max(0, min(new_col, self.get_dimensions()[1] - 1))
+
+        # Move player
+        self._player.set_position((new_row, new_col))
+        self._player.set_direction(direction)
+
+        # Reduce energy if the move succeeded
+        if (new_row, new_col) != (old_row, old_col):
+            self._player.reduce_energy(MOVE_COST)
+
+    def till_soil(self, position: tuple[int, int]) -> None:
+        """ Tills the soil at the given position, if it is untilled soil.
+            Reduces the player's energy appropriately.
+        
+        Parameters:
+            position: The position at which to till the soil.
+        """
+        # Return early if not enough energy
+        if self._player.get_energy() < TILL_COST:
+            return
+
+        row, col = position
+        if self._map[row][col] == UNTILLED:
+            self._player.reduce_energy(TILL_COST)
+            self.set_tile(position, SOIL)
+    
+    def untill_soil(self, position: tuple[int, int]) -> None:
+        """ Untills the soil at the given position, if it is tilled soil.
+            Reduces the player's energy appropriately.
+
+        Parameters:
+            position: The position at which to untill the soil.
+        """
+        # Return early if not enough energy
+        if self._player.get_energy() < UNTILL_COST:
+            return
+
+        row, col = position
+        if position not in self._plants and self._map[row][col] == SOIL:
+            self._player.reduce_energy(UNTILL_COST)
+            self.set_tile(position, UNTILLED)
+
+    def set_tile(self, position: tuple[int, int], tile: str) -> None:
+        """ Sets the tile at the given position without any of the rules or
+            energy costs of tilling, e.g. when restoring a saved farm.
+
+        Parameters:
+            position: The position of the tile.
+            tile: The new tile, one of GRASS, SOIL or UNTILLED.
+        """
+        row, col = position
+        self._map[row] = self._map[row][:col] + tile + self._map[row][col + 1:]
+        self._journal.record(TILE_CHANGED, position, tile)
+
+    def set_plant(
+            self,
+            position: tuple[int, int],
+            plant: Optional[Plant]
+        ) -> None:
+        """ Puts a plant at the given position, or removes any plant there if
+            plant is None, without any energy costs, e.g. when restoring a
+            saved farm.
+
+        Parameters:
+            position: The position of the plant.
+            plant: The plant to put there, or None.
+        """
+        if plant is None:
+            if position in self._plants:
+                self._lift_plant(position)
+                self._journal.record(PLANT_REMOVED, position, None)
+        else:
+            self._place_plant(position, plant)
+            self._journal.record(PLANT_ADDED, position, plant.get_state())
+
+    def set_days_elapsed(self, days: int) -> None:
+        """ Sets the number of days elapsed, e.g. when restoring a saved farm.
+        """
+        if days != self._days_elapsed:
+            self._days_elapsed = days
+            self._journal.record(DAY_CHANGED, None, days)
+
+    def remove_plant(self, position: tuple[int, int]) -> None:
+        """ Removes the plant at the given position, if there is one.
+            Reduces the player's energy appropriately.
+
+        Parameters:
+            position: The position at which to remove the plant.
+        """
+        # Return early if not enough energy
+        if self._player.get_energy() < REMOVE_COST:
+            return
+
+        if position in self._plants:
+            self._player.reduce_energy(REMOVE_COST)
+            self._lift_plant(position)
+            self._journal.record(PLANT_REMOVED, position, None)
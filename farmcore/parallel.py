@@ -0,0 +1,339 @@
+""" Parallel ageing of plants for huge farms.
+
+    In parallel mode the state of every plant (crop, stage, days and days
+    since harvest) lives in flat integer arrays in a block of
+    multiprocessing.shared_memory, one entry per cell of the farm, and the
+    farm's Plant objects are SharedPlants that read and write their entry.
+    The farm is split into bands of rows, and on each new day every band is
+    aged by a worker process, which also counts the plants in it that are
+    ready to harvest. The day only ends once every band is done, so ageing
+    is exactly the same as calling Plant.age on each plant in turn.
+
+    Run this file for a scaling benchmark, e.g.
+        python -m farmcore.parallel --size 2000 --workers 1,2,4,8
+"""
+import argparse
+import hashlib
+import random
+import time
+import weakref
+from multiprocessing import Pool, shared_memory
+from typing import Optional
+from farmcore.crops import Crop, CROPS
+from farmcore.model import Plant
+
+# Crop ids index the tables below. 0 means the cell has no plant
+CROP_LIST = [None] + list(CROPS.values())
+CROP_IDS = {crop.name: crop_id for crop_id, crop in enumerate(CROP_LIST)
+            if crop is not None}
+STAGE_TABLES = [crop and crop.stages for crop in CROP_LIST]
+FINAL_STAGES = [crop and crop.final_stage for crop in CROP_LIST]
+REGROW_DAYS = [crop and crop.regrow_days for crop in CROP_LIST]
+REGROW_STAGES = [crop and crop.regrow_stage for crop in CROP_LIST]
+
+# The state arrays, in the order they are laid out in shared memory
+FIELDS = ('crop', 'stage', 'days', 'since_harvest')
+ITEM_SIZE = 4
+
+# Bands per worker. More, smaller bands even out the work when plants are
+# not spread evenly over the farm
+BANDS_PER_WORKER = 4
+
+
+class SharedPlantGrid:
+    """ The state of a plant in every cell of a farm, in shared memory. """
+
+    def __init__(self, rows: int, columns: int, name: Optional[str] = None):
+        """ Creates the shared memory for a farm of the given size, or
+            attaches to existing shared memory if its name is given.
+
+        Parameters:
+            rows: The number of rows in the farm.
+            columns: The number of columns in the farm.
+            name: The name of shared memory created by another grid.
+        """
+        self.rows = rows
+        self.columns = columns
+        size = rows * columns
+        if name is None:
+            self._memory = shared_memory.SharedMemory(
+                create=True, size=max(1, len(FIELDS) * size * ITEM_SIZE))
+        else:
+            self._memory = shared_memory.SharedMemory(name=name)
+        buffer = self._memory.buf.cast('i')
+        views = [buffer[i * size:(i + 1) * size] for i in range(len(FIELDS))]
+        for field, view in zip(FIELDS, views):
+            setattr(self, field, view)
+        # The memory is released even if close() is never called, e.g. after
+        # an exception or at interpreter exit, and freed if this grid made it
+        self._release = weakref.finalize(self, _release_memory, self._memory,
+                                         views + [buffer], name is None)
+
+    def get_name(self) -> str:
+        """ Returns the name other processes attach to this grid by. """
+        return self._memory.name
+
+    def index(self, position: tuple[int, int]) -> int:
+        """ Returns the index of a cell in the state arrays. """
+        return position[0] * self.columns + position[1]
+
+    def close(self) -> None:
+        """ Detaches from the shared memory, freeing it if this grid created
+            it. Does nothing if the grid is already closed.
+        """
+        self._release()
+
+
+def _release_memory(
+        memory: shared_memory.SharedMemory,
+        views: list[memoryview],
+        owner: bool
+    ) -> None:
+    """ Releases the views of a grid's shared memory and detaches from it,
+        freeing it if the grid created it.
+    """
+    for view in views:
+        view.release()
+    memory.close()
+    if owner:
+        memory.unlink()
+
+
+def age_cells(
+        grid: SharedPlantGrid,
+        start: int,
+        end: int,
+        days: int = 1
+    ) -> tuple[list, int]:
+    """ Ages every plant in a range of cells by a number of days, following
+        the same rules as Plant.age.
+
+    Parameters:
+        grid: The plant state.
+        start: The index of the first cell.
+        end: The index after the last cell.
+        days: The number of days to age the plants by.
+
+    Returns:
+        The indices of the plants whose stage changed, and the number of
+        plants in the range that are ready to harvest.
+    """
+    crops, stages, ages, since_harvest = (grid.crop, grid.stage, grid.days,
+                                          grid.since_harvest)
+    changed = []
+    ready = 0
+    for i in range(start, end):
+        crop = crops[i]
+        if not crop:
+            continue
+        before = ages[i]
+        day = before + days
+        ages[i] = day
+        table = STAGE_TABLES[crop]
+        final = FINAL_STAGES[crop]
+        if day < len(table):
+            stage = table[day]
+        elif REGROW_DAYS[crop] is None:
+            stage = final
+        else:
+            since = since_harvest[i] + day - max(before, len(table) - 1)
+            since_harvest[i] = since
+            if (since >= REGROW_DAYS[crop] or stages[i] == final
+                    or before < len(table) - 1):
+                stage = final
+            else:
+                stage = REGROW_STAGES[crop]
+        if stage != stages[i]:
+            stages[i] = stage
+            changed.append(i)
+        if stage == final:
+            ready += 1
+    return changed, ready
+
+
+# The grid attached to by each worker process
+_worker_grid = None
+
+
+def _attach_worker(name: str, rows: int, columns: int) -> None:
+    """ Pool initializer: attaches the worker to the shared grid. """
+    global _worker_grid
+    _worker_grid = SharedPlantGrid(rows, columns, name)
+
+
+def _age_band(band: tuple[int, int, int]) -> tuple[list, int]:
+    """ Pool task: ages the plants in a band of cells by a number of days. """
+    return age_cells(_worker_grid, *band)
+
+
+class SharedPlant(Plant):
+    """ A plant whose state is stored in a SharedPlantGrid. """
+
+    def __init__(self, crop: Crop, grid: SharedPlantGrid, index: int) -> None:
+        """ Constructor for a newly planted plant in the given cell.
+
+        Parameters:
+            crop: The crop this plant grows as.
+            grid: The grid that holds the plant's state.
+            index: The index of the plant's cell in the grid.
+        """
+        self._grid = grid
+        self._index = index
+        grid.crop[index] = CROP_IDS[crop.name]
+        super().__init__(crop)
+
+    @property
+    def _stage(self) -> int:
+        return self._grid.stage[self._index]
+
+    @_stage.setter
+    def _stage(self, stage: int) -> None:
+        self._grid.stage[self._index] = stage
+
+    @property
+    def _days(self) -> int:
+        return self._grid.days[self._index]
+
+    @_days.setter
+    def _days(self, days: int) -> None:
+        self._grid.days[self._index] = days
+
+    @property
+    def _days_since_harvest(self) -> int:
+        return self._grid.since_harvest[self._index]
+
+    @_days_since_harvest.setter
+    def _days_since_harvest(self, days: int) -> None:
+        self._grid.since_harvest[self._index] = days
+
+
+class ParallelGrowth:
+    """ Ages every plant of a farm on a pool of worker processes. """
+
+    def __init__(self, rows: int, columns: int, workers: int) -> None:
+        """ Creates the shared grid and starts the workers.
+
+        Parameters:
+            rows: The number of rows in the farm.
+            columns: The number of columns in the farm.
+            workers: The number of worker processes. With 0, bands are aged
+                in this process, which gives the serial baseline.
+        """
+        self.grid = SharedPlantGrid(rows, columns)
+        self.ready = 0
+        band_count = max(1, workers * BANDS_PER_WORKER)
+        band_rows = -(-rows // band_count)
+        self._bands = [(start * columns, min(rows, start + band_rows) * columns)
+                       for start in range(0, rows, band_rows)]
+        self._pool = None
+        if workers > 0:
+            try:
+                self._pool = Pool(workers, _attach_worker,
+                                  (self.grid.get_name(), rows, columns))
+            except BaseException:
+                self.grid.close()
+                raise
+
+    def adopt(self, position: tuple[int, int], plant: Plant) -> SharedPlant:
+        """ Moves a plant's state into the grid, returning the SharedPlant
+            that replaces it.
+        """
+        shared = SharedPlant(plant.get_crop(), self.grid,
+                             self.grid.index(position))
+        _, shared._stage, shared._days, shared._days_since_harvest = \
+            plant.get_state()
+        return shared
+
+    def clear(self, position: tuple[int, int]) -> None:
+        """ Marks a cell as having no plant. """
+        self.grid.crop[self.grid.index(position)] = 0
+
+    def age(
+            self,
+            stalled: list[tuple[int, int]] = (),
+            days: int = 1
+        ) -> list[tuple[int, int]]:
+        """ Ages every plant by a number of days, returning once every band is
+            done.
+
+        Parameters:
+            stalled: The positions of plants that do not age.
+            days: The number of days to age the plants by.
+
+        Returns:
+            The positions of the plants whose stage changed, in row order.
+        """
+        # Stalled plants are hidden from the workers by clearing their crop
+        held = [(index, self.grid.crop[index]) for index in
+                map(self.grid.index, stalled)]
+        for index, _ in held:
+            self.grid.crop[index] = 0
+        bands = [(start, end, days) for start, end in self._bands]
+        if self._pool is None:
+            results = [age_cells(self.grid, *band) for band in bands]
+        else:
+            results = self._pool.map(_age_band, bands)
+        for index, crop in held:
+            self.grid.crop[index] = crop
+        self.ready = sum(ready for _, ready in results) + sum(
+            self.grid.stage[index] == FINAL_STAGES[crop] for index, crop in held)
+        columns = self.grid.columns
+        return [divmod(index, columns) for changed, _ in results
+                for index in changed]
+
+    def close(self) -> None:
+        """ Stops the workers and frees the shared grid. """
+        if self._pool is not None:
+            self._pool.close()
+            self._pool.join()
+        self.grid.close()
+
+
+def fill_grid(grid: SharedPlantGrid, seed: int = 0) -> None:
+    """ Plants a random crop of a random age in every cell of a grid. """
+    rng = random.Random(seed)
+    for i in range(grid.rows * grid.columns):
+        crop_id = rng.randrange(1, len(CROP_LIST))
+        days = rng.randrange(12)
+        grid.crop[i] = crop_id
+        grid.days[i] = days
+        grid.stage[i] = STAGE_TABLES[crop_id][min(days,
+                                                  len(STAGE_TABLES[crop_id]) - 1)]
+
+
+def benchmark(size: int, days: int, worker_counts: list[int]) -> None:
+    """ Times ageing a fully planted size x size farm with each number of
+        workers, checking that every run ends in the same state.
+    """
+    baseline = None
+    for workers in [0] + worker_counts:
+        growth = ParallelGrowth(size, size, workers)
+        fill_grid(growth.grid)
+        start = time.perf_counter()
+        for _ in range(days):
+            growth.age()
+        elapsed = time.perf_counter() - start
+        digest = hashlib.sha1(growth.grid._memory.buf[:]).hexdigest()[:12]
+        ready = growth.ready
+        growth.close()
+        baseline = baseline or elapsed
+        label = 'serial' if workers == 0 else f'{workers} workers'
+        print(f'{label:>10}: {elapsed / days * 1000:8.1f}ms per day, '
+              f'{baseline / elapsed:5.2f}x, {ready} ready, state {digest}')
+
+
+def main() -> None:
+    """ Runs the scaling benchmark. """
+    parser = argparse.ArgumentParser(description='Parallel new_day benchmark')
+    parser.add_argument('--size', type=int, default=1000,
+                        help='rows and columns of the farm')
+    parser.add_argument('--days', type=int, default=5)
+    parser.add_argument('--workers', default='1,2,4',
+                        help='comma separated worker counts')
+    args = parser.parse_args()
+    benchmark(args.size, args.days,
+              [int(count) for count in args.workers.split(',')])
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,40 @@
+""" Measures the memory used by an object graph.
+
+    Sizes are found by walking an object and everything it refers to through
+    dicts, sequences, sets and instance attributes, and summing
+    sys.getsizeof. Objects that several owners share, such as a map's rows,
+    can be left out so that each owner is charged only for its own data.
+"""
+import sys
+from collections import deque
+
+
+def deep_sizeof(obj: object, shared: set[int], seen: set[int] = None) -> int:
+    """ Returns the memory used by an object and everything it refers to,
+        leaving out shared objects and objects that have already been counted.
+
+    Parameters:
+        obj: The object to measure.
+        shared: The ids of objects that should not be counted.
+        seen: The ids of objects counted so far.
+
+    Returns:
+        The size in bytes.
+    """
+    seen = set() if seen is None else seen
+    stack = [obj]
+    size = 0
+    while stack:
+        current = stack.pop()
+        if id(current) in seen or id(current) in shared:
+            continue
+        seen.add(id(current))
+        size += sys.getsizeof(current)
+        if isinstance(current, dict):
+            stack.extend(current.keys())
+            stack.extend(current.values())
+        elif isinstance(current, (list, tuple, set, deque)):
+            stack.extend(current)
+        elif hasattr(current, '__dict__'):
+            stack.append(vars(current))
+    return size
@@ -0,0 +1,140 @@
+""" A fixed-timestep game loop for tkinter.
+
+    Simulation ticks run at a fixed rate regardless of how fast the machine
+    draws, and rendering runs separately at a capped frame rate. Each render
+    is given how far the simulation is between its last tick and the next, so
+    that movement can be interpolated smoothly. When the machine cannot keep
+    up, the frame budget watchdog drops render frames; simulation ticks are
+    never dropped, so the game runs at the same speed on every machine.
+"""
+import time
+import tkinter as tk
+from typing import Callable
+
+
+class GameLoop:
+    """ Runs simulation ticks and render frames from a single tk after loop.
+    """
+
+    # Never drop more than this many render frames in a row, so the screen
+    # still updates when the machine is permanently overloaded
+    MAX_DROPPED_IN_ROW = 10
+
+    def __init__(
+            self,
+            root: tk.Misc,
+            on_tick: Callable[[], None],
+            on_render: Callable[[float], bool],
+            tick_rate: float = 30,
+            max_fps: float = 60,
+            frame_budget: float = None
+        ) -> None:
+        """ Constructor for the loop. The loop does not run until start() is
+            called.
+
+        Parameters:
+            root: Any widget, used to schedule the loop.
+            on_tick: Advances the simulation by one tick.
+            on_render: Draws a frame. It is given the fraction of a tick that
+                has passed since the last tick, and returns True if it wants
+                another frame even if no render is requested (e.g. while an
+                interpolated movement is in progress).
+            tick_rate: Simulation ticks per second.
+            max_fps: The most render frames per second.
+            frame_budget: Seconds a loop step may spend on ticks and rendering
+                before render frames are dropped. Defaults to one tick.
+        """
+        self._root = root
+        self._on_tick = on_tick
+        self._on_render = on_render
+        self._tick_length = 1 / tick_rate
+        self._frame_length = 1 / max_fps
+        self._frame_budget = (self._tick_length if frame_budget is None
+                              else frame_budget)
+        self._after_id = None
+        self._last_time = 0.0
+        self._accumulator = 0.0
+        self._last_render = 0.0
+        self._render_cost = 0.0
+        self._render_requested = True
+        self._animating = False
+        self._dropped_in_row = 0
+        self.ticks = 0
+        self.frames = 0
+        self.dropped_frames = 0
+
+    def start(self) -> None:
+        """ Starts running ticks and frames. """
+        if self._after_id is None:
+            self._last_time = time.perf_counter()
+            self._after_id = self._root.after(0, self._step)
+
+    def stop(self) -> None:
+        """ Stops running ticks and frames. """
+        if self._after_id is not None:
+            self._root.after_cancel(self._after_id)
+            self._after_id = None
+
+    def is_running(self) -> bool:
+        """ Returns True iff the loop has been started and not stopped. """
+        return self._after_id is not None
+
+    def request_render(self) -> None:
+        """ Asks for a frame to be drawn. Any number of requests before the
+            next frame result in a single frame.
+        """
+        self._render_requested = True
+
+    def get_tick_length(self) -> float:
+        """ Returns the length of a simulation tick in seconds. """
+        return self._tick_length
+
+    def get_sim_time(self) -> float:
+        """ Returns the current simulation time in ticks, including the
+            fraction of the tick in progress.
+        """
+        elapsed = self._accumulator
+        if self._after_id is not None:
+            elapsed += time.perf_counter() - self._last_time
+        return self.ticks + elapsed / self._tick_length
+
+    def _step(self) -> None:
+        """ Runs every tick that is due, renders a frame if one is wanted and
+            the frame budget allows, then schedules the next step.
+        """
+        now = time.perf_counter()
+        self._accumulator += now - self._last_time
+        self._last_time = now
+
+        while self._accumulator >= self._tick_length:
+            self._on_tick()
+            self.ticks += 1
+            self._accumulator -= self._tick_length
+        tick_cost = time.perf_counter() - now
+
+        wants_frame = self._render_requested or self._animating
+        if wants_frame and now - self._last_render >= self._frame_length:
+            overloaded = tick_cost + self._render_cost > self._frame_budget
+            if overloaded and self._dropped_in_row < self.MAX_DROPPED_IN_ROW:
+                self.dropped_frames += 1
+                self._dropped_in_row += 1
+            else:
+                self._render(now)
+
+        # Wake up for whichever of the next tick and the next frame is first
+        delay = self._tick_length - self._accumulator
+        if self._render_requested or self._animating:
+            delay = min(delay, self._frame_length - (now - self._last_render))
+        self._after_id = self._root.after(max(1, int(delay * 1000)),
+                                          self._step)
+
+    def _render(self, now: float) -> None:
+        """ Draws a frame and updates the running estimate of render cost. """
+        self._render_requested = False
+        start = time.perf_counter()
+        self._animating = self._on_render(self._accumulator / self._tick_length)
+        cost = time.perf_counter() - start
+        self._render_cost = 0.8 * self._render_cost + 0.2 * cost
+        self._last_render = now
+        self._dropped_in_row = 0
+        self.frames += 1
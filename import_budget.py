@@ -0,0 +1,92 @@
+""" Checks that the headless parts of the game import quickly and without the
+    GUI.
+
+    Each module is imported in a fresh interpreter under python -X importtime.
+    The check fails if any module loads tkinter, PIL or numpy, or if its
+    cumulative import time is over the budget. The budget is generous, so it
+    only catches a heavy dependency creeping into the core, not noise.
+
+    Run this file from the top of the repository, e.g.
+        python import_budget.py --budget 100
+"""
+import argparse
+import subprocess
+import sys
+
+# Modules that must import without the GUI, within the budget
+HEADLESS_MODULES = ('farmcore.model', 'farmcore.parallel', 'farmcore.metrics',
+                    'farmcore.sizeof', 'model', 'save', 'undo', 'server',
+                    'sessions', 'store', 'macros')
+
+# Modules that no headless module may load
+FORBIDDEN_MODULES = ('tkinter', '_tkinter', 'PIL', 'numpy')
+
+# Default budget, in milliseconds of cumulative import time per module
+DEFAULT_BUDGET = 100.0
+
+
+def measure_import(module: str) -> tuple[float, list[str]]:
+    """ Imports a module in a fresh interpreter.
+
+    Parameters:
+        module: The name of the module to import.
+
+    Returns:
+        The module's cumulative import time in milliseconds, and the
+        forbidden modules it loaded.
+    """
+    code = (f'import sys, {module}\n'
+            f'print(" ".join(name for name in {FORBIDDEN_MODULES!r} '
+            f'if name in sys.modules))')
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', code],
+                            capture_output=True, text=True, check=True)
+    cumulative = 0
+    for line in result.stderr.splitlines():
+        # Lines look like "import time:  self [us] | cumulative | name"
+        fields = line.split('|')
+        if len(fields) == 3 and fields[2].strip() == module:
+            cumulative = int(fields[1])
+    return cumulative / 1000, result.stdout.split()
+
+
+def check_imports(
+        modules: tuple[str, ...] = HEADLESS_MODULES,
+        budget: float = DEFAULT_BUDGET
+    ) -> list[str]:
+    """ Measures every module and reports those that break the rules.
+
+    Parameters:
+        modules: The names of the modules to check.
+        budget: The most milliseconds each module may take to import.
+
+    Returns:
+        A description of every failure, empty if all modules passed.
+    """
+    failures = []
+    for module in modules:
+        elapsed, loaded = measure_import(module)
+        print(f'{module:20} {elapsed:7.1f}ms', *loaded)
+        if loaded:
+            failures.append(f'{module} loads {", ".join(loaded)}')
+        if elapsed > budget:
+            failures.append(f'{module} takes {elapsed:.1f}ms to import, '
+                            f'over the {budget:.0f}ms budget')
+    return failures
+
+
+def main() -> None:
+    """ Checks the headless modules, exiting with an error if any fail. """
+    parser = argparse.ArgumentParser(description='Import time budget check')
+    parser.add_argument('--budget', type=float, default=DEFAULT_BUDGET,
+                        help='milliseconds allowed per module')
+    parser.add_argument('modules', nargs='*', default=HEADLESS_MODULES)
+    args = parser.parse_args()
+
+    failures = check_imports(tuple(args.modules), args.budget)
+    for failure in failures:
+        print('FAIL:', failure)
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,331 @@
+""" Macros: scripted sequences of farm actions.
+
+    A macro is a small script with one command per line, e.g.
+        # a potato patch
+        till 2 2 4 6
+        plant Potato Seed 2 2 4 6
+        wait 4
+        harvest 2 2 4 6
+        sell Potato 10
+    Commands that take a rectangle (two corners, row then column) also take
+    a single cell. The commands are:
+        goto ROW COL
+        till | untill | harvest | remove  ROW COL [ROW COL]
+        plant SEED  ROW COL [ROW COL]
+        select ITEM
+        buy ITEM [QUANTITY]
+        sell ITEM [QUANTITY]
+        sell_all
+        wait [DAYS]          ends the day DAYS times (default 1)
+        repeat COUNT ... end
+    Blank lines and anything after a # are ignored.
+
+    compile_macro turns a script into a flat program of action messages, the
+    same messages FarmServer clients send, with every rectangle expanded into
+    a walk over its cells. A MacroRunner then plays the program against a
+    FarmModel in batches of actions, walking the player to each cell one move
+    at a time. Every action follows the usual rules and energy costs; if the
+    player cannot move, the runner stops.
+
+    Run this file to play a script headlessly, or to benchmark throughput:
+        python macros.py patch.txt --map maps/map1.txt
+        python macros.py --benchmark
+"""
+import argparse
+import time
+from typing import Optional
+from model import *
+from server import apply_action
+
+# Commands that act on every cell of a rectangle
+CELL_COMMANDS = {'till': 'till', 'untill': 'untill', 'harvest': 'harvest',
+                 'remove': 'remove', 'plant': 'plant'}
+
+# Directions tried, in order, when walking towards a cell
+WALK_ORDER = ((DOWN, 1, 0), (UP, -1, 0), (RIGHT, 0, 1), (LEFT, 0, -1))
+
+BENCHMARK_SCRIPT = '''
+# A season of potatoes and kale, sized to fit each day's energy
+repeat 50
+    till 1 1 2 4
+    plant Potato Seed 1 1 1 4
+    plant Kale Seed 2 1 2 4
+    wait 6
+    harvest 1 1 2 4
+    wait
+    untill 1 1 2 4
+    sell_all
+    buy Potato Seed 4
+    buy Kale Seed 4
+    wait
+end
+'''
+
+
+class MacroError(ValueError):
+    """ Raised when a macro script cannot be compiled. """
+
+    def __init__(self, line_number: int, message: str) -> None:
+        """ Constructor for an error on the given line of a script. """
+        super().__init__(f'line {line_number}: {message}')
+        self.line_number = line_number
+
+
+def split_numbers(words: list[str]) -> tuple[str, list[int]]:
+    """ Splits a command's arguments into a leading name, which may contain
+        spaces, and the whole numbers that follow it.
+    """
+    numbers = []
+    while words and words[-1].lstrip('-').isdigit():
+        numbers.insert(0, int(words.pop()))
+    return ' '.join(words), numbers
+
+
+def rectangle_cells(
+        corners: list[int],
+        dimensions: tuple[int, int]
+    ) -> list[tuple[int, int]]:
+    """ Returns the cells of a rectangle given as [row, col] or
+        [row, col, row, col], in a snake order that walks each row and then
+        steps down to the next.
+
+    Raises:
+        ValueError: If the rectangle is malformed or leaves the farm.
+    """
+    if len(corners) == 2:
+        corners = corners * 2
+    if len(corners) != 4:
+        raise ValueError('expected ROW COL or ROW COL ROW COL')
+    top, bottom = sorted(corners[0::2])
+    left, right = sorted(corners[1::2])
+    rows, columns = dimensions
+    if top < 0 or left < 0 or bottom >= rows or right >= columns:
+        raise ValueError(f'rectangle is outside the {rows}x{columns} farm')
+    cells = []
+    for i, row in enumerate(range(top, bottom + 1)):
+        cols = range(left, right + 1)
+        cells.extend((row, col) for col in (cols if i % 2 == 0
+                                            else reversed(cols)))
+    return cells
+
+
+def compile_macro(script: str, dimensions: tuple[int, int]) -> list[dict]:
+    """ Compiles a macro script into a flat program of action messages.
+
+    Parameters:
+        script: The text of the script.
+        dimensions: The (rows, columns) of the farm the macro will run on.
+
+    Returns:
+        The program. 'goto' messages give the cell to walk to; every other
+        message is one action for server.apply_action.
+
+    Raises:
+        MacroError: If the script is not valid.
+    """
+    # Each open block is the program being built and the repeat count
+    blocks = [([], 1, 0)]
+    for line_number, line in enumerate(script.splitlines(), start=1):
+        words = line.split('#', 1)[0].split()
+        if not words:
+            continue
+        command, arguments = words[0].lower(), words[1:]
+        program = blocks[-1][0]
+        try:
+            name, numbers = split_numbers(arguments)
+            if command == 'repeat':
+                if name or len(numbers) != 1 or numbers[0] < 0:
+                    raise ValueError('expected repeat COUNT')
+                blocks.append(([], numbers[0], line_number))
+            elif command == 'end':
+                if len(blocks) == 1 or arguments:
+                    raise ValueError('end without repeat')
+                body, count, _ = blocks.pop()
+                blocks[-1][0].extend(body * count)
+            elif command == 'goto':
+                if name or len(numbers) != 2:
+                    raise ValueError('expected goto ROW COL')
+                cell, = rectangle_cells(numbers, dimensions)
+                program.append({'action': 'goto', 'position': cell})
+            elif command in CELL_COMMANDS:
+                if command == 'plant':
+                    if name not in SEEDS:
+                        raise ValueError(f'{name!r} is not a seed')
+                    program.append({'action': 'select', 'item': name})
+                elif name:
+                    raise ValueError(f'unexpected {name!r}')
+                for cell in rectangle_cells(numbers, dimensions):
+                    program.append({'action': 'goto', 'position': cell})
+                    program.append({'action': CELL_COMMANDS[command]})
+            elif command in ('select', 'buy', 'sell'):
+                if name not in ITEMS:
+                    raise ValueError(f'{name!r} is not an item')
+                if command == 'select':
+                    if numbers:
+                        raise ValueError('expected select ITEM')
+                    program.append({'action': 'select', 'item': name})
+                else:
+                    quantity = numbers[0] if numbers else 1
+                    if len(numbers) > 1 or quantity < 1:
+                        raise ValueError(f'expected {command} ITEM [QUANTITY]')
+                    program.append({'action': command, 'item': name,
+                                    'quantity': quantity})
+            elif command == 'sell_all':
+                if arguments:
+                    raise ValueError('sell_all takes no arguments')
+                program.append({'action': 'sell_all'})
+            elif command == 'wait':
+                days = numbers[0] if numbers else 1
+                if name or len(numbers) > 1 or days < 0:
+                    raise ValueError('expected wait [DAYS]')
+                program.extend([{'action': 'new_day'}] * days)
+            else:
+                raise ValueError(f'unknown command {command!r}')
+        except ValueError as error:
+            raise MacroError(line_number, str(error)) from None
+    if len(blocks) > 1:
+        raise MacroError(blocks[-1][2], 'repeat without end')
+    return blocks[0][0]
+
+
+class MacroRunner:
+    """ Plays a compiled macro against a farm, a batch of actions at a time.
+    """
+
+    def __init__(
+            self,
+            model: FarmModel,
+            program: list[dict],
+            player: Optional[Player] = None
+        ) -> None:
+        """ Constructor for a runner at the start of a program.
+
+        Parameters:
+            model: The farm to act on.
+            program: A program from compile_macro.
+            player: The player to act as. Defaults to the active player.
+        """
+        self._model = model
+        self._program = program
+        self._player = player or model.get_player()
+        self._index = 0
+        self.actions = 0
+        self.stopped = None
+
+    def is_done(self) -> bool:
+        """ Returns True iff the program has finished or has been stopped. """
+        return self.stopped is not None or self._index >= len(self._program)
+
+    def stop(self, reason: str) -> None:
+        """ Stops the program before its next action. """
+        self.stopped = reason
+
+    def run(self, max_actions: Optional[int] = None) -> int:
+        """ Performs the next actions of the program. Each move towards a
+            'goto' cell counts as one action.
+
+        Parameters:
+            max_actions: The most actions to perform, or None to run the
+                program to the end.
+
+        Returns:
+            The number of actions performed.
+        """
+        model, player, program = self._model, self._player, self._program
+        performed = 0
+        while not self.is_done():
+            if max_actions is not None and performed >= max_actions:
+                break
+            message = program[self._index]
+            if message['action'] == 'goto':
+                position = player.get_position()
+                if position == message['position']:
+                    self._index += 1
+                    continue
+                direction = self.next_move(position, message['position'])
+                model.set_active_player(player)
+                model.move_player(direction)
+                if player.get_position() == position:
+                    self.stop('the player cannot move')
+            else:
+                apply_action(model, player, message)
+                self._index += 1
+            performed += 1
+        self.actions += performed
+        return performed
+
+    @staticmethod
+    def next_move(
+            position: tuple[int, int],
+            target: tuple[int, int]
+        ) -> str:
+        """ Returns the direction of the next step from a cell towards
+            another, moving along rows before columns.
+        """
+        d_row, d_col = target[0] - position[0], target[1] - position[1]
+        for direction, row_step, col_step in WALK_ORDER:
+            if (row_step and d_row * row_step > 0) or \
+                    (col_step and d_col * col_step > 0):
+                return direction
+
+
+def run_macro(model: FarmModel, script: str) -> MacroRunner:
+    """ Compiles a script and plays it headlessly against a farm at full
+        speed.
+
+    Returns:
+        The finished runner.
+    """
+    runner = MacroRunner(model, compile_macro(script, model.get_dimensions()))
+    runner.run()
+    return runner
+
+
+def benchmark(seconds: float = 2.0) -> None:
+    """ Plays the benchmark script headlessly on fresh farms for about the
+        given time and reports the throughput.
+    """
+    start = time.perf_counter()
+    dimensions = FarmModel('maps/map1.txt').get_dimensions()
+    program = compile_macro(BENCHMARK_SCRIPT, dimensions)
+    compiled = time.perf_counter() - start
+    actions = 0
+    start = time.perf_counter()
+    while time.perf_counter() - start < seconds:
+        model = FarmModel('maps/map1.txt')
+        player = model.get_player()
+        player.set_money(1000)
+        runner = MacroRunner(model, program)
+        runner.run()
+        actions += runner.actions
+    elapsed = time.perf_counter() - start
+    print(f'compiled {len(program)} messages in {compiled * 1000:.2f}ms')
+    print(f'{actions} actions in {elapsed:.2f}s: '
+          f'{actions / elapsed:,.0f} actions/s')
+
+
+def main() -> None:
+    """ Plays a macro script headlessly, or runs the benchmark. """
+    parser = argparse.ArgumentParser(description='Farm macros')
+    parser.add_argument('script', nargs='?')
+    parser.add_argument('--map', default='maps/map1.txt')
+    parser.add_argument('--benchmark', action='store_true')
+    args = parser.parse_args()
+    if args.benchmark or not args.script:
+        benchmark()
+        return
+    with open(args.script) as file:
+        script = file.read()
+    model = FarmModel(args.map)
+    runner = run_macro(model, script)
+    player = model.get_player()
+    print(f'{runner.actions} actions, day {model.get_days_elapsed()}, '
+          f'${player.get_money()}, {player.get_energy()} energy, '
+          f'{len(model.get_plants())} plants')
+    print(player.get_inventory())
+    if runner.stopped:
+        print(f'stopped: {runner.stopped}')
+
+
+if __name__ == '__main__':
+    main()
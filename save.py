@@ -0,0 +1,120 @@
+""" A compact save format for farms.
+
+    A saved farm records the map file it was created from and only the tiles
+    that differ from that file, so the bulk of the map is never stored. The
+    plants, players, market, day, metrics history and today's harvests are
+    stored as flat lists, and the whole record is compressed JSON.
+"""
+import json
+import zlib
+from typing import Callable, Optional
+from model import *
+
+
+def encode_plant(position: tuple[int, int], plant: Plant) -> list:
+    """ Returns a plant as [row, col, crop name, stage, days, days since
+        harvest].
+    """
+    return [*position, *plant.get_state()]
+
+
+def decode_plant(record: list) -> tuple[tuple[int, int], Plant]:
+    """ Rebuilds a plant saved by encode_plant, returning its position and
+        the plant.
+    """
+    row, col, *state = record
+    return (row, col), Plant.from_state(state)
+
+
+def encode_player(player: Player) -> list:
+    """ Returns a player as [energy, money, inventory, row, col, direction,
+        selected item].
+    """
+    return [player.get_energy(), player.get_money(),
+            dict(player.get_inventory()), *player.get_position(),
+            player.get_direction(), player.get_selected_item()]
+
+
+def decode_player(record: list, journal: Optional[Journal] = None) -> Player:
+    """ Rebuilds a player saved by encode_player, recording its later changes
+        in the given journal.
+    """
+    energy, money, inventory, row, col, direction, selected = record
+    player = Player(journal)
+    player.set_energy(energy)
+    player.set_money(money)
+    for item in ITEMS:
+        player.set_amount(item, inventory.get(item, 0))
+    player.set_position((row, col))
+    player.set_direction(direction)
+    player.set_selected_item(selected)
+    return player
+
+
+def dump_model(
+        model: FarmModel,
+        base_map: Optional[tuple[str, ...]] = None
+    ) -> bytes:
+    """ Saves a farm in the compact format.
+
+    Parameters:
+        model: The farm to save.
+        base_map: The rows of the farm's map file, if already loaded.
+
+    Returns:
+        The saved farm.
+    """
+    if base_map is None:
+        base_map = read_map(model.get_map_file())
+    tiles = [[row, col, tile]
+             for row, (current, base) in enumerate(zip(model.get_map(), base_map))
+             if current is not base and current != base
+             for col, tile in enumerate(current) if tile != base[col]]
+    record = {
+        'f': model.get_map_file(),
+        'd': model.get_days_elapsed(),
+        't': tiles,
+        'p': [encode_plant(position, plant)
+              for position, plant in model.get_plants().items()],
+        'u': [encode_player(player) for player in model.get_players()],
+        'a': model.get_players().index(model.get_player()),
+        'k': model.get_market().get_state(),
+        'm': model.get_metrics().get_state(),
+        'h': model.get_harvested_today(),
+    }
+    return zlib.compress(json.dumps(record, separators=(',', ':')).encode())
+
+
+def load_model(
+        data: bytes,
+        map_loader: Callable[[str], tuple[str, ...]] = None,
+        journal_capacity: int = JOURNAL_CAPACITY
+    ) -> FarmModel:
+    """ Loads a farm saved by dump_model.
+
+    Parameters:
+        data: The saved farm.
+        map_loader: Returns the rows of a map file. Loaders that return the
+            same tuple for every call let loaded farms share their rows.
+        journal_capacity: The most change records the farm's journal keeps.
+
+    Returns:
+        The loaded farm.
+    """
+    record = json.loads(zlib.decompress(data))
+    shared_map = map_loader(record['f']) if map_loader is not None else None
+    model = FarmModel(record['f'], shared_map, journal_capacity)
+    for row, col, tile in record['t']:
+        model.set_tile((row, col), tile)
+    model.set_days_elapsed(record['d'])
+    for plant in record['p']:
+        model.set_plant(*decode_plant(plant))
+    model.set_players([decode_player(player, model.get_journal())
+                       for player in record['u']])
+    model.set_active_player(model.get_players()[record['a']])
+    model.get_market().set_state(record['k'])
+    # Farms saved before metrics were saved start with an empty history
+    if 'm' in record:
+        model.get_metrics().set_state(record['m'])
+        model.set_harvested_today(record['h'])
+    return model
@@ -0,0 +1,642 @@
+""" A local multiplayer server for the farm game.
+
+    One authoritative FarmModel is hosted by an asyncio TCP server. Each
+    connected client controls its own Player on that farm. Clients send
+    actions, and after applying each action the server broadcasts a compact
+    delta of what changed (tiles, plants, and the stats of the affected
+    players) rather than the full state.
+
+    Messages are newline delimited JSON objects. A client sends actions such as
+        {"action": "move", "direction": "w", "seq": 1}
+    and receives, once on joining,
+        {"type": "welcome", "player": 0, "state": {...}}
+    and then after every action by any player
+        {"type": "delta", "version": 7, "by": 0, "seq": 1, "t": ...,
+         "tiles": [[row, col, tile]], "plants": [[row, col, name, stage]],
+         "removed": [[row, col]], "players": {"0": {...}}, "day": 2,
+         "prices": [[buy prices], [sell prices]]}
+    where empty fields are left out. When a client joins or leaves, a delta
+    with the joining player's reset stats, or with "left": player id, is
+    broadcast too. A message that cannot be applied is answered, to its
+    sender only, with
+        {"type": "error", "seq": 1, "error": "..."}
+    and a line longer than the reader's limit also closes the connection.
+"""
+import argparse
+import asyncio
+import json
+import random
+import time
+from typing import Optional
+from constants import *
+from model import *
+
+
+ACTIONS = ('move', 'till', 'untill', 'plant', 'harvest', 'remove', 'select',
+           'buy', 'sell', 'sell_all', 'new_day')
+
+
+class ActionError(ValueError):
+    """ Raised for an action message that is malformed. """
+
+
+def validate_action(message: dict) -> None:
+    """ Checks that an action message is well formed before it is applied.
+
+    Parameters:
+        message: The action message sent by the client.
+
+    Raises:
+        ActionError: If the message is not an object, its action is not one
+            of ACTIONS, a move has no valid direction, its item is not a
+            string, or its quantity is not a positive whole number.
+    """
+    if not isinstance(message, dict):
+        raise ActionError('an action must be a JSON object')
+    action = message.get('action')
+    if not isinstance(action, str) or action not in ACTIONS:
+        raise ActionError(f'unknown action: {action!r}')
+    if action == 'move' and message.get('direction') not in MOVE_DELTAS:
+        raise ActionError('a move needs a direction in '
+                          + ', '.join(MOVE_DELTAS))
+    if 'item' in message and not isinstance(message['item'], str):
+        raise ActionError('item must be a string')
+    if 'quantity' in message:
+        quantity = message['quantity']
+        # bool is a subclass of int, but true is not a quantity
+        if (not isinstance(quantity, int) or isinstance(quantity, bool)
+                or quantity < 1):
+            raise ActionError('quantity must be a positive integer')
+
+
+def apply_action(model: FarmModel, player: Player, message: dict) -> None:
+    """ Performs one action for the given player, following the same rules as
+        the keyboard and inventory controls of FarmGame.
+
+    Parameters:
+        model: The farm to act on.
+        player: The player performing the action.
+        message: The action message sent by the client.
+
+    Raises:
+        ActionError: If the message is malformed. Nothing is changed.
+    """
+    validate_action(message)
+    model.set_active_player(player)
+    action = message.get('action')
+    position = player.get_position()
+    if action == 'move':
+        model.move_player(message['direction'])
+    elif action == 'till':
+        model.till_soil(position)
+    elif action == 'untill':
+        model.untill_soil(position)
+    elif action == 'plant':
+        seed = player.get_selected_item()
+        row, col = position
+        if (seed in SEED_FACTORIES and player.get_amount(seed) > 0
+                and model.get_map()[row][col] == SOIL):
+            if model.add_plant(position, SEED_FACTORIES[seed]()):
+                player.remove_item((seed, 1))
+    elif action == 'harvest':
+        harvest = model.harvest_plant(position)
+        if harvest is not None:
+            player.add_item(harvest)
+    elif action == 'remove':
+        model.remove_plant(position)
+    elif action == 'select':
+        player.select_item(message.get('item'))
+    elif action == 'buy':
+        if message.get('item') in BUY_PRICES:
+            model.buy(message['item'], message.get('quantity', 1))
+    elif action == 'sell':
+        if message.get('item') in SELL_PRICES:
+            model.sell(message['item'], message.get('quantity', 1))
+    elif action == 'sell_all':
+        model.sell_all_produce()
+    elif action == 'new_day':
+        model.new_day()
+
+
+def encode_player(player: Player) -> dict:
+    """ Returns the compact wire representation of a player's state. """
+    return {
+        'p': list(player.get_position()),
+        'd': player.get_direction(),
+        'e': player.get_energy(),
+        'm': player.get_money(),
+        'i': player.get_inventory(),
+        's': player.get_selected_item(),
+    }
+
+
+def encode_prices(model: FarmModel) -> list[list]:
+    """ Returns today's [buy prices, sell prices], indexed by item ID. """
+    market = model.get_market()
+    return [market.get_buy_prices(), market.get_sell_prices()]
+
+
+def encode_state(model: FarmModel) -> dict:
+    """ Returns the full state of the farm, as sent to a client when it joins.
+    """
+    return {
+        'map': list(model.get_map()),
+        'day': model.get_days_elapsed(),
+        'prices': encode_prices(model),
+        'plants': [[row, col, plant.get_name(), plant.get_stage()]
+                   for (row, col), plant in model.get_plants().items()],
+        'players': {str(i): encode_player(player)
+                    for i, player in enumerate(model.get_players())},
+    }
+
+
+def reset_player(player: Player) -> None:
+    """ Returns a player to the state of a new player, recording each change
+        in its journal.
+    """
+    new = Player()
+    player.set_energy(new.get_energy())
+    player.set_money(new.get_money())
+    for item in ITEMS:
+        player.set_amount(item, new.get_amount(item))
+    player.set_position(new.get_position())
+    player.set_direction(new.get_direction())
+    player.set_selected_item(new.get_selected_item())
+
+
+class FarmServer:
+    """ Hosts one authoritative FarmModel for several clients over TCP. """
+
+    def __init__(
+            self,
+            map_file: str,
+            host: str = '127.0.0.1',
+            port: int = 0
+        ) -> None:
+        """ Constructor for the server. The server does not listen until
+            start() is awaited.
+
+        Parameters:
+            map_file: The path to the map the shared farm is built from.
+            host: The address to listen on.
+            port: The port to listen on, or 0 to pick any free port.
+        """
+        self._model = FarmModel(map_file)
+        self._host = host
+        self._port = port
+        self._server = None
+        self._writers = {}
+        self._handlers = set()
+        self._players = {}
+        self._free_players = [self._model.get_player()]
+        self._version = 0
+
+    def get_model(self) -> FarmModel:
+        """ Returns the authoritative model hosted by this server. """
+        return self._model
+
+    def get_address(self) -> tuple[str, int]:
+        """ Returns the (host, port) the server is listening on. """
+        return self._host, self._port
+
+    async def start(self) -> tuple[str, int]:
+        """ Starts listening for clients and returns the (host, port) that the
+            server is listening on.
+        """
+        self._server = await asyncio.start_server(
+            self._handle_client, self._host, self._port)
+        self._host, self._port = self._server.sockets[0].getsockname()[:2]
+        return self._host, self._port
+
+    async def stop(self) -> None:
+        """ Disconnects every client and stops listening. """
+        for writer in list(self._writers.values()):
+            writer.close()
+        await asyncio.gather(*self._handlers, return_exceptions=True)
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+
+    def _join(self) -> int:
+        """ Assigns a player to a newly connected client and returns its id.
+            Players of clients that left are reused, back in their starting
+            state, before new ones are made.
+        """
+        if self._free_players:
+            player = self._free_players.pop(0)
+            reset_player(player)
+        else:
+            player = self._model.add_player()
+        player_id = self._model.get_players().index(player)
+        self._players[player_id] = player
+        return player_id
+
+    def apply(self, player_id: int, message: dict) -> dict:
+        """ Applies an action from the given player to the model and returns
+            the delta describing its effects.
+
+        Parameters:
+            player_id: The id of the player performing the action.
+            message: The action message sent by the client.
+
+        Returns:
+            The delta message to broadcast to every client.
+        """
+        player = self._players[player_id]
+        journal = self._model.get_journal()
+        since = journal.get_version()
+
+        apply_action(self._model, player, message)
+
+        # The journal says which cells and players the action changed. If it
+        # has already discarded some of the changes, resend everything.
+        changes = journal.changes_since(since)
+        if changes is None:
+            rows, columns = self._model.get_dimensions()
+            tile_cells = {(row, col) for row in range(rows)
+                          for col in range(columns)}
+            plant_cells = tile_cells
+            changed_players = {id(changed) for changed in self._players.values()}
+            new_day = True
+        else:
+            tile_cells = {subject for _, kind, subject, _ in changes
+                          if kind == TILE_CHANGED}
+            plant_cells = {subject for _, kind, subject, _ in changes
+                           if kind in PLANT_CHANGES}
+            changed_players = {id(subject) for _, kind, subject, _ in changes
+                               if isinstance(subject, Player)}
+            new_day = any(kind == DAY_CHANGED for _, kind, _, _ in changes)
+
+        self._version += 1
+        delta = {'type': 'delta', 'version': self._version, 'by': player_id}
+        if 'seq' in message:
+            delta['seq'] = message['seq']
+        tiles, changed_plants, removed = [], [], []
+        plants = self._model.get_plants()
+        for row, col in sorted(tile_cells):
+            tiles.append([row, col, self._model.get_map()[row][col]])
+        for row, col in sorted(plant_cells):
+            plant = plants.get((row, col))
+            if plant is None:
+                removed.append([row, col])
+            else:
+                changed_plants.append([row, col, plant.get_name(),
+                                       plant.get_stage()])
+        if tiles:
+            delta['tiles'] = tiles
+        if changed_plants:
+            delta['plants'] = changed_plants
+        if removed:
+            delta['removed'] = removed
+        # The acting player is always sent, so that its client sees a reply
+        delta['players'] = {str(i): encode_player(changed)
+                            for i, changed in self._players.items()
+                            if i == player_id or id(changed) in changed_players}
+        if new_day:
+            delta['day'] = self._model.get_days_elapsed()
+            delta['prices'] = encode_prices(self._model)
+        return delta
+
+    def _player_delta(self, player_id: int, left: bool = False) -> dict:
+        """ Returns the delta announcing that a player joined or left.
+
+        Parameters:
+            player_id: The id of the player.
+            left: True if the player left, otherwise it joined.
+        """
+        self._version += 1
+        delta = {'type': 'delta', 'version': self._version, 'by': player_id}
+        if left:
+            delta['left'] = player_id
+        else:
+            player = self._players[player_id]
+            delta['players'] = {str(player_id): encode_player(player)}
+        return delta
+
+    async def broadcast(self, message: dict) -> None:
+        """ Sends a message to every connected client.
+
+        Parameters:
+            message: The message to send.
+        """
+        message['t'] = time.perf_counter()
+        data = (json.dumps(message, separators=(',', ':')) + '\n').encode()
+        writers = [writer for writer in self._writers.values()
+                   if not writer.is_closing()]
+        for writer in writers:
+            writer.write(data)
+        await asyncio.gather(*(writer.drain() for writer in writers),
+                             return_exceptions=True)
+
+    async def _refuse(
+            self,
+            writer: asyncio.StreamWriter,
+            message: object,
+            error: Exception
+        ) -> None:
+        """ Tells a client that one of its messages could not be applied.
+
+        Parameters:
+            writer: The connection of the client that sent the message.
+            message: The decoded message, or None if it was not valid JSON.
+            error: Why the message could not be applied.
+        """
+        reply = {'type': 'error',
+                 'error': (str(error) if isinstance(error, ValueError)
+                           else 'the action could not be applied')}
+        if isinstance(message, dict) and 'seq' in message:
+            reply['seq'] = message['seq']
+        writer.write((json.dumps(reply) + '\n').encode())
+        await writer.drain()
+
+    async def _handle_client(
+            self,
+            reader: asyncio.StreamReader,
+            writer: asyncio.StreamWriter
+        ) -> None:
+        """ Serves one client connection until it disconnects. """
+        self._handlers.add(asyncio.current_task())
+        player_id = self._join()
+        self._writers[player_id] = writer
+        welcome = {'type': 'welcome', 'player': player_id,
+                   'state': encode_state(self._model)}
+        writer.write((json.dumps(welcome) + '\n').encode())
+        try:
+            await writer.drain()
+            await self.broadcast(self._player_delta(player_id))
+            while True:
+                try:
+                    line = await reader.readline()
+                except ValueError:
+                    # The line is over the reader's limit, and where the next
+                    # message starts is lost with it, so the client is dropped
+                    await self._refuse(writer, None,
+                                       ActionError('the message is too long'))
+                    break
+                if not line:
+                    break
+                message = None
+                try:
+                    message = json.loads(line)
+                    delta = self.apply(player_id, message)
+                except Exception as error:
+                    # A bad message is refused, and only its sender is told
+                    await self._refuse(writer, message, error)
+                    continue
+                await self.broadcast(delta)
+        except ConnectionError:
+            pass
+        finally:
+            self._writers.pop(player_id, None)
+            writer.close()
+            await self.broadcast(self._player_delta(player_id, left=True))
+            self._free_players.append(self._players.pop(player_id))
+            self._handlers.discard(asyncio.current_task())
+
+
+class RemotePlant:
+    """ The client side copy of a plant on the server's farm. It supports the
+        parts of the Plant interface that the views use.
+    """
+
+    def __init__(self, name: str, stage: int) -> None:
+        """ Constructor for a remote plant. """
+        self._name = name
+        self._stage = stage
+
+    def get_name(self) -> str:
+        """ Returns the name of the plant. """
+        return self._name
+
+    def get_stage(self) -> int:
+        """ Returns the current stage of the plant. """
+        return self._stage
+
+    def days_until_harvest(self) -> Optional[int]:
+        """ Returns 0 if the plant is ready to be harvested, otherwise None,
+            as deltas do not include a plant's age.
+        """
+        return 0 if self._stage == CROPS[self._name].final_stage else None
+
+
+class FarmClient:
+    """ Connects to a FarmServer, sends actions and keeps a local mirror of
+        the farm up to date by applying the deltas the server broadcasts.
+    """
+
+    def __init__(self) -> None:
+        """ Constructor for the client. The client is not connected until
+            connect() is awaited.
+        """
+        self._reader = None
+        self._writer = None
+        self._seq = 0
+        self.player_id = None
+        self.map = []
+        self.day = 0
+        self.prices = [list(BUY_PRICE_VECTOR), list(SELL_PRICE_VECTOR)]
+        self.plants = {}
+        self.players = {}
+        self.version = 0
+        self.latencies = []
+
+    async def connect(self, host: str, port: int) -> None:
+        """ Connects to the server and waits for the initial full state.
+
+        Parameters:
+            host: The address of the server.
+            port: The port of the server.
+        """
+        self._reader, self._writer = await asyncio.open_connection(host, port)
+        welcome = json.loads(await self._reader.readline())
+        state = welcome['state']
+        self.player_id = welcome['player']
+        self.map = state['map']
+        self.day = state['day']
+        self.prices = state['prices']
+        self.plants = {(row, col): RemotePlant(name, stage)
+                       for row, col, name, stage in state['plants']}
+        self.players = {int(i): p for i, p in state['players'].items()}
+
+    async def close(self) -> None:
+        """ Disconnects from the server. """
+        if self._writer is not None:
+            self._writer.close()
+            await self._writer.wait_closed()
+
+    async def send(self, action: str, **kwargs) -> int:
+        """ Sends an action to the server and returns its sequence number.
+
+        Parameters:
+            action: The name of the action, e.g. 'move' or 'till'.
+            kwargs: Any extra fields of the action, e.g. direction='w'.
+        """
+        self._seq += 1
+        message = {'action': action, 'seq': self._seq, **kwargs}
+        self._writer.write((json.dumps(message) + '\n').encode())
+        await self._writer.drain()
+        return self._seq
+
+    async def read_delta(self) -> Optional[dict]:
+        """ Waits for the next delta, or error reply, from the server and
+            returns it without applying it. Returns None if the server
+            disconnected.
+        """
+        line = await self._reader.readline()
+        if not line:
+            return None
+        delta = json.loads(line)
+        if delta['type'] == 'delta':
+            self.latencies.append(time.perf_counter() - delta['t'])
+        return delta
+
+    async def receive(self) -> Optional[dict]:
+        """ Waits for the next delta from the server, applies it to the local
+            mirror and returns it. Returns None if the server disconnected.
+        """
+        delta = await self.read_delta()
+        if delta is not None and delta['type'] == 'delta':
+            self.apply_delta(delta)
+        return delta
+
+    async def act(self, action: str, **kwargs) -> dict:
+        """ Sends an action and waits until the server has broadcast its
+            effects, applying any other deltas that arrive in between.
+
+        Parameters:
+            action: The name of the action, e.g. 'move' or 'till'.
+            kwargs: Any extra fields of the action, e.g. direction='w'.
+
+        Returns:
+            The delta produced by this action.
+
+        Raises:
+            ActionError: If the server refused the action.
+        """
+        seq = await self.send(action, **kwargs)
+        while True:
+            delta = await self.receive()
+            if delta is None:
+                raise ConnectionError('server closed the connection')
+            if delta['type'] == 'error':
+                if delta.get('seq') == seq:
+                    raise ActionError(delta['error'])
+            elif delta['by'] == self.player_id and delta.get('seq') == seq:
+                return delta
+
+    def apply_delta(self, delta: dict) -> None:
+        """ Applies a delta broadcast by the server to the local mirror.
+
+        Parameters:
+            delta: The delta message.
+        """
+        for row, col, tile in delta.get('tiles', []):
+            self.map[row] = self.map[row][:col] + tile + self.map[row][col + 1:]
+        for row, col, name, stage in delta.get('plants', []):
+            self.plants[(row, col)] = RemotePlant(name, stage)
+        for row, col in delta.get('removed', []):
+            self.plants.pop((row, col), None)
+        for i, player in delta.get('players', {}).items():
+            self.players[int(i)] = player
+        if 'left' in delta:
+            self.players.pop(delta['left'], None)
+        self.day = delta.get('day', self.day)
+        self.prices = delta.get('prices', self.prices)
+        self.version = delta['version']
+
+    def get_own_state(self) -> dict:
+        """ Returns the mirrored state of the player this client controls. """
+        return self.players[self.player_id]
+
+
+async def run_bot(client: FarmClient, actions: int, seed: int = 0) -> None:
+    """ Plays the given number of random actions through a client, waiting
+        for each action's delta before sending the next one.
+
+    Parameters:
+        client: A connected client.
+        actions: The number of actions to perform.
+        seed: The seed for the bot's random choices.
+    """
+    rng = random.Random(seed)
+    choices = ['move'] * 6 + ['till', 'untill', 'plant', 'harvest', 'select']
+    for _ in range(actions):
+        action = rng.choice(choices)
+        if action == 'move':
+            await client.act('move', direction=rng.choice(list(MOVE_DELTAS)))
+        elif action == 'select':
+            await client.act('select', item=rng.choice(SEEDS))
+        else:
+            await client.act(action)
+
+
+async def load_test(
+        map_file: str,
+        client_counts: tuple[int, ...] = (1, 2, 4, 8, 16),
+        actions_per_client: int = 200
+    ) -> list[dict]:
+    """ Runs a server and increasing numbers of bot clients in this process,
+        and measures action throughput and broadcast latency for each count.
+
+    Parameters:
+        map_file: The map to host.
+        client_counts: The numbers of clients to test with.
+        actions_per_client: The number of actions each bot performs.
+
+    Returns:
+        One result per client count, with the total actions per second and
+        the median and 95th percentile broadcast latency in milliseconds.
+    """
+    results = []
+    for count in client_counts:
+        server = FarmServer(map_file)
+        host, port = await server.start()
+        clients = [FarmClient() for _ in range(count)]
+        for client in clients:
+            await client.connect(host, port)
+
+        start = time.perf_counter()
+        await asyncio.gather(*(run_bot(client, actions_per_client, seed=i)
+                               for i, client in enumerate(clients)))
+        elapsed = time.perf_counter() - start
+
+        latencies = sorted(latency for client in clients
+                           for latency in client.latencies)
+        results.append({
+            'clients': count,
+            'actions_per_second': count * actions_per_client / elapsed,
+            'latency_p50_ms': latencies[len(latencies) // 2] * 1000,
+            'latency_p95_ms': latencies[int(len(latencies) * 0.95)] * 1000,
+        })
+        for client in clients:
+            await client.close()
+        await server.stop()
+    return results
+
+
+def main() -> None:
+    """ Runs the server until interrupted, or runs the load test. """
+    parser = argparse.ArgumentParser(description='Local farm game server')
+    parser.add_argument('--map', default='maps/map1.txt')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--load-test', action='store_true')
+    args = parser.parse_args()
+
+    if args.load_test:
+        for result in asyncio.run(load_test(args.map)):
+            print('{clients:3d} clients: {actions_per_second:9.0f} actions/s, '
+                  'broadcast p50 {latency_p50_ms:.2f}ms, '
+                  'p95 {latency_p95_ms:.2f}ms'.format(**result))
+        return
+
+    async def serve() -> None:
+        server = FarmServer(args.map, port=args.port)
+        host, port = await server.start()
+        print(f'Serving {args.map} on {host}:{port}')
+        await asyncio.Event().wait()
+
+    asyncio.run(serve())
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,422 @@
+""" A headless host for many independent farms, one per user session.
+
+    Every session owns a FarmModel, but the immutable data is shared between
+    them: each map file is read once and its row strings are shared by every
+    farm built from it (a farm only pays for the rows it changes), and the
+    compiled crop tables and price tables are module level constants. Sessions that
+    have been idle for too long, or that exceed the active session limit, are
+    evicted to the compact save format and restored on their next action.
+
+    Sessions are reached through a small HTTP interface:
+        POST /sessions/<id>            {"map": "map1"} creates one
+        POST /sessions/<id>/actions    {"action": "move", "direction": "s"}
+        GET  /sessions/<id>            the session's stats and memory use
+        GET  /stats                    the memory report for every session
+"""
+import argparse
+import http.client
+import json
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Optional
+from farmcore.sizeof import deep_sizeof
+from model import *
+from save import dump_model, load_model
+from server import ActionError, apply_action
+
+# Nothing reads a session's journal between actions, so each session keeps
+# only the last few change records
+SESSION_JOURNAL_CAPACITY = 16
+
+# Clients choose a map by name, never by path
+MAPS_DIR = 'maps'
+MAP_NAME = re.compile(r'[A-Za-z0-9_-]+')
+
+
+def resolve_map_name(name: object) -> str:
+    """ Returns the path of the map file with the given name in MAPS_DIR.
+
+    Parameters:
+        name: A map name sent by a client, e.g. 'map1'.
+
+    Raises:
+        ValueError: If the name is not a plain map name.
+        FileNotFoundError: If there is no map with the name.
+    """
+    if not isinstance(name, str) or not MAP_NAME.fullmatch(name):
+        raise ValueError('map must be the name of a map, e.g. "map1"')
+    map_file = f'{MAPS_DIR}/{name}.txt'
+    if not os.path.isfile(map_file):
+        raise FileNotFoundError(f'no map named {name!r}')
+    return map_file
+
+
+class Session:
+    """ One user's farm, either active as a FarmModel or evicted as a saved
+        farm.
+    """
+
+    def __init__(self, model: FarmModel) -> None:
+        """ Constructor for an active session. """
+        self.model = model
+        self.saved = None
+        self.last_used = time.monotonic()
+
+    def is_active(self) -> bool:
+        """ Returns True iff the session's farm is loaded. """
+        return self.model is not None
+
+
+class SessionManager:
+    """ Keeps many concurrent farm sessions within an active session budget.
+    """
+
+    def __init__(self, max_active: int = 1000, idle_timeout: float = 300.0):
+        """ Constructor for the manager.
+
+        Parameters:
+            max_active: The most sessions that are kept loaded at once.
+            idle_timeout: Seconds after its last action that a session is
+                evicted by evict_idle().
+        """
+        self._max_active = max_active
+        self._idle_timeout = idle_timeout
+        self._maps = {}
+        self._shared_ids = {id(crop) for crop in CROPS.values()}
+        self._sessions = {}
+        self._active = OrderedDict()
+        self._lock = threading.RLock()
+        self.evictions = 0
+        self.restores = 0
+
+    def get_map(self, map_file: str) -> tuple[str, ...]:
+        """ Returns the shared rows of a map file, reading it on first use.
+
+        Parameters:
+            map_file: The path to the map file.
+        """
+        if map_file not in self._maps:
+            rows = tuple(read_map(map_file))
+            self._maps[map_file] = rows
+            self._shared_ids.update(id(row) for row in rows)
+            self._shared_ids.add(id(map_file))
+        return self._maps[map_file]
+
+    def create(self, session_id: str, map_file: str) -> FarmModel:
+        """ Starts a new session on the given map, replacing any existing
+            session with the same id.
+
+        Parameters:
+            session_id: The id of the session.
+            map_file: The path to the map file to farm on.
+
+        Returns:
+            The new session's farm.
+        """
+        with self._lock:
+            model = FarmModel(map_file, self.get_map(map_file),
+                              SESSION_JOURNAL_CAPACITY)
+            self._sessions[session_id] = Session(model)
+            self._mark_active(session_id)
+            return model
+
+    def get(self, session_id: str) -> FarmModel:
+        """ Returns a session's farm, restoring it if it was evicted.
+
+        Parameters:
+            session_id: The id of the session.
+
+        Raises:
+            KeyError: If there is no session with this id.
+        """
+        with self._lock:
+            session = self._sessions[session_id]
+            if not session.is_active():
+                session.model = load_model(session.saved, self.get_map,
+                                           SESSION_JOURNAL_CAPACITY)
+                session.saved = None
+                self.restores += 1
+            session.last_used = time.monotonic()
+            self._mark_active(session_id)
+            return session.model
+
+    def act(self, session_id: str, message: dict) -> dict:
+        """ Performs an action in a session.
+
+        Parameters:
+            session_id: The id of the session.
+            message: The action, in the format used by the multiplayer server.
+
+        Returns:
+            The acting player's stats after the action.
+
+        Raises:
+            KeyError: If there is no session with this id.
+            ActionError: If the action is malformed.
+        """
+        with self._lock:
+            model = self.get(session_id)
+            apply_action(model, model.get_player(), message)
+            return self.stats(session_id)
+
+    def stats(self, session_id: str, memory: bool = False) -> dict:
+        """ Returns the day and the player's stats in a session.
+
+        Parameters:
+            session_id: The id of the session.
+            memory: Also return the session's memory use, as 'bytes'.
+
+        Raises:
+            KeyError: If there is no session with this id.
+        """
+        with self._lock:
+            model = self.get(session_id)
+            player = model.get_player()
+            stats = {
+                'day': model.get_days_elapsed(),
+                'position': list(player.get_position()),
+                'energy': player.get_energy(),
+                'money': player.get_money(),
+                'inventory': player.get_inventory(),
+            }
+            if memory:
+                stats['bytes'] = self.session_memory(session_id)
+            return stats
+
+    def _mark_active(self, session_id: str) -> None:
+        """ Moves a session to the most recently used end of the active list
+            and evicts the least recently used sessions over the budget.
+        """
+        self._active[session_id] = None
+        self._active.move_to_end(session_id)
+        while len(self._active) > self._max_active:
+            self._evict(next(iter(self._active)))
+
+    def _evict(self, session_id: str) -> None:
+        """ Saves a session's farm in the compact format and drops the model.
+        """
+        session = self._sessions[session_id]
+        model = session.model
+        session.saved = dump_model(model, self.get_map(model.get_map_file()))
+        session.model = None
+        self._active.pop(session_id, None)
+        self.evictions += 1
+
+    def evict_idle(self, now: Optional[float] = None) -> int:
+        """ Evicts every session that has been idle for longer than the idle
+            timeout, and returns how many were evicted.
+
+        Parameters:
+            now: The current monotonic time, defaulting to time.monotonic().
+        """
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            idle = [session_id for session_id in self._active
+                    if now - self._sessions[session_id].last_used
+                    > self._idle_timeout]
+            for session_id in idle:
+                self._evict(session_id)
+            return len(idle)
+
+    def session_memory(self, session_id: str) -> int:
+        """ Returns the bytes used by a session, not counting shared data. For
+            evicted sessions this is the size of the saved farm.
+
+        Parameters:
+            session_id: The id of the session.
+        """
+        with self._lock:
+            session = self._sessions[session_id]
+            if session.is_active():
+                return deep_sizeof(session.model, self._shared_ids)
+            return len(session.saved)
+
+    def report(self) -> dict:
+        """ Returns a summary of the sessions and their memory use. """
+        with self._lock:
+            active = [self.session_memory(i) for i in self._active]
+            evicted = [self.session_memory(i) for i, session
+                       in self._sessions.items() if not session.is_active()]
+        return {
+            'sessions': len(self._sessions),
+            'active': len(active),
+            'evicted': len(evicted),
+            'active_bytes': sum(active),
+            'evicted_bytes': sum(evicted),
+            'mean_active_bytes': sum(active) / len(active) if active else 0,
+            'mean_evicted_bytes': sum(evicted) / len(evicted) if evicted else 0,
+            'shared_map_bytes': sum(deep_sizeof(rows, set())
+                                    for rows in self._maps.values()),
+            'evictions': self.evictions,
+            'restores': self.restores,
+        }
+
+
+class SessionRequestHandler(BaseHTTPRequestHandler):
+    """ Serves the HTTP interface of the SessionManager set on the server. """
+
+    protocol_version = 'HTTP/1.1'
+    disable_nagle_algorithm = True
+
+    def _reply(self, status: int, body: dict) -> None:
+        """ Sends a JSON response. """
+        data = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _read_body(self) -> dict:
+        """ Reads the JSON body of the request.
+
+        Raises:
+            ValueError: If the body is not a JSON object.
+        """
+        length = int(self.headers.get('Content-Length', 0))
+        body = json.loads(self.rfile.read(length)) if length else {}
+        if not isinstance(body, dict):
+            raise ValueError('the body must be a JSON object')
+        return body
+
+    def do_GET(self) -> None:
+        """ Handles the stats and session queries. """
+        manager = self.server.manager
+        parts = self.path.strip('/').split('/')
+        if parts == ['stats']:
+            self._reply(200, manager.report())
+        elif len(parts) == 2 and parts[0] == 'sessions':
+            try:
+                stats = manager.stats(parts[1], memory=True)
+            except KeyError:
+                return self._reply(404, {'error': 'no such session'})
+            self._reply(200, stats)
+        else:
+            self._reply(404, {'error': 'not found'})
+
+    def do_POST(self) -> None:
+        """ Handles session creation and actions. """
+        manager = self.server.manager
+        parts = self.path.strip('/').split('/')
+        try:
+            body = self._read_body()
+        except ValueError:
+            return self._reply(400, {'error': 'the body must be a JSON object'})
+        if len(parts) == 2 and parts[0] == 'sessions':
+            try:
+                map_file = resolve_map_name(body.get('map', 'map1'))
+            except FileNotFoundError as error:
+                return self._reply(404, {'error': str(error)})
+            except ValueError as error:
+                return self._reply(400, {'error': str(error)})
+            manager.create(parts[1], map_file)
+            self._reply(201, {'session': parts[1]})
+        elif len(parts) == 3 and parts[::2] == ['sessions', 'actions']:
+            # Sessions are never removed, so only this lookup can miss
+            try:
+                manager.get(parts[1])
+            except KeyError:
+                return self._reply(404, {'error': 'no such session'})
+            try:
+                self._reply(200, manager.act(parts[1], body))
+            except ActionError as error:
+                self._reply(400, {'error': str(error)})
+        else:
+            self._reply(404, {'error': 'not found'})
+
+    def log_message(self, format: str, *args) -> None:
+        """ Keeps request logging off the console. """
+
+
+def serve(
+        manager: SessionManager,
+        host: str = '127.0.0.1',
+        port: int = 0
+    ) -> ThreadingHTTPServer:
+    """ Starts the HTTP interface for a manager on a background thread.
+
+    Parameters:
+        manager: The sessions to serve.
+        host: The address to listen on.
+        port: The port to listen on, or 0 to pick any free port.
+
+    Returns:
+        The running server. Its server_address is the address it listens on.
+    """
+    httpd = ThreadingHTTPServer((host, port), SessionRequestHandler)
+    httpd.manager = manager
+    threading.Thread(target=httpd.serve_forever, daemon=True).start()
+    return httpd
+
+
+def benchmark(
+        sessions: int = 2000,
+        max_active: int = 500,
+        actions: int = 2000,
+        map_file: str = 'maps/map1.txt'
+    ) -> dict:
+    """ Creates many sessions, plays random actions in them through the HTTP
+        interface, and reports the round-trip latency and memory use.
+
+    Parameters:
+        sessions: The number of sessions to create.
+        max_active: The active session budget of the manager.
+        actions: The number of actions to send.
+        map_file: The map every session farms on.
+
+    Returns:
+        The manager's memory report, with the action round-trip latency
+        percentiles in milliseconds added.
+    """
+    manager = SessionManager(max_active=max_active)
+    for i in range(sessions):
+        manager.create(str(i), map_file)
+    httpd = serve(manager)
+    connection = http.client.HTTPConnection(*httpd.server_address)
+    moves = list(MOVE_DELTAS)
+    latencies = []
+    for i in range(actions):
+        body = json.dumps({'action': 'move', 'direction': moves[i % 4]}).encode()
+        start = time.perf_counter()
+        connection.request('POST', f'/sessions/{(i * 7919) % sessions}/actions',
+                           body, {'Content-Type': 'application/json'})
+        connection.getresponse().read()
+        latencies.append(time.perf_counter() - start)
+    connection.close()
+    httpd.shutdown()
+
+    latencies.sort()
+    result = manager.report()
+    result['latency_p50_ms'] = latencies[len(latencies) // 2] * 1000
+    result['latency_p95_ms'] = latencies[int(len(latencies) * 0.95)] * 1000
+    return result
+
+
+def main() -> None:
+    """ Runs the session server until interrupted, or runs the benchmark. """
+    parser = argparse.ArgumentParser(description='Headless farm sessions')
+    parser.add_argument('--port', type=int, default=8766)
+    parser.add_argument('--max-active', type=int, default=1000)
+    parser.add_argument('--idle-timeout', type=float, default=300.0)
+    parser.add_argument('--benchmark', action='store_true')
+    parser.add_argument('--sessions', type=int, default=2000)
+    args = parser.parse_args()
+
+    if args.benchmark:
+        print(json.dumps(benchmark(args.sessions, args.max_active), indent=2))
+        return
+
+    manager = SessionManager(args.max_active, args.idle_timeout)
+    httpd = serve(manager, port=args.port)
+    print('Serving sessions on {0}:{1}'.format(*httpd.server_address))
+    while True:
+        time.sleep(min(args.idle_timeout, 60))
+        manager.evict_idle()
+
+
+if __name__ == '__main__':
+    main()
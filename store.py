@@ -0,0 +1,379 @@
+""" Optional SQLite persistence for long-running farms.
+
+    A CampaignStore follows a farm through its journal and writes everything
+    that happened during a day in a single transaction when the day ends:
+        tiles    the current tile of every cell
+        plants   every plant ever planted, with the day it was planted, the
+                 day it was removed (if it has been) and its latest stage
+        players  each player's state at the end of the latest day
+        events   what happened on each day: tiles tilled, untilled and
+                 grassed, plants planted and removed, and produce harvested
+    Indexes cover the common history queries, such as the plants of a crop
+    planted before a given day, or harvest totals per week.
+
+    The database is in WAL mode, so another process can open it read only and
+    analyse a farm while the game is still writing to it, e.g.
+        python store.py farm.db --crop berry --before 50
+        python store.py farm.db --weekly
+    and
+        python store.py --benchmark bench.db
+    times inserting and querying a history of a million events.
+"""
+import argparse
+import json
+import os
+import random
+import sqlite3
+import time
+from typing import Optional
+from model import *
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS tiles (
+    row INTEGER NOT NULL,
+    col INTEGER NOT NULL,
+    tile TEXT NOT NULL,
+    PRIMARY KEY (row, col)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS plants (
+    id INTEGER PRIMARY KEY,
+    row INTEGER NOT NULL,
+    col INTEGER NOT NULL,
+    crop TEXT NOT NULL,
+    planted_day INTEGER NOT NULL,
+    removed_day INTEGER,
+    stage INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS players (
+    id INTEGER PRIMARY KEY,
+    day INTEGER NOT NULL,
+    energy INTEGER NOT NULL,
+    money INTEGER NOT NULL,
+    row INTEGER NOT NULL,
+    col INTEGER NOT NULL,
+    direction TEXT NOT NULL,
+    selected TEXT,
+    inventory TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS events (
+    day INTEGER NOT NULL,
+    kind TEXT NOT NULL,
+    row INTEGER,
+    col INTEGER,
+    item TEXT,
+    amount INTEGER
+);
+CREATE INDEX IF NOT EXISTS plants_by_crop ON plants (crop, planted_day);
+CREATE INDEX IF NOT EXISTS plants_alive ON plants (row, col)
+    WHERE removed_day IS NULL;
+CREATE INDEX IF NOT EXISTS events_by_kind ON events (kind, day, item, amount);
+CREATE INDEX IF NOT EXISTS events_by_day ON events (day);
+'''
+
+# The journal kinds that are stored as events. TILE_CHANGED is stored as
+# the event of the new tile.
+EVENT_KINDS = {TILE_CHANGED, PLANT_ADDED, PLANT_REMOVED, HARVESTED}
+TILE_EVENTS = {SOIL: 'tilled', UNTILLED: 'untilled', GRASS: 'grassed'}
+
+
+class CampaignStore:
+    """ A SQLite database holding the state and history of one farm. """
+
+    def __init__(self, path: str, read_only: bool = False) -> None:
+        """ Opens the database, creating it and its tables if necessary.
+
+        Parameters:
+            path: The path of the database file.
+            read_only: If True, open an existing database for analysis only.
+        """
+        if read_only:
+            self._db = sqlite3.connect(f'file:{path}?mode=ro', uri=True)
+        else:
+            self._db = sqlite3.connect(path)
+            self._db.execute('PRAGMA journal_mode=WAL')
+            # WAL is already safe against corruption with NORMAL syncing
+            self._db.execute('PRAGMA synchronous=NORMAL')
+            self._db.executescript(SCHEMA)
+        self._model = None
+        self._changes = []
+        # Buffered changes of actions that were undone, kept until they are
+        # redone or can no longer be, and the version of the latest RESTORED
+        self._undone = []
+        self._restored_at = 0
+        self._day = None
+        # The id of the live plant in each cell
+        self._plant_ids = {}
+        self._next_plant_id = 1
+
+    def close(self) -> None:
+        """ Writes any buffered changes and closes the database. """
+        if self._model is not None:
+            self.flush()
+            self._model.get_journal().unsubscribe(self._buffer)
+            self._model = None
+        self._db.close()
+
+    def attach(self, model: FarmModel) -> None:
+        """ Starts following a farm: stores its current state, then buffers
+            every change and writes them when each day ends. Plants already
+            stored as alive are matched to the farm's plants by cell and crop,
+            so a farm can be reattached to the database it was stored in.
+
+        Parameters:
+            model: The farm to follow.
+        """
+        self._model = model
+        self._day = model.get_days_elapsed()
+        rows = [(row, col, tile) for row, line in enumerate(model.get_map())
+                for col, tile in enumerate(line)]
+        plants = model.get_plants()
+        self._next_plant_id = self._db.execute(
+            'SELECT COALESCE(MAX(id), 0) + 1 FROM plants').fetchone()[0]
+        self._plant_ids = {}
+        removed, stages = [], []
+        for plant_id, row, col, crop in self._db.execute(
+                'SELECT id, row, col, crop FROM plants '
+                'WHERE removed_day IS NULL'):
+            plant = plants.get((row, col))
+            if plant is not None and plant.get_name() == crop:
+                self._plant_ids[(row, col)] = plant_id
+                stages.append((plant.get_stage(), plant_id))
+            else:
+                removed.append((self._day, plant_id))
+        new_plants = [self._new_plant(position, plant.get_state())
+                      for position, plant in plants.items()
+                      if position not in self._plant_ids]
+        self.write_batch(rows, new_plants, removed, stages, [])
+        model.get_journal().subscribe(self._buffer)
+
+    def _buffer(self, change: Change) -> None:
+        """ Journal subscriber: keeps a change until the day ends. A new day
+            records DAY_CHANGED after its other changes, such as the energy
+            reset, so the day is written once it has fully started.
+        """
+        if change[1] == RESTORED:
+            self._restore(change)
+            return
+        self._changes.append(change)
+        if change[1] == DAY_CHANGED:
+            self.flush()
+
+    def _restore(self, change: Change) -> None:
+        """ Handles an undo or redo: drops the changes the undo or redo made
+            itself, and sets the buffered changes of the actions it undid
+            aside, or takes back those of the actions it redid, so that only
+            the day's remaining actions are written.
+        """
+        restored_at, _, _, (version, start) = change
+        changes = [old for old in self._changes if old[0] <= start]
+        # An action since the last undo or redo means nothing can be redone
+        if any(old[0] > self._restored_at for old in changes):
+            self._undone = []
+        changes = sorted(changes + self._undone)
+        self._changes = [old for old in changes if old[0] <= version]
+        self._undone = [old for old in changes if old[0] > version]
+        self._restored_at = restored_at
+
+    def _new_plant(self, position: tuple[int, int], state: tuple) -> tuple:
+        """ Assigns an id to a new plant and returns its row for the plants
+            table.
+        """
+        plant_id = self._next_plant_id
+        self._next_plant_id += 1
+        self._plant_ids[position] = plant_id
+        name, stage, _, _ = state
+        return (plant_id, *position, name, self._day, stage)
+
+    def flush(self) -> None:
+        """ Writes every buffered change in a single transaction. """
+        changes, self._changes = self._changes, []
+        self._undone = []
+        tiles, new_plants, removed, stages, events = {}, [], [], {}, []
+        for _, kind, subject, value in changes:
+            if kind == DAY_CHANGED:
+                self._day = value
+            elif kind == TILE_CHANGED:
+                tiles[subject] = value
+                events.append((self._day, TILE_EVENTS[value], *subject, None,
+                               None))
+            elif kind == PLANT_ADDED:
+                if subject in self._plant_ids:
+                    removed.append((self._day, self._plant_ids[subject]))
+                new_plants.append(self._new_plant(subject, value))
+                events.append((self._day, 'planted', *subject, value[0], 1))
+            elif kind == PLANT_REMOVED:
+                plant_id = self._plant_ids.pop(subject, None)
+                if plant_id is not None:
+                    removed.append((self._day, plant_id))
+                    stages.pop(plant_id, None)
+                events.append((self._day, 'removed', *subject, None, None))
+            elif kind == PLANT_STAGED:
+                if subject in self._plant_ids:
+                    stages[self._plant_ids[subject]] = value[1]
+            elif kind == HARVESTED:
+                events.append((self._day, 'harvested', *subject, *value))
+        self.write_batch(
+            [(row, col, tile) for (row, col), tile in tiles.items()],
+            new_plants, removed,
+            [(stage, plant_id) for plant_id, stage in stages.items()],
+            events)
+
+    def write_batch(
+            self,
+            tiles: list[tuple],
+            new_plants: list[tuple],
+            removed: list[tuple],
+            stages: list[tuple],
+            events: list[tuple]
+        ) -> None:
+        """ Writes a day's worth of rows in a single transaction, along with
+            the current state of the players.
+
+        Parameters:
+            tiles: (row, col, tile) of each changed tile.
+            new_plants: (id, row, col, crop, planted day, stage) of each new
+                plant.
+            removed: (removed day, id) of each removed plant.
+            stages: (stage, id) of each plant whose stage changed.
+            events: (day, kind, row, col, item, amount) of each event.
+        """
+        with self._db:
+            self._db.executemany('INSERT OR REPLACE INTO tiles VALUES (?, ?, ?)',
+                                 tiles)
+            self._db.executemany(
+                'INSERT INTO plants VALUES (?, ?, ?, ?, ?, NULL, ?)',
+                new_plants)
+            self._db.executemany(
+                'UPDATE plants SET removed_day = ? WHERE id = ?', removed)
+            self._db.executemany('UPDATE plants SET stage = ? WHERE id = ?',
+                                 stages)
+            self._db.executemany(
+                'INSERT INTO events VALUES (?, ?, ?, ?, ?, ?)', events)
+            self._write_players()
+
+    def _write_players(self) -> None:
+        """ Writes the current state of every player of the attached farm. """
+        if self._model is None:
+            return
+        self._db.executemany(
+            'INSERT OR REPLACE INTO players VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)',
+            [(i, self._day, player.get_energy(), player.get_money(),
+              *player.get_position(), player.get_direction(),
+              player.get_selected_item(), json.dumps(player.get_inventory()))
+             for i, player in enumerate(self._model.get_players())])
+
+    def plants_planted_before(
+            self,
+            crop: str,
+            day: int
+        ) -> list[tuple[int, int, int, Optional[int], int]]:
+        """ Returns (row, col, planted day, removed day, stage) of every plant
+            of the given crop planted before the given day.
+        """
+        return self._db.execute(
+            'SELECT row, col, planted_day, removed_day, stage FROM plants '
+            'WHERE crop = ? AND planted_day < ? ORDER BY planted_day',
+            (crop, day)).fetchall()
+
+    def harvest_totals_per_week(self) -> list[tuple[int, str, int]]:
+        """ Returns (week, produce, amount harvested) for every week with a
+            harvest, where week 0 is days 1 to 7.
+        """
+        return self._db.execute(
+            'SELECT (day - 1) / 7 AS week, item, SUM(amount) FROM events '
+            "WHERE kind = 'harvested' GROUP BY week, item "
+            'ORDER BY week, item').fetchall()
+
+    def events_between(
+            self,
+            first_day: int,
+            last_day: int,
+            kind: Optional[str] = None
+        ) -> list[tuple]:
+        """ Returns (day, kind, row, col, item, amount) of the events in a
+            range of days, optionally of one kind only.
+        """
+        if kind is None:
+            return self._db.execute(
+                'SELECT * FROM events WHERE day BETWEEN ? AND ? ORDER BY day',
+                (first_day, last_day)).fetchall()
+        return self._db.execute(
+            'SELECT * FROM events WHERE kind = ? AND day BETWEEN ? AND ? '
+            'ORDER BY day', (kind, first_day, last_day)).fetchall()
+
+
+def benchmark(path: str, events: int = 1_000_000, per_day: int = 1000) -> None:
+    """ Writes a synthetic history of the given number of events, one
+        transaction per day, then times the indexed queries.
+
+    Parameters:
+        path: A database file to create. Any existing file is replaced.
+        events: The number of events to write.
+        per_day: The number of events written per day.
+    """
+    for suffix in ('', '-wal', '-shm'):
+        if os.path.exists(path + suffix):
+            os.remove(path + suffix)
+    rng = random.Random(0)
+    crops = list(CROPS.values())
+    store = CampaignStore(path)
+    plant_id = 1
+    start = time.perf_counter()
+    for day in range(1, events // per_day + 1):
+        day_events, new_plants = [], []
+        for _ in range(per_day // 2):
+            crop = rng.choice(crops)
+            row, col = rng.randrange(100), rng.randrange(100)
+            new_plants.append((plant_id, row, col, crop.name, day, 1))
+            plant_id += 1
+            day_events.append((day, 'planted', row, col, crop.name, 1))
+            day_events.append((day, 'harvested', row, col, crop.produce,
+                               crop.yield_amount))
+        store.write_batch([], new_plants, [], [], day_events)
+    elapsed = time.perf_counter() - start
+    print(f'inserted {events} events and {plant_id - 1} plants in '
+          f'{elapsed:.2f}s ({events / elapsed:,.0f} events/s)')
+
+    reader = CampaignStore(path, read_only=True)
+    for name, query in [
+            ('berry plants before day 50',
+             lambda: reader.plants_planted_before('berry', 50)),
+            ('harvest totals per week', reader.harvest_totals_per_week),
+            ('events of days 500-510',
+             lambda: reader.events_between(500, 510))]:
+        start = time.perf_counter()
+        rows = query()
+        elapsed = time.perf_counter() - start
+        print(f'{name}: {len(rows)} rows in {elapsed * 1000:.1f}ms')
+    reader.close()
+    store.close()
+
+
+def main() -> None:
+    """ Queries a farm's database, or runs the benchmark. """
+    parser = argparse.ArgumentParser(description='Farm campaign database')
+    parser.add_argument('database')
+    parser.add_argument('--crop', help='list plants of this crop')
+    parser.add_argument('--before', type=int, default=2 ** 62,
+                        help='only plants planted before this day')
+    parser.add_argument('--weekly', action='store_true',
+                        help='list harvest totals per week')
+    parser.add_argument('--benchmark', action='store_true',
+                        help='write and query a million event history')
+    args = parser.parse_args()
+
+    if args.benchmark:
+        benchmark(args.database)
+        return
+    store = CampaignStore(args.database, read_only=True)
+    if args.crop:
+        for row in store.plants_planted_before(args.crop, args.before):
+            print(*row)
+    if args.weekly:
+        for row in store.harvest_totals_per_week():
+            print(*row)
+    store.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,470 @@
+""" A synthetic input stress test of the real FarmGame.
+
+    The game is run under a virtual X display (Xvfb) and fed streams of key
+    presses and button clicks at a high rate with event_generate, in three
+    scenarios played one after the other:
+        move    spam presses and releases of the movement keys
+        farm    cycles of till, plant, harvest, remove and untill, moving
+                along a row and ending the day with the next day button
+        trade   bursts of clicks on the Buy and Sell buttons of the ItemViews
+    For every event the game handles, the latency is measured from the entry
+    of its handler (handle_keypress, or the buy, sell, select or next day
+    callback) to the end of the game loop frame that draws its changes.
+    Events that change nothing are counted but have no latency. The Tk event
+    queue backlog is the number of events generated but not yet handled,
+    sampled as each event is handled.
+
+    Each map size is run in a fresh interpreter, on a square map of that
+    size. The run fails if the p95 latency of any size is over the budget,
+    or over its p95 in a baseline report by more than the tolerance.
+
+    Run this file from the top of the repository, e.g.
+        python stress.py --sizes 10 100 400 --report stress.json
+        python stress.py --baseline stress.json --tolerance 0.25
+    Xvfb must be installed, unless --no-xvfb is given to use the current
+    DISPLAY.
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+import tkinter as tk
+from typing import Optional
+
+# Default budget, in milliseconds of p95 latency per map size
+DEFAULT_BUDGET = 100.0
+
+# Map sizes run by default
+DEFAULT_SIZES = (10, 100, 400)
+
+SCENARIOS = ('move', 'farm', 'trade')
+
+# Keys pressed by each step of the farm scenario. Harvests that find nothing
+# ripe change nothing, which is counted like any other unchanged event
+FARM_CYCLE = ('t', 'p', 'h', 'r', 'u', 'd')
+
+# Farm steps between presses of the next day button
+FARM_DAY_STEPS = 60
+
+# Milliseconds between bursts of generated events
+BURST_INTERVAL = 10
+
+# Seconds to wait for the last frames of a scenario to be drawn
+SETTLE_TIME = 0.5
+
+
+def percentiles(values: list[float]) -> dict[str, float]:
+    """ Returns the count, p50, p95, p99 and maximum of some latencies, in
+        milliseconds. The percentiles are None if there are no latencies.
+    """
+    ordered = sorted(values)
+    summary = {'count': len(ordered)}
+    for name, fraction in (('p50', 0.5), ('p95', 0.95), ('p99', 0.99),
+                           ('max', 1.0)):
+        summary[name] = (ordered[min(len(ordered) - 1,
+                                     int(fraction * len(ordered)))] * 1000
+                         if ordered else None)
+    return summary
+
+
+def write_map(path: str, size: int) -> None:
+    """ Writes a square map of the given size: untilled soil inside a border
+        of grass, with a band of tilled soil along the middle.
+    """
+    rows = []
+    for row in range(size):
+        if row in (0, size - 1):
+            rows.append('G' * size)
+        elif row == size // 2:
+            rows.append('G' + 'S' * (size - 2) + 'G')
+        else:
+            rows.append('G' + 'U' * (size - 2) + 'G')
+    with open(path, 'w') as file:
+        file.write('\n'.join(rows) + '\n')
+
+
+class VirtualDisplay:
+    """ An Xvfb server on the first free display number, for the length of a
+        with block.
+    """
+
+    def __init__(self, size: tuple[int, int] = (1280, 1024)) -> None:
+        """ Constructor for a display that is not started yet.
+
+        Parameters:
+            size: The (width, height) of the screen in pixels.
+        """
+        self._size = size
+        self._process = None
+        self.name = None
+
+    def __enter__(self) -> 'VirtualDisplay':
+        """ Starts the server and waits until it accepts clients. """
+        # Xvfb picks a free display number and writes it to the pipe once it
+        # is ready
+        read_end, write_end = os.pipe()
+        width, height = self._size
+        try:
+            self._process = subprocess.Popen(
+                ['Xvfb', '-displayfd', str(write_end), '-nolisten', 'tcp',
+                 '-screen', '0', f'{width}x{height}x24'],
+                pass_fds=(write_end,), stdout=subprocess.DEVNULL,
+                stderr=subprocess.DEVNULL)
+        except FileNotFoundError:
+            os.close(read_end)
+            raise RuntimeError('Xvfb is not installed; run with --no-xvfb '
+                               'to use the current display') from None
+        finally:
+            os.close(write_end)
+        with os.fdopen(read_end) as pipe:
+            number = pipe.readline().strip()
+        if not number:
+            self._process.kill()
+            raise RuntimeError('Xvfb did not start')
+        self.name = f':{number}'
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        """ Stops the server. """
+        self._process.terminate()
+        self._process.wait()
+
+
+def run_size(size: int, seconds: float, rate: float,
+             display: Optional[str]) -> dict:
+    """ Runs every scenario on a map of the given size in a child process.
+
+    Parameters:
+        size: The number of rows and columns of the map.
+        seconds: How long to play each scenario for.
+        rate: Events generated per second.
+        display: The X display to use, or None for the current one.
+
+    Returns:
+        The child's results.
+    """
+    env = dict(os.environ)
+    if display is not None:
+        env['DISPLAY'] = display
+    result = subprocess.run(
+        [sys.executable, __file__, '--child', str(size),
+         '--seconds', str(seconds), '--rate', str(rate)],
+        env=env, capture_output=True, text=True)
+    if result.returncode != 0:
+        raise RuntimeError(f'size {size} failed:\n{result.stderr}')
+    return json.loads(result.stdout.splitlines()[-1])
+
+
+def check_results(
+        results: dict[str, dict],
+        budget: float = DEFAULT_BUDGET,
+        baseline: Optional[dict[str, dict]] = None,
+        tolerance: float = 0.25
+    ) -> list[str]:
+    """ Reports the map sizes whose p95 latency breaks the rules.
+
+    Parameters:
+        results: The results of each map size, keyed by size.
+        budget: The most milliseconds of p95 latency allowed.
+        baseline: Earlier results to compare against, if any.
+        tolerance: The fraction by which p95 latency may exceed the
+            baseline's.
+
+    Returns:
+        A description of every failure, empty if all sizes passed.
+    """
+    failures = []
+    for size, result in results.items():
+        p95 = result['latency']['p95']
+        if p95 is None:
+            failures.append(f'size {size}: no event was drawn')
+            continue
+        if p95 > budget:
+            failures.append(f'size {size}: p95 latency {p95:.1f}ms is over '
+                            f'the {budget:.0f}ms budget')
+        if baseline is not None and size in baseline:
+            before = baseline[size]['latency']['p95']
+            if before is not None and p95 > before * (1 + tolerance):
+                failures.append(f'size {size}: p95 latency {p95:.1f}ms '
+                                f'regressed from {before:.1f}ms')
+    return failures
+
+
+def print_results(results: dict[str, dict]) -> None:
+    """ Prints a table of the latency percentiles of each map size and
+        scenario, with the backlog of the Tk event queue.
+    """
+    print(f'{"size":>6} {"scenario":8} {"events":>7} {"drawn":>6} '
+          f'{"p50":>7} {"p95":>7} {"p99":>7} {"max":>7} {"backlog":>8}')
+    for size, result in results.items():
+        for scenario in SCENARIOS + ('all',):
+            if scenario == 'all':
+                latency = result['latency']
+                events = result['events']
+                backlog = result['backlog']
+            else:
+                latency = result['scenarios'][scenario]['latency']
+                events = result['scenarios'][scenario]['events']
+                backlog = result['scenarios'][scenario]['backlog']
+            cells = [f'{latency[name]:6.1f}ms' if latency[name] is not None
+                     else f'{"-":>8}' for name in ('p50', 'p95', 'p99', 'max')]
+            print(f'{size:>6} {scenario:8} {events:>7} '
+                  f'{latency["count"]:>6}', *cells,
+                  f'{backlog["p95"]:>4}/{backlog["max"]:<3}')
+
+
+class LatencyProbe:
+    """ Matches the events a game handles to the frames that draw them. """
+
+    def __init__(self) -> None:
+        """ Constructor for a probe that has seen no events. """
+        self.scenario = None
+        self.generated = 0
+        self.handled = 0
+        # (scenario, handler entry time) of the events not drawn yet
+        self._waiting = []
+        self.latencies = {scenario: [] for scenario in SCENARIOS}
+        self.backlogs = {scenario: [] for scenario in SCENARIOS}
+        self.events = {scenario: 0 for scenario in SCENARIOS}
+
+    def enter(self) -> float:
+        """ Records that a handler has been entered, returning the time. """
+        self.handled += 1
+        self.events[self.scenario] += 1
+        self.backlogs[self.scenario].append(self.generated - self.handled)
+        return time.perf_counter()
+
+    def leave(self, start: float, changed: bool) -> None:
+        """ Records that a handler entered at start has returned, and
+            whether it changed the farm, in which case the next frame draws
+            the change.
+        """
+        if changed:
+            self._waiting.append((self.scenario, start))
+
+    def rendered(self) -> None:
+        """ Records that a frame has been drawn. """
+        now = time.perf_counter()
+        for scenario, start in self._waiting:
+            self.latencies[scenario].append(now - start)
+        self._waiting.clear()
+
+    def summary(self) -> dict:
+        """ Returns the latency percentiles and backlog of each scenario and
+            of all of them together.
+        """
+        def backlog(values: list[int]) -> dict[str, int]:
+            ordered = sorted(values) or [0]
+            return {'p95': ordered[int(0.95 * (len(ordered) - 1))],
+                    'max': ordered[-1]}
+
+        result = {'scenarios': {}}
+        for scenario in SCENARIOS:
+            result['scenarios'][scenario] = {
+                'events': self.events[scenario],
+                'latency': percentiles(self.latencies[scenario]),
+                'backlog': backlog(self.backlogs[scenario]),
+            }
+        result['events'] = sum(self.events.values())
+        result['latency'] = percentiles(
+            [value for values in self.latencies.values() for value in values])
+        result['backlog'] = backlog(
+            [value for values in self.backlogs.values() for value in values])
+        return result
+
+
+def run_child(size: int, seconds: float, rate: float) -> dict:
+    """ Plays every scenario against a FarmGame on a map of the given size
+        in this process, on the current display.
+
+    Returns:
+        The probe's summary, with the game loop's frame counts.
+    """
+    # The GUI is only imported here, so the parent never needs a display
+    from a3 import FarmGame
+
+    class InstrumentedGame(FarmGame):
+        """ A FarmGame that reports its handlers and frames to a probe. """
+
+        def __init__(self, master: tk.Tk, map_file: str,
+                     probe: LatencyProbe) -> None:
+            self._probe = probe
+            super().__init__(master, map_file, active=False)
+            self._player.set_money(10 ** 9)
+            self.activate()
+
+        def measure(self, handler, *args) -> None:
+            start = self._probe.enter()
+            version = self._journal.get_version()
+            handler(*args)
+            self._probe.leave(start, self._journal.get_version() != version)
+
+        def handle_keypress(self, event: tk.Event) -> None:
+            self.measure(super().handle_keypress, event)
+
+        def select_item(self, item_name: str) -> None:
+            self.measure(super().select_item, item_name)
+
+        def buy_item(self, item_name: str) -> None:
+            self.measure(super().buy_item, item_name)
+
+        def sell_item(self, item_name: str) -> None:
+            self.measure(super().sell_item, item_name)
+
+        def next_day(self):
+            self.measure(super().next_day)
+
+        def render(self, alpha: float) -> bool:
+            animating = super().render(alpha)
+            self._probe.rendered()
+            return animating
+
+        def prepare_farming(self, position: tuple[int, int]) -> None:
+            """ Stands the player at a position with seeds selected. """
+            self._player.set_position(position)
+            self._player.add_item(('Potato Seed', 10 ** 6))
+            self._player.select_item('Potato Seed')
+            self.request_redraw()
+
+        def get_loop_frames(self) -> tuple[int, int]:
+            """ Returns the frames drawn and dropped by the game loop. """
+            return self._gameLoop.frames, self._gameLoop.dropped_frames
+
+    def find_buttons(widget: tk.Misc, text: str) -> list[tk.Button]:
+        found = []
+        stack = [widget]
+        while stack:
+            widget = stack.pop()
+            if isinstance(widget, tk.Button) and widget.cget('text') == text:
+                found.append(widget)
+            stack.extend(widget.winfo_children())
+        return found
+
+    directory = tempfile.mkdtemp()
+    map_file = os.path.join(directory, f'map{size}.txt')
+    write_map(map_file, size)
+    root = tk.Tk()
+    probe = LatencyProbe()
+    game = InstrumentedGame(root, map_file, probe)
+    root.focus_force()
+    buys = find_buttons(root, 'Buy')
+    sells = find_buttons(root, 'Sell')
+    next_day = find_buttons(root, 'Next day')[0]
+
+    def press(key: str) -> None:
+        probe.generated += 1
+        root.event_generate('<KeyPress>', keysym=key, when='tail')
+        root.event_generate('<KeyRelease>', keysym=key, when='tail')
+
+    def click(widget: tk.Misc) -> None:
+        probe.generated += 1
+        # tk buttons only invoke their command if the pointer entered them
+        widget.event_generate('<Enter>', when='tail')
+        widget.event_generate('<ButtonPress-1>', x=2, y=2, when='tail')
+        widget.event_generate('<ButtonRelease-1>', x=2, y=2, when='tail')
+
+    def steps(scenario: str):
+        # yields a function that generates each event of a scenario
+        step = 0
+        while True:
+            step += 1
+            if scenario == 'move':
+                yield lambda key='wasd'[step % 4]: press(key)
+            elif scenario == 'farm':
+                if step % FARM_DAY_STEPS == 0:
+                    yield lambda: click(next_day)
+                else:
+                    yield lambda key=FARM_CYCLE[step % len(FARM_CYCLE)]: \
+                        press(key)
+            else:
+                buttons = buys if step % 20 < 10 else sells
+                yield lambda button=buttons[step % len(buttons)]: \
+                    click(button)
+
+    per_burst = max(1, round(rate * BURST_INTERVAL / 1000))
+
+    def play(index: int) -> None:
+        if index == len(SCENARIOS):
+            root.quit()
+            return
+        scenario = SCENARIOS[index]
+        probe.scenario = scenario
+        if scenario == 'farm':
+            game.prepare_farming((size // 2, 1))
+        generator = steps(scenario)
+        end = time.perf_counter() + seconds
+
+        def burst() -> None:
+            if time.perf_counter() >= end:
+                root.after(int(SETTLE_TIME * 1000), play, index + 1)
+                return
+            for _ in range(per_burst):
+                next(generator)()
+            root.after(BURST_INTERVAL, burst)
+
+        burst()
+
+    root.after(100, play, 0)
+    root.mainloop()
+    result = probe.summary()
+    result['frames'], result['dropped_frames'] = game.get_loop_frames()
+    game.shutdown()
+    root.destroy()
+    return result
+
+
+def main() -> None:
+    """ Runs every map size, prints the results and exits with an error if
+        any size fails.
+    """
+    parser = argparse.ArgumentParser(description='Input latency stress test')
+    parser.add_argument('--sizes', type=int, nargs='+',
+                        default=DEFAULT_SIZES)
+    parser.add_argument('--seconds', type=float, default=5.0,
+                        help='seconds to play each scenario for')
+    parser.add_argument('--rate', type=float, default=500.0,
+                        help='events generated per second')
+    parser.add_argument('--budget', type=float, default=DEFAULT_BUDGET,
+                        help='milliseconds of p95 latency allowed')
+    parser.add_argument('--baseline', help='report to compare against')
+    parser.add_argument('--tolerance', type=float, default=0.25,
+                        help='fraction p95 may grow over the baseline')
+    parser.add_argument('--report', help='file to write the results to')
+    parser.add_argument('--no-xvfb', action='store_true',
+                        help='use the current DISPLAY')
+    parser.add_argument('--child', type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child is not None:
+        print(json.dumps(run_child(args.child, args.seconds, args.rate)))
+        return
+
+    results = {}
+    if args.no_xvfb:
+        for size in args.sizes:
+            results[str(size)] = run_size(size, args.seconds, args.rate, None)
+    else:
+        with VirtualDisplay() as display:
+            for size in args.sizes:
+                results[str(size)] = run_size(size, args.seconds, args.rate,
+                                              display.name)
+    print_results(results)
+    if args.report:
+        with open(args.report, 'w') as file:
+            json.dump(results, file, indent=2, sort_keys=True)
+
+    baseline = None
+    if args.baseline:
+        with open(args.baseline) as file:
+            baseline = json.load(file)
+    failures = check_results(results, args.budget, baseline, args.tolerance)
+    for failure in failures:
+        print('FAIL:', failure)
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,19 @@
+""" Enforces the import budget of the headless modules. """
+import os
+import unittest
+from import_budget import *
+
+
+class ImportBudgetTest(unittest.TestCase):
+    """ Imports every headless module in a fresh interpreter. """
+
+    def test_headless_modules_are_within_budget(self) -> None:
+        # The modules are imported by name from the top of the repository
+        cwd = os.getcwd()
+        os.chdir(os.path.dirname(os.path.abspath(__file__)))
+        self.addCleanup(os.chdir, cwd)
+        self.assertEqual(check_imports(), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
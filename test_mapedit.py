@@ -0,0 +1,60 @@
+""" Tests for the map editing region tools. """
+import random
+import unittest
+from farmcore.constants import GRASS, SOIL, UNTILLED
+from farmcore.mapedit import *
+
+
+def bfs_fill(rows: list[str], position: tuple[int, int]) -> set:
+    """ Returns the tiles of the region containing a position, found one tile
+        at a time.
+    """
+    target = rows[position[0]][position[1]]
+    region = {position}
+    queue = [position]
+    for row, col in queue:
+        for cell in ((row - 1, col), (row + 1, col),
+                     (row, col - 1), (row, col + 1)):
+            r, c = cell
+            if (0 <= r < len(rows) and 0 <= c < len(rows[r])
+                    and cell not in region and rows[r][c] == target):
+                region.add(cell)
+                queue.append(cell)
+    return region
+
+
+def span_tiles(spans: list) -> list:
+    """ Returns every tile covered by the spans, in order. """
+    return [(row, col) for row, first, end in spans
+            for col in range(first, end)]
+
+
+class FloodFillTest(unittest.TestCase):
+    """ Compares flood fill with a tile by tile search. """
+
+    def test_matches_a_simple_search(self) -> None:
+        generator = random.Random(5)
+        for trial in range(200):
+            height, width = generator.randint(1, 20), generator.randint(1, 20)
+            tiles = generator.choice([GRASS + SOIL, GRASS * 3 + SOIL,
+                                      GRASS + SOIL + UNTILLED])
+            rows = [''.join(generator.choice(tiles) for _ in range(width))
+                    for _ in range(height)]
+            position = (generator.randrange(height),
+                        generator.randrange(width))
+            with self.subTest(trial=trial):
+                filled = span_tiles(flood_fill(rows, position))
+                self.assertEqual(len(filled), len(set(filled)))
+                self.assertEqual(set(filled), bfs_fill(rows, position))
+
+    def test_painting_the_fill_changes_only_the_region(self) -> None:
+        rows = [GRASS * 4 + SOIL + GRASS,
+                SOIL * 4 + SOIL + GRASS,
+                GRASS * 6]
+        changed = paint_spans(rows, flood_fill(rows, (0, 0)), UNTILLED)
+        self.assertEqual(changed, [0])
+        self.assertEqual(rows[0], UNTILLED * 4 + SOIL + GRASS)
+
+
+if __name__ == '__main__':
+    unittest.main()
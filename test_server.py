@@ -0,0 +1,140 @@
+""" Tests for the multiplayer server, run against a server and bot clients in
+    this process.
+"""
+import asyncio
+import json
+import os
+import unittest
+from server import *
+
+MAP_FILE = os.path.join(os.path.dirname(__file__), 'maps', 'map1.txt')
+
+
+class FarmServerTest(unittest.IsolatedAsyncioTestCase):
+    """ Runs a FarmServer on localhost with a few connected clients. """
+
+    async def asyncSetUp(self) -> None:
+        self.server = FarmServer(MAP_FILE)
+        self.host, self.port = await self.server.start()
+        self.clients = []
+
+    async def asyncTearDown(self) -> None:
+        for client in self.clients:
+            await client.close()
+        await self.server.stop()
+
+    async def connect(self, count: int) -> list[FarmClient]:
+        """ Connects count new clients to the server. """
+        for _ in range(count):
+            client = FarmClient()
+            await client.connect(self.host, self.port)
+            self.clients.append(client)
+        return self.clients[-count:]
+
+    async def test_bots_mirror_the_server(self) -> None:
+        clients = await self.connect(4)
+        await asyncio.gather(*(run_bot(client, 100, seed=i)
+                               for i, client in enumerate(clients)))
+        # One more action from each client, so every mirror has seen every
+        # delta broadcast before it
+        for client in clients:
+            await client.act('select', item=SEEDS[0])
+        for client in clients:
+            while client.version < self.server._version:
+                await client.receive()
+
+        model = self.server.get_model()
+        expected_plants = {cell: (plant.get_name(), plant.get_stage())
+                           for cell, plant in model.get_plants().items()}
+        for client in clients:
+            self.assertEqual(client.map, list(model.get_map()))
+            self.assertEqual({cell: (plant.get_name(), plant.get_stage())
+                              for cell, plant in client.plants.items()},
+                             expected_plants)
+            for i, player in enumerate(model.get_players()):
+                self.assertEqual(client.players[i], encode_player(player))
+
+    async def test_bad_quantities_are_refused(self) -> None:
+        client, = await self.connect(1)
+        item = next(iter(SELL_PRICES))
+        for quantity in (1.5, True, 0, -1, '1', None):
+            with self.subTest(quantity=quantity):
+                with self.assertRaises(ActionError):
+                    await client.act('sell', item=item, quantity=quantity)
+        money = client.get_own_state()['m']
+        self.assertEqual(self.server.get_model().get_player().get_money(),
+                         money)
+        # The connection is still served after the refused actions
+        delta = await client.act('move', direction='s')
+        self.assertEqual(delta['by'], client.player_id)
+
+    async def test_malformed_messages_are_refused(self) -> None:
+        client, = await self.connect(1)
+        writer = client._writer
+        for line in (b'not json\n', b'[1, 2]\n', b'"sell"\n',
+                     b'{"action": "nope"}\n',
+                     b'{"action": "move", "direction": "up"}\n',
+                     b'{"action": "select", "item": [1], "seq": 7}\n'):
+            with self.subTest(line=line):
+                writer.write(line)
+                await writer.drain()
+                reply = await client.receive()
+                while reply['type'] == 'delta':
+                    reply = await client.receive()
+                self.assertEqual(reply['type'], 'error')
+        self.assertEqual(reply['seq'], 7)
+        delta = await client.act('move', direction='s')
+        self.assertEqual(delta['by'], client.player_id)
+
+    async def test_overlong_line_closes_the_connection(self) -> None:
+        client, other = await self.connect(2)
+        client._writer.write(b'{"action": "' + b'x' * 100000 + b'"}\n')
+        await client._writer.drain()
+        reply = await client.receive()
+        while reply['type'] == 'delta':
+            reply = await client.receive()
+        self.assertEqual(reply['type'], 'error')
+        self.assertIsNone(await client.receive())
+        # The other client is still served
+        delta = await other.act('move', direction='s')
+        self.assertEqual(delta['by'], other.player_id)
+
+    async def test_rejoining_player_starts_afresh(self) -> None:
+        first, watcher = await self.connect(2)
+        await first.act('move', direction='s')
+        await first.act('sell', item='Potato Seed', quantity=2)
+        player_id = first.player_id
+        await first.close()
+        self.clients.remove(first)
+        while player_id in watcher.players:
+            await watcher.receive()
+
+        second, = await self.connect(1)
+        self.assertEqual(second.player_id, player_id)
+        player = self.server.get_model().get_players()[player_id]
+        self.assertEqual(encode_player(player), encode_player(Player()))
+        while player_id not in watcher.players:
+            await watcher.receive()
+        self.assertEqual(watcher.players[player_id], encode_player(player))
+
+
+class ValidateActionTest(unittest.TestCase):
+    """ Checks which action messages are accepted. """
+
+    def test_accepts_well_formed_actions(self) -> None:
+        validate_action({'action': 'move', 'direction': 'w', 'seq': 1})
+        validate_action({'action': 'buy', 'item': SEEDS[0],
+                         'quantity': 3})
+
+    def test_rejects_malformed_actions(self) -> None:
+        for message in ([], 'till', {'action': 3}, {'action': 'nope'},
+                        {'action': 'move'}, {'action': 'move', 'direction': 1},
+                        {'action': 'sell', 'quantity': 2.0},
+                        {'action': 'sell', 'quantity': False}):
+            with self.subTest(message=message):
+                with self.assertRaises(ActionError):
+                    validate_action(message)
+
+
+if __name__ == '__main__':
+    unittest.main()
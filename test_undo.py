@@ -0,0 +1,132 @@
+""" Tests for undo and redo of player actions. """
+import os
+import tempfile
+import unittest
+from store import CampaignStore
+from undo import *
+
+MAP_FILE = os.path.join(os.path.dirname(__file__), 'maps', 'map1.txt')
+SOIL_CELL = (2, 2)
+
+
+def harvest_into(model: FarmModel, position: tuple[int, int]) -> tuple:
+    """ Harvests a plant and returns the harvest, which must not be None. """
+    harvest = model.harvest_plant(position)
+    assert harvest is not None
+    return harvest
+
+
+def ripe_plant(name: str) -> Plant:
+    """ Returns a plant of the given crop that is ready to harvest. """
+    crop = CROPS[name]
+    return Plant.from_state((name, crop.final_stage, len(crop.stages) - 1, 0))
+
+
+class UndoHistoryTest(unittest.TestCase):
+    """ Records actions on a farm and undoes and redoes them. """
+
+    def setUp(self) -> None:
+        self.model = FarmModel(MAP_FILE)
+        self.player = self.model.get_player()
+        self.history = UndoHistory(self.model)
+
+    def act(self, action, *args) -> None:
+        """ Performs a model action and records it. """
+        action(*args)
+        self.history.record(self.model)
+
+    def harvest(self) -> None:
+        """ Harvests the plant in SOIL_CELL into the inventory and records it.
+        """
+        self.player.add_item(harvest_into(self.model, SOIL_CELL))
+        self.history.record(self.model)
+
+    def test_undo_and_redo_restore_cells_and_player(self) -> None:
+        self.act(self.model.move_player, DOWN)
+        self.act(self.model.move_player, DOWN)
+        self.act(self.model.till_soil, (1, 1))
+        tilled = list(self.model.get_map())
+        energy = self.player.get_energy()
+
+        self.assertEqual(self.history.undo(self.model), [(1, 1)])
+        self.assertEqual(self.model.get_map()[1][1], UNTILLED)
+        self.history.undo(self.model)
+        self.assertEqual(self.player.get_position(), (1, 0))
+        self.assertFalse(self.history.redo(self.model) is None)
+        self.history.redo(self.model)
+        self.assertEqual(list(self.model.get_map()), tilled)
+        self.assertEqual(self.player.get_energy(), energy)
+        self.assertFalse(self.history.can_redo())
+
+    def test_new_action_discards_redo(self) -> None:
+        self.act(self.model.move_player, DOWN)
+        self.history.undo(self.model)
+        self.act(self.model.move_player, RIGHT)
+        self.assertFalse(self.history.can_redo())
+        self.assertEqual(self.player.get_position(), (0, 1))
+
+    def test_undoing_harvests_takes_back_their_metrics(self) -> None:
+        self.model.set_plant(SOIL_CELL, ripe_plant('potato'))
+        self.history.reset(self.model)
+        for _ in range(3):
+            self.harvest()
+            self.assertEqual(self.player.get_amount('Potato'), 1)
+            self.history.undo(self.model)
+        self.assertEqual(self.player.get_amount('Potato'), 0)
+        self.assertIn(SOIL_CELL, self.model.get_plants())
+        self.model.new_day()
+        self.assertEqual(self.model.get_metrics().latest()['harvested_potato'],
+                         0)
+
+    def test_every_player_is_restored(self) -> None:
+        other = self.model.add_player()
+        self.history.reset(self.model)
+        self.model.set_active_player(other)
+        self.act(self.model.move_player, RIGHT)
+        self.model.set_active_player(self.player)
+        self.act(self.model.move_player, DOWN)
+        self.history.undo(self.model)
+        self.history.undo(self.model)
+        self.assertEqual(other.get_position(), (0, 0))
+        self.assertEqual(self.player.get_position(), (0, 0))
+
+    def test_new_day_cannot_be_undone(self) -> None:
+        self.act(self.model.move_player, DOWN)
+        self.act(self.model.new_day)
+        self.assertFalse(self.history.can_undo())
+
+
+class UndoStoreTest(unittest.TestCase):
+    """ Checks that the store only writes the actions left after undos. """
+
+    def setUp(self) -> None:
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.model = FarmModel(MAP_FILE)
+        self.model.set_plant(SOIL_CELL, ripe_plant('potato'))
+        self.history = UndoHistory(self.model)
+        self.store = CampaignStore(os.path.join(directory.name, 'farm.db'))
+        self.addCleanup(self.store.close)
+        self.store.attach(self.model)
+
+    def test_undone_harvests_are_not_stored(self) -> None:
+        for _ in range(3):
+            harvest_into(self.model, SOIL_CELL)
+            self.history.record(self.model)
+            self.history.undo(self.model)
+        self.model.new_day()
+        self.assertEqual(self.store.harvest_totals_per_week(), [])
+        self.assertEqual(self.store.events_between(1, 1), [])
+
+    def test_redone_harvest_is_stored_once(self) -> None:
+        harvest_into(self.model, SOIL_CELL)
+        self.history.record(self.model)
+        self.history.undo(self.model)
+        self.history.redo(self.model)
+        self.model.new_day()
+        self.assertEqual(self.store.harvest_totals_per_week(),
+                         [(0, 'Potato', 1)])
+
+
+if __name__ == '__main__':
+    unittest.main()
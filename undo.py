@@ -0,0 +1,334 @@
+""" Unlimited undo and redo of player actions.
+
+    Every action's resulting farm state is kept, but states share structure:
+    the map rows and the plants are held in persistent vectors (32-way tries
+    that copy only the path to a changed entry), and plants and the player
+    are stored as immutable tuples. Recording an action therefore costs time
+    and memory proportional to the cells it changed, not to the size of the
+    farm, and undoing it restores and reports only those cells. The changed
+    cells are read from the model's journal.
+
+    Snapshots also hold every player, the market, today's harvest counters
+    and the soil of the cells that changed, so undoing a harvest takes back
+    what it added to the day's metrics. Each undo or redo ends with a
+    RESTORED journal record, which lets consumers such as the store forget
+    the events of undone actions.
+
+    The start of a new day is a checkpoint that cannot be undone: the
+    metrics history and the environment move on with the day and are not
+    kept in the snapshots, so the history starts again from the new day.
+"""
+from typing import Optional
+from model import *
+
+BITS = 5
+WIDTH = 1 << BITS
+MASK = WIDTH - 1
+
+
+class PersistentVector:
+    """ An immutable, fixed size vector that shares structure between
+        versions. Entries that were never set are None.
+    """
+
+    def __init__(self, root: Optional[tuple], size: int, shift: int) -> None:
+        """ Constructor for a vector. Use from_list() or empty() instead. """
+        self._root = root
+        self._size = size
+        self._shift = shift
+
+    @staticmethod
+    def _shift_for(size: int) -> int:
+        """ Returns the bit shift of the root level of a trie holding size
+            entries.
+        """
+        shift = 0
+        while (WIDTH << shift) < size:
+            shift += BITS
+        return shift
+
+    @classmethod
+    def empty(cls, size: int) -> 'PersistentVector':
+        """ Returns a vector of the given size with every entry None. """
+        return cls(None, size, cls._shift_for(size))
+
+    @classmethod
+    def from_list(cls, items: list) -> 'PersistentVector':
+        """ Returns a vector holding the given items. """
+        shift = cls._shift_for(len(items))
+        nodes = [tuple(items[i:i + WIDTH]) + (None,) * (WIDTH - len(items[i:i + WIDTH]))
+                 for i in range(0, len(items), WIDTH)]
+        level = 0
+        while level < shift:
+            nodes = [tuple(nodes[i:i + WIDTH]) + (None,) * (WIDTH - len(nodes[i:i + WIDTH]))
+                     for i in range(0, len(nodes), WIDTH)]
+            level += BITS
+        return cls(nodes[0] if nodes else None, len(items), shift)
+
+    def get(self, index: int) -> object:
+        """ Returns the entry at the given index. """
+        node = self._root
+        shift = self._shift
+        while node is not None and shift > 0:
+            node = node[(index >> shift) & MASK]
+            shift -= BITS
+        return None if node is None else node[index & MASK]
+
+    def set(self, index: int, value: object) -> 'PersistentVector':
+        """ Returns a new vector with the entry at the given index replaced.
+            Only the nodes on the path to that entry are copied.
+        """
+        def set_in(node: Optional[tuple], shift: int) -> tuple:
+            children = list(node) if node is not None else [None] * WIDTH
+            slot = (index >> shift) & MASK
+            if shift == 0:
+                children[slot] = value
+            else:
+                children[slot] = set_in(children[slot], shift - BITS)
+            return tuple(children)
+
+        if self.get(index) is value:
+            return self
+        return PersistentVector(set_in(self._root, self._shift), self._size,
+                                self._shift)
+
+
+class FarmState:
+    """ An immutable snapshot of the farm after an action. """
+
+    def __init__(
+            self,
+            rows: PersistentVector,
+            plants: PersistentVector,
+            soil: PersistentVector,
+            players: tuple,
+            market: tuple,
+            harvested: tuple,
+            version: int
+        ) -> None:
+        """ Constructor for a snapshot.
+
+        Parameters:
+            rows: The map rows, indexed by row.
+            plants: The plant states, indexed by row * columns + column.
+            soil: The (fertility, pests) of the environment, indexed like
+                plants. Cells that are None are as they were when the day
+                started.
+            players: Each player's state, as returned by capture_player().
+            market: The market's state, as nested tuples.
+            harvested: Today's harvest counters, as (produce, amount) pairs.
+            version: The journal version the snapshot was taken at.
+        """
+        self.rows = rows
+        self.plants = plants
+        self.soil = soil
+        self.players = players
+        self.market = market
+        self.harvested = harvested
+        self.version = version
+
+
+def capture_player(player: Player) -> tuple:
+    """ Returns the player's state as an immutable tuple. """
+    return (player.get_energy(), player.get_money(),
+            tuple(player.get_amounts()), player.get_position(),
+            player.get_direction(), player.get_selected_item())
+
+
+def restore_player(player: Player, state: tuple) -> None:
+    """ Restores a player's state returned by capture_player(). """
+    energy, money, amounts, position, direction, selected = state
+    player.set_energy(energy)
+    player.set_money(money)
+    for item, amount in zip(ITEMS, amounts):
+        player.set_amount(item, amount)
+    player.set_position(position)
+    player.set_direction(direction)
+    player.set_selected_item(selected)
+
+
+def capture_market(model: FarmModel) -> tuple:
+    """ Returns the market's state as nested tuples. """
+    return tuple(tuple(part) for part in model.get_market().get_state())
+
+
+def capture_soil(model: FarmModel, position: tuple[int, int]) -> Optional[tuple]:
+    """ Returns the (fertility, pests) of the environment at a position, or
+        None if the environment is off.
+    """
+    environment = model.get_environment()
+    if environment is None:
+        return None
+    return (float(environment.fertility[position]),
+            float(environment.pests[position]))
+
+
+class UndoHistory:
+    """ The sequence of farm states produced by the player's actions, with a
+        cursor that undo and redo move along it.
+    """
+
+    def __init__(self, model: FarmModel) -> None:
+        """ Starts a history whose first state is the model's current state.
+
+        Parameters:
+            model: The farm whose actions are recorded.
+        """
+        self.reset(model)
+
+    def reset(self, model: FarmModel) -> None:
+        """ Forgets every recorded action, so that the model's current state
+            becomes the first state and there is nothing to undo or redo.
+
+        Parameters:
+            model: The farm whose actions are recorded.
+        """
+        self._columns = model.get_dimensions()[1]
+        size = len(model.get_map()) * self._columns
+        plants = PersistentVector.empty(size)
+        for (row, col), plant in model.get_plants().items():
+            plants = plants.set(row * self._columns + col, plant.get_state())
+        # Harvests change the environment during the day, so the soil is
+        # copied once a day for restoring cells no action has touched
+        environment = model.get_environment()
+        self._soil = environment and (environment.fertility.copy(),
+                                      environment.pests.copy())
+        self._states = [FarmState(
+            PersistentVector.from_list(list(model.get_map())), plants,
+            PersistentVector.empty(size),
+            tuple(map(capture_player, model.get_players())),
+            capture_market(model),
+            tuple(model.get_harvested_today().items()),
+            model.get_journal().get_version())]
+        # The cells changed by the action leading to each state
+        self._changes = [[]]
+        self._index = 0
+        # The journal version that the latest state was recorded or restored at
+        self._version = model.get_journal().get_version()
+        self._day = model.get_days_elapsed()
+
+    def can_undo(self) -> bool:
+        """ Returns True iff there is an action to undo. """
+        return self._index > 0
+
+    def can_redo(self) -> bool:
+        """ Returns True iff there is an undone action to redo. """
+        return self._index < len(self._states) - 1
+
+    def record(self, model: FarmModel) -> None:
+        """ Records the state after an action, discarding any undone actions.
+            Does nothing if the action changed nothing. If a new day has
+            started, the history is reset instead.
+
+        Parameters:
+            model: The farm the action was performed on.
+        """
+        journal = model.get_journal()
+        changes = journal.changes_since(self._version)
+        if changes == []:
+            return
+        if model.get_days_elapsed() != self._day:
+            self.reset(model)
+            return
+        self._version = journal.get_version()
+        if changes is None:
+            # Too many changes to have been kept, so any cell may have changed
+            rows, columns = model.get_dimensions()
+            positions = [(row, col) for row in range(rows)
+                         for col in range(columns)]
+        else:
+            positions = sorted(changed_cells(changes))
+        previous = self._states[self._index]
+        rows, plants, soil = previous.rows, previous.plants, previous.soil
+        current_map = model.get_map()
+        current_plants = model.get_plants()
+        for row, col in positions:
+            rows = rows.set(row, current_map[row])
+            plant = current_plants.get((row, col))
+            index = row * self._columns + col
+            plants = plants.set(index, plant and plant.get_state())
+            soil = soil.set(index, capture_soil(model, (row, col)))
+        market = capture_market(model)
+        harvested = tuple(model.get_harvested_today().items())
+        state = FarmState(rows, plants, soil,
+                          tuple(map(capture_player, model.get_players())),
+                          previous.market if market == previous.market
+                          else market,
+                          previous.harvested if harvested == previous.harvested
+                          else harvested,
+                          self._version)
+
+        del self._states[self._index + 1:]
+        del self._changes[self._index + 1:]
+        self._states.append(state)
+        self._changes.append(positions)
+        self._index += 1
+
+    def undo(self, model: FarmModel) -> Optional[list[tuple[int, int]]]:
+        """ Restores the model to the state before the last action.
+
+        Parameters:
+            model: The farm to restore.
+
+        Returns:
+            The cells that were restored, or None if there was nothing to
+            undo.
+        """
+        if not self.can_undo():
+            return None
+        positions = self._changes[self._index]
+        self._index -= 1
+        self._restore(model, self._states[self._index], positions)
+        return positions
+
+    def redo(self, model: FarmModel) -> Optional[list[tuple[int, int]]]:
+        """ Reapplies the last undone action to the model.
+
+        Parameters:
+            model: The farm to restore.
+
+        Returns:
+            The cells that were restored, or None if there was nothing to
+            redo.
+        """
+        if not self.can_redo():
+            return None
+        self._index += 1
+        positions = self._changes[self._index]
+        self._restore(model, self._states[self._index], positions)
+        return positions
+
+    def _restore(
+            self,
+            model: FarmModel,
+            state: FarmState,
+            positions: list[tuple[int, int]]
+        ) -> None:
+        """ Restores the given cells, the players, the market and today's
+            harvest counters of the model from a recorded state, then
+            records in the journal which version the farm is back at.
+        """
+        journal = model.get_journal()
+        start = journal.get_version()
+        environment = model.get_environment()
+        for row, col in positions:
+            tile = state.rows.get(row)[col]
+            if model.get_map()[row][col] != tile:
+                model.set_tile((row, col), tile)
+            index = row * self._columns + col
+            plant_state = state.plants.get(index)
+            model.set_plant((row, col), plant_state
+                            and Plant.from_state(plant_state))
+            if environment is not None and self._soil is not None:
+                fertility, pests = state.soil.get(index) or (
+                    self._soil[0][row, col], self._soil[1][row, col])
+                environment.fertility[row, col] = fertility
+                environment.pests[row, col] = pests
+        # Players that joined after the state was recorded are left alone
+        for player, player_state in zip(model.get_players(), state.players):
+            restore_player(player, player_state)
+        model.get_market().set_state(state.market)
+        model.set_harvested_today(dict(state.harvested))
+        journal.record(RESTORED, None, (state.version, start))
+        # Restoring is not an action, so its changes are not recorded
+        self._version = journal.get_version()